@@ -1,10 +1,17 @@
 
+import argparse
+import atexit
 import fnmatch
 import os
+import re
 import shutil
 import sys
 
-from src import detector
+from src import detector, perf, profiling
+from src.config_loader import get_config
+
+# Project configuration (thresholds, ignore rules, output formats)
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
 
 def main():
     # print command line arguments
@@ -23,22 +30,264 @@ def file_extractor(proj_path):
             except OSError as exc:
                 print(exc)
 
-    for root, _, filenames in os.walk(proj_path):
-        for filename in fnmatch.filter(filenames, "*.py"):
-            matches.append(os.path.join(root, filename))
+    with perf.stage("discovery"):
+        for root, _, filenames in os.walk(proj_path):
+            for filename in fnmatch.filter(filenames, "*.py"):
+                matches.append(os.path.join(root, filename))
+
+        matches.sort()
+
+    with perf.stage("copy"):
+        for idx, src in enumerate(matches):
+            target_name = f"{idx:04d}_{os.path.basename(src)}"
+            shutil.copy2(src, os.path.join(target_root, target_name))
+
+def run_diff(spec, repo):
+    """
+    Report the smells on the lines changed by a git range, or on the staged lines when spec is
+    None; exit status 1 if there are any
+    """
+    from src.diff_mode import analyze_diff, analyze_staged
+    from src.git_sources import GitError, repo_root
+    from tools.smell_client import format_finding
+
+    try:
+        results = analyze_staged(repo) if spec is None else analyze_diff(spec, repo)
+    except GitError as e:
+        print(e, file=sys.stderr)
+        return 2
+    for finding in results.findings:
+        print(format_finding(finding))
+    for filename, error in results.errors:
+        print("{}: error: {}".format(filename, error), file=sys.stderr)
+    summary = results.summary()
+    detector.write_findings_reports(os.path.basename(repo_root(repo)), results.findings,
+                                    {"totals": summary["totals"], "stats": summary["stats"], "diff": spec or "staged"})
+    print("{} findings on changed lines of {} files ({:.2f}s)".format(len(results.findings), results.files,
+                                                                      results.elapsed), file=sys.stderr)
+    return 1 if results.findings else 0
+
+
+def run_archive(path, timings=False, deadline=None):
+    """
+    Analyze the Python files of a zip or tar archive without extracting it (or of a directory in
+    place), and write the findings reports under the archive's name
+
+    With a deadline (seconds) the cheapest detectors run first and the reports are partial when
+    the analysis stops at the deadline.
+    """
+    from src.api import analyze, write_reports
+    from src.archive_sources import ArchiveError, archive_project_name
+
+    name = archive_project_name(path) if os.path.isfile(path) else os.path.basename(os.path.normpath(path))
+    timings = timings or get_config().should_generate("timings")
+    with perf.recording(timings) as recorder:
+        try:
+            results = analyze([path], root=None if os.path.isfile(path) else path, deadline=deadline)
+        except ArchiveError as e:
+            print(e, file=sys.stderr)
+            return 2
+    for filename, error in results.errors:
+        print("{}: error: {}".format(filename, error), file=sys.stderr)
+    with perf.stage("reports"):
+        write_reports(results, name, recorder=recorder if timings else None)
+    print("{} findings in {} files ({:.2f}s)".format(len(results.findings), results.files, results.elapsed))
+    if results.partial:
+        print("partial: not every stage completed; {}; {} files not completed".format(
+            ", ".join("{} {}/{}".format(stage, info["files"], results.files) for stage, info in results.stages.items()),
+            len(results.incomplete)))
+    return 0
+
+
+def parse_duration(text):
+    """Seconds of a duration such as 30, 30s, 500ms, 2m or 1h"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d*)?|\.\d+)\s*(ms|s|m|h)?\s*", text)
+    if not match:
+        raise argparse.ArgumentTypeError("invalid duration: {!r} (e.g. 30s, 2m)".format(text))
+    return float(match.group(1)) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[match.group(2) or "s"]
+
+
+def run_batch(list_file, jobs):
+    """Analyze every project of a list file over one worker pool and print the combined summary"""
+    from src.batch import SUMMARY_FILENAME, read_project_list, run_batch as batch
+
+    def progress(run):
+        summary = run.results.summary()
+        print("{}: {} findings in {} files, {} errors ({:.2f}s)".format(
+            run.name, sum(summary["totals"].values()), summary["files"], len(summary["errors"]),
+            summary["elapsed"]), flush=True)
+
+    try:
+        projects = read_project_list(list_file)
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 2
+    summary = batch(projects, jobs=jobs, progress=progress)
+    print("{} projects: {} findings in {} files ({:.2f}s); summary: {}".format(
+        len(summary["projects"]), sum(summary["totals"].values()), summary["files"], summary["elapsed"],
+        os.path.join(get_config().get_output_dir(), SUMMARY_FILENAME)))
+    return 0
+
+
+def run_shard(target, spec, bundle_dir, jobs):
+    """Analyze one shard of a project and write its result bundle"""
+    from src.shard import ShardError, parse_shard, run_shard as shard
+
+    try:
+        index, count = parse_shard(spec)
+    except ShardError as e:
+        print(e, file=sys.stderr)
+        return 2
+    path = shard(target, index, count, bundle_dir, jobs=jobs or 1)
+    print("shard {}/{} written to {}".format(index, count, path))
+    return 0
+
+
+def run_merge(argv):
+    """merge command: combine the bundles of all shards of a project into its reports"""
+    from src.findings import worst_findings
+    from src.shard import ShardError, default_bundle_dir, find_bundles, merge_bundles, write_merged_reports
+
+    parser = argparse.ArgumentParser(prog="CodeSmellTool.py merge",
+                                     description="Merge the result bundles of a sharded run")
+    parser.add_argument("bundles", nargs="*",
+                        help="bundle files or directories containing them (default: <output>/shards)")
+    parser.add_argument("--project", help="only merge the bundles of this project")
+    args = parser.parse_args(argv)
+    get_config(CONFIG_PATH)
+    paths = find_bundles(args.bundles or [default_bundle_dir()], args.project)
+    try:
+        project, results = merge_bundles(paths)
+    except ShardError as e:
+        print(e, file=sys.stderr)
+        return 2
+    write_merged_reports(project, results, len(paths))
+    for smell, finding in sorted(worst_findings(results.findings).items()):
+        print("worst {}: {}:{} ({})".format(smell, finding["filename"], finding["lineno"], finding["metric"]))
+    print("{}: {} findings in {} files from {} shards".format(project, len(results.findings), results.files,
+                                                               len(paths)))
+    return 0
+
+
+def start_trace(path):
+    """Record a Chrome trace of the whole run, written to path when the tool exits"""
+    recorder = perf.start(trace=True)
+
+    def write():
+        perf.write_trace(path, recorder.events)
+        print("trace written to {}".format(path), file=sys.stderr)
+
+    atexit.register(write)
+
+
+def start_profile(mode):
+    """Profile the whole run (--profile cpu|memory); the reports are written when the tool exits"""
+    if mode == "cpu":
+        profiler = profiling.start_cpu()
+
+        def write():
+            paths = profiling.write_cpu_report(profiling.stop_cpu() or profiler)
+            print("CPU profile written to {}".format(", ".join(paths)), file=sys.stderr)
+    else:
+        tracker = profiling.start_memory()
+
+        def write():
+            paths = tracker.write_report()
+            tracker.stop()
+            print("memory profile written to {}".format(", ".join(paths)), file=sys.stderr)
+
+    atexit.register(write)
+
 
-    matches.sort()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Detect code smells in a Python project")
+    parser.add_argument("target", nargs="?",
+                        help="directory of the project to analyze, or a .zip/.tar.gz archive of it")
+    parser.add_argument("--serve", action="store_true",
+                        help="run the analysis daemon; query it with tools/smell_client.py")
+    parser.add_argument("--port", type=int, default=None, help="port of the analysis daemon")
+    parser.add_argument("--watch", metavar="DIR",
+                        help="analyze DIR in place and re-analyze the files that change until interrupted")
+    parser.add_argument("--interval", type=float, default=None, help="seconds between two scans in watch mode")
+    parser.add_argument("--diff", metavar="BASE..HEAD",
+                        help="only analyze the Python files changed between two commits of the git repository "
+                             "containing the target directory (default: the current directory)")
+    parser.add_argument("--staged", action="store_true",
+                        help="only analyze the staged changes, read from the git index (for pre-commit hooks)")
+    parser.add_argument("--projects", metavar="LIST",
+                        help="analyze every project directory listed in the file LIST (one per line) in one run")
+    parser.add_argument("--shard", metavar="i/N",
+                        help="only analyze the files of shard i of N and write a result bundle; "
+                             "combine the bundles with: CodeSmellTool.py merge")
+    parser.add_argument("--bundle-dir", default=None, help="directory of the shard bundles (default: <output>/shards)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--timings", action="store_true",
+                        help="record the time of every stage, detector and file: Performance section of the "
+                             "reports and <output>/<project>_performance.json")
+    parser.add_argument("--trace", metavar="OUT.json",
+                        help="write a Chrome/Perfetto trace of the run (stages, detectors per file, workers)")
+    parser.add_argument("--deadline", type=parse_duration, metavar="DURATION",
+                        help="stop the analysis after DURATION (e.g. 30s, 2m): the cheapest detectors run first "
+                             "over all files, then duplicates, the expensive detectors and pylint; the reports "
+                             "are marked partial and list the stages and files completed. A directory is then "
+                             "analyzed in place like an archive: only the findings files and the HTML report (when "
+                             "enabled) are written; no code-dump copy, PDF report, detector logs or charts")
+    parser.add_argument("--profile", choices=profiling.MODES,
+                        help="cpu: cProfile the run and its workers; memory: peak memory and top allocation "
+                             "sites of every stage (reports in <output>/profile)")
+    return parser.parse_args(argv)
 
-    for idx, src in enumerate(matches):
-        target_name = f"{idx:04d}_{os.path.basename(src)}"
-        shutil.copy2(src, os.path.join(target_root, target_name))
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
+    if sys.argv[1:2] == ["merge"]:
+        sys.exit(run_merge(sys.argv[2:]))
+    args = parse_args()
+    if args.trace:
+        start_trace(args.trace)
+    if args.profile:
+        get_config(CONFIG_PATH)
+        start_profile(args.profile)
+    if args.serve:
+        from src import daemon
+        get_config(CONFIG_PATH)
+        daemon.serve(port=args.port or daemon.DEFAULT_PORT)
+        sys.exit(0)
+    if args.watch:
+        from src import watch
+        get_config(CONFIG_PATH)
+        watch.watch(args.watch, args.interval or watch.DEFAULT_INTERVAL)
+        sys.exit(0)
+    if args.shard:
+        if not args.target or not os.path.isdir(args.target):
+            print("target directory not specified")
+            sys.exit(1)
+        get_config(CONFIG_PATH)
+        sys.exit(run_shard(args.target, args.shard, args.bundle_dir, args.jobs))
+    if args.projects:
+        get_config(CONFIG_PATH)
+        sys.exit(run_batch(args.projects, args.jobs))
+    if args.diff or args.staged:
+        get_config(CONFIG_PATH)
+        sys.exit(run_diff(None if args.staged else args.diff, args.target or "."))
+    if not args.target:
         print("target directory not specified")
         sys.exit(1)
-    file_extractor(sys.argv[1])
-    detector.detect_main("./code-dump/" + os.path.basename(sys.argv[1]))
+    if os.path.isfile(args.target):
+        from src.archive_sources import is_archive
+        if not is_archive(args.target):
+            print("target must be a directory or a .zip/.tar archive")
+            sys.exit(1)
+        get_config(CONFIG_PATH)
+        sys.exit(run_archive(args.target, args.timings, args.deadline))
+    if args.deadline is not None:
+        if not os.path.isdir(args.target):
+            print("target directory not found")
+            sys.exit(1)
+        get_config(CONFIG_PATH)
+        sys.exit(run_archive(args.target, args.timings, args.deadline))
+    file_extractor(args.target)
+    detector.detect_main("./code-dump/" + os.path.basename(args.target), CONFIG_PATH,
+                         extra_formats=("timings",) if args.timings else ())
     print('*****     Output Generated     *****')
 
 #if len(sys.argv) != 2:
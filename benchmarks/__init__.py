@@ -0,0 +1,5 @@
+"""
+Benchmarks
+Throughput, peak memory and scaling of every detector and of a whole run over deterministic
+synthetic corpora of 1k to 100k files (see benchmarks/corpus.py and benchmarks/run.py).
+"""
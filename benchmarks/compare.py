@@ -0,0 +1,159 @@
+"""
+Benchmark comparison, from the repository root:
+
+    python -m benchmarks.run --repeat 5 --save --label baseline
+    ... change the code ...
+    python -m benchmarks.run --repeat 5 --save
+    python -m benchmarks.compare
+
+Compares the time and peak RSS of every benchmark and corpus size of a run (default: the latest)
+with a baseline run of the same machine (default: the latest run labelled "baseline", else the run
+before). A change is flagged when the medians differ by more than --threshold and a one-sided
+Mann-Whitney rank-sum test over the repeated samples finds it significant at --alpha: with 5
+samples on each side the test can reach p = 0.004, with 3 samples p = 0.05, with 1 sample never.
+Exits with status 1 when a regression is flagged, so that it can guard a CI job.
+"""
+import argparse
+import itertools
+import math
+import statistics
+import sys
+from typing import Any, Dict, List, Optional
+
+from benchmarks.store import DEFAULT_STORE, ResultStore, result_key
+
+METRICS = ("seconds", "peak_rss_mb")
+DEFAULT_ALPHA = 0.05
+DEFAULT_THRESHOLD = 0.10
+
+# Largest number of rank assignments enumerated for an exact p-value
+EXACT_LIMIT = 20000
+
+
+def _u_statistic(lower: List[float], higher: List[float]) -> float:
+    """Pairs in which the sample of `higher` is the greater one, ties counting one half"""
+    return sum(1.0 if b > a else 0.5 if b == a else 0.0 for a in lower for b in higher)
+
+
+def rank_sum_pvalue(baseline: List[float], candidate: List[float]) -> float:
+    """
+    One-sided p-value of the Mann-Whitney test that candidate values are greater than baseline
+    values: exact (every split of the pooled samples) for small samples, normal approximation else
+    """
+    m, n = len(baseline), len(candidate)
+    if not m or not n:
+        return 1.0
+    observed = _u_statistic(baseline, candidate)
+    pooled = baseline + candidate
+    if math.comb(m + n, n) <= EXACT_LIMIT:
+        total = extreme = 0
+        for chosen in itertools.combinations(range(m + n), n):
+            rest = [pooled[i] for i in range(m + n) if i not in chosen]
+            total += 1
+            if _u_statistic(rest, [pooled[i] for i in chosen]) >= observed:
+                extreme += 1
+        return extreme / total
+    mean = m * n / 2
+    sd = math.sqrt(m * n * (m + n + 1) / 12)
+    return 1 - statistics.NormalDist().cdf((observed - 0.5 - mean) / sd)
+
+
+def _samples(result: Dict[str, Any], metric: str) -> List[float]:
+    samples = result.get("samples", {}).get(metric)
+    if samples is None:
+        samples = [result[metric]] if result.get(metric) is not None else []
+    return [sample for sample in samples if sample is not None]
+
+
+def compare_runs(baseline: Dict[str, Any], candidate: Dict[str, Any], alpha: float = DEFAULT_ALPHA,
+                 threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Compare every benchmark result of two stored runs
+
+    Returns:
+        [{"benchmark", "files", "metric", "baseline", "candidate" (medians), "change" (relative),
+          "p", "status"}]; status is "regression", "improvement", "unchanged" or "new" (no baseline)
+    """
+    previous = {result_key(result): result for result in baseline["results"]}
+    rows = []
+    for result in candidate["results"]:
+        old = previous.get(result_key(result))
+        for metric in METRICS:
+            after = _samples(result, metric)
+            if not after:
+                continue
+            row = {"benchmark": result["benchmark"], "files": result["files"], "metric": metric,
+                   "baseline": None, "candidate": statistics.median(after), "change": None, "p": None, "status": "new"}
+            before = _samples(old, metric) if old else []
+            if before:
+                row["baseline"] = statistics.median(before)
+                row["change"] = round(row["candidate"] / row["baseline"] - 1, 4) if row["baseline"] else 0.0
+                slower, faster = rank_sum_pvalue(before, after), rank_sum_pvalue(after, before)
+                row["p"] = round(min(slower, faster), 4)
+                if row["change"] > threshold and slower <= alpha:
+                    row["status"] = "regression"
+                elif row["change"] < -threshold and faster <= alpha:
+                    row["status"] = "improvement"
+                else:
+                    row["status"] = "unchanged"
+            rows.append(row)
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    lines = ["{:<24}{:>8}  {:<12}{:>12}{:>12}{:>9}{:>8}  {}".format(
+        "benchmark", "files", "metric", "baseline", "candidate", "change", "p", "status")]
+    for row in rows:
+        lines.append("{:<24}{:>8}  {:<12}{:>12}{:>12}{:>9}{:>8}  {}".format(
+            row["benchmark"], row["files"], row["metric"],
+            "-" if row["baseline"] is None else "{:.4g}".format(row["baseline"]), "{:.4g}".format(row["candidate"]),
+            "-" if row["change"] is None else "{:+.1%}".format(row["change"]),
+            "-" if row["p"] is None else "{:.3f}".format(row["p"]), row["status"]))
+    return "\n".join(lines)
+
+
+def select_runs(store: ResultStore, baseline: Optional[str], candidate: Optional[str], any_machine: bool = False):
+    """(baseline run, candidate run) to compare; raises ValueError when one is missing"""
+    new = store.find(candidate)
+    if new is None:
+        raise ValueError("no run {}in {}".format("'{}' ".format(candidate) if candidate else "", store.path))
+    machine = None if any_machine else new["machine"]["id"]
+    if baseline is not None:
+        old = store.find(baseline, machine, before=new["id"] if baseline == new["label"] else None)
+    else:
+        old = store.find("baseline", machine, before=new["id"]) or store.find(machine=machine, before=new["id"])
+    if old is None:
+        raise ValueError("no baseline run{} on this machine ({}) in {}".format(
+            " '{}'".format(baseline) if baseline else "", new["machine"]["id"], store.path))
+    return old, new
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two stored benchmark runs")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="results file (default: %(default)s)")
+    parser.add_argument("--baseline", help="label or id of the baseline run (default: latest 'baseline', else previous)")
+    parser.add_argument("--candidate", help="label or id of the run checked (default: latest)")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="significance level (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="smallest relative change flagged (default: %(default)s)")
+    parser.add_argument("--any-machine", action="store_true", help="allow a baseline measured on another machine")
+    args = parser.parse_args(argv)
+
+    store = ResultStore(args.store)
+    try:
+        old, new = select_runs(store, args.baseline, args.candidate, args.any_machine)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print("baseline:  #{} {} ({}, {})".format(old["id"], old["label"], old["created"], old["machine"]["id"]))
+    print("candidate: #{} {} ({}, {})".format(new["id"], new["label"], new["created"], new["machine"]["id"]))
+    rows = compare_runs(old, new, args.alpha, args.threshold)
+    print(format_comparison(rows))
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print("{} regression(s)".format(len(regressions)))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Synthetic corpus generator
+Generates Python projects of any size for the benchmarks. Every file is derived from the seed and
+its own index only, so a corpus is identical on every machine and a file does not change when the
+corpus grows: the first 1000 files of the 100k corpus are the 1k corpus.
+
+The densities control how much work each detector finds:
+    functions: mean number of top-level blocks (functions or classes) per file
+    class_density: share of the blocks that are classes of a few methods
+    lambda_density, try_density: share of the functions holding a lambda / a try block
+    magic_density: mean number of magic numbers per function
+    clone_density: share of the top-level functions copied from a clone family, reported by the
+        duplicate code detector
+
+The duplicate code detector compares the kinds of statements of two functions and the names of
+their decorators and return annotation. The functions of a file share a decorator and annotation of
+their own, and every run of FILES_PER_GROUP files has FAMILIES_PER_GROUP clone families with theirs,
+so functions other than clones only look alike within a file and the number of duplicate pairs
+grows linearly with the corpus, as in a real code base.
+"""
+import collections
+import hashlib
+import json
+import os
+import random
+from typing import Iterator, Tuple
+
+CorpusSpec = collections.namedtuple(
+    "CorpusSpec", ["files", "seed", "functions", "class_density", "lambda_density", "try_density",
+                   "magic_density", "clone_density"],
+    defaults=[0, 6, 0.2, 0.3, 0.3, 1.5, 0.05])
+
+# Files per package directory, so that no directory holds 100k entries
+PACKAGE_SIZE = 500
+
+# Clone families of every run of FILES_PER_GROUP files
+FILES_PER_GROUP = 100
+FAMILIES_PER_GROUP = 4
+
+# Written last into a complete corpus directory
+MARKER = ".corpus.json"
+
+_WORDS = ["order", "item", "price", "user", "total", "record", "event", "queue", "cache", "node",
+          "index", "report", "batch", "token", "value", "entry", "result", "buffer", "score", "limit"]
+_EXCEPTIONS = ["ValueError", "KeyError", "TypeError", "OSError", "IndexError"]
+
+
+def _name(rng: random.Random, parts: int = 2) -> str:
+    return "_".join(rng.choice(_WORDS) for _ in range(parts))
+
+
+# Statements a function holds or not, at random, so that functions other than clones rarely look alike
+_STATEMENTS = [
+    ["total += len({first})"],
+    ["for item in {first}:", "    total += 1"],
+    ["while total > len({first}):", "    total //= 2"],
+    ["with open(os.devnull) as handle:", "    handle.read()"],
+    ["assert total >= 0"],
+    ["print(total)"],
+    ["count: int = total"],
+    ["scratch = list({first})", "del scratch"],
+    ["import math"],
+    ["from os import path"],
+    ["if total < 0:", "    raise ValueError(total)"],
+]
+
+
+def _function(rng: random.Random, spec: CorpusSpec, scope: str, name: str, indent: str = "",
+              method: bool = False) -> list:
+    """Source lines of one function, decorated and annotated with the names of its scope"""
+    args = [_name(rng, 1) + str(i) for i in range(rng.randint(1, 3))]
+    first = args[0]
+    body = ["{} = {}".format("total", " + ".join("len({})".format(arg) for arg in args))]
+    for _ in range(_poisson(rng, spec.magic_density)):
+        body.append("total = total * {} + {}".format(rng.randint(3, 9999), rng.randint(3, 99)))
+    if rng.random() < spec.lambda_density:
+        body.append("key = lambda {0}: ({0}.{1}, {0}.{2}, len(str({0})) > {3}, {0} is not None)".format(
+            "entry", _name(rng, 1), _name(rng, 1), rng.randint(3, 80)))
+        body.append("{} = sorted({}, key=key)".format(first, first))
+    body.append("result = [item for item in {} if item]".format(first))
+    if rng.random() < spec.try_density:
+        body += ["try:",
+                 "    total = int(total)",
+                 "except {}:".format(rng.choice(_EXCEPTIONS)),
+                 "    pass"]
+    for statement in _STATEMENTS:
+        if rng.random() < 0.4:
+            body += [line.format(first=first) for line in statement]
+    if method:
+        body.append("self.{} = total".format(_name(rng, 1)))
+    body.append("return result, total")
+    params = (["self"] if method else []) + args
+    return ["{}@cache_{}".format(indent, scope),
+            "{}def {}({}) -> Result_{}:".format(indent, name, ", ".join(params), scope)] + \
+        ["{}    {}".format(indent, line) for line in body]
+
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    """Small counts around a mean, e.g. magic numbers per function"""
+    count = int(mean)
+    return count + (1 if rng.random() < mean - count else 0)
+
+
+def _scope_names(scope: str) -> list:
+    return ["Result_{} = tuple".format(scope), "cache_{} = functools.lru_cache(maxsize=None)".format(scope)]
+
+
+def _clone(spec: CorpusSpec, family: str, name: str) -> list:
+    """A function of a clone family: same body in every copy, under another name"""
+    return _function(random.Random("{}:clone:{}".format(spec.seed, family)), spec, family, name)
+
+
+def file_source(spec: CorpusSpec, index: int) -> str:
+    """Source code of file number index of the corpus"""
+    rng = random.Random("{}:{}".format(spec.seed, index))
+    scope = "m{}".format(index)
+    header = ['"""Generated module {}"""'.format(index), "import functools", "import os", ""] + _scope_names(scope)
+    lines = []
+    blocks = max(1, int(rng.gauss(spec.functions, spec.functions / 3)))
+    for block in range(blocks):
+        lines.append("")
+        name = "{}_{}".format(_name(rng), block)
+        if rng.random() < spec.class_density:
+            lines.append("class {}:".format("".join(word.title() for word in name.split("_"))))
+            for method in range(rng.randint(1, 4)):
+                lines += _function(rng, spec, scope, "{}_{}".format(_name(rng, 1), method), "    ", method=True)
+                lines.append("")
+        elif rng.random() < spec.clone_density:
+            family = "g{}f{}".format(index // FILES_PER_GROUP, rng.randrange(FAMILIES_PER_GROUP))
+            header += [line for line in _scope_names(family) if line not in header]
+            lines += _clone(spec, family, name)
+        else:
+            lines += _function(rng, spec, scope, name)
+        lines.append("")
+    return "\n".join(header + [""] + lines).rstrip() + "\n"
+
+
+def file_name(index: int) -> str:
+    return "pkg{:03d}/mod{:06d}.py".format(index // PACKAGE_SIZE, index)
+
+
+def generate(spec: CorpusSpec) -> Iterator[Tuple[str, str]]:
+    """(file name, source code) of every file of the corpus"""
+    for index in range(spec.files):
+        yield file_name(index), file_source(spec, index)
+
+
+def corpus_key(spec: CorpusSpec) -> str:
+    """Directory name of a corpus, e.g. corpus-1000-1a2b3c4d"""
+    digest = hashlib.sha1(json.dumps(spec._asdict(), sort_keys=True).encode("utf8")).hexdigest()
+    return "corpus-{}-{}".format(spec.files, digest[:8])
+
+
+def write_corpus(spec: CorpusSpec, base_dir: str) -> Tuple[str, dict]:
+    """
+    Write the corpus under base_dir, unless a complete copy is already there
+
+    Returns:
+        (corpus directory, {"files", "loc", "spec"})
+    """
+    directory = os.path.join(base_dir, corpus_key(spec))
+    marker = os.path.join(directory, MARKER)
+    if os.path.exists(marker):
+        with open(marker, encoding="utf8") as f:
+            return directory, json.load(f)
+    loc = 0
+    for name, source in generate(spec):
+        path = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf8") as f:
+            f.write(source)
+        loc += source.count("\n")
+    info = {"files": spec.files, "loc": loc, "spec": spec._asdict()}
+    with open(marker, "w", encoding="utf8") as f:
+        json.dump(info, f, indent=2)
+    return directory, info
@@ -0,0 +1,290 @@
+"""
+Benchmark runner, from the repository root:
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --benchmarks parse,magic_number,end_to_end
+
+Every benchmark runs over the synthetic corpus of each size (see benchmarks/corpus.py), in a fresh
+process so that its peak RSS is its own. A per-detector benchmark times only that detector: files
+are read and parsed outside of the timed region, one at a time (long_lambda and long_list_comp
+run the long_statement handler). "parse" times ast.parse, "duplicate_code" the comparison of the
+functions of the whole corpus, "pylint" the in-process pylint run, and "end_to_end" a whole run
+of the analysis (batch mode, --jobs workers, no reports).
+
+Prints files/s, LOC/s and peak RSS per benchmark and size, and the scaling exponent between two
+consecutive sizes: 1.0 is linear, 2.0 quadratic. --json writes the rows, --plot the scaling curves.
+With --repeat every benchmark runs several times and the median is reported; --save adds the run,
+with all its samples, to the results store compared by benchmarks/compare.py.
+"""
+import argparse
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.corpus import CorpusSpec, corpus_key, write_corpus
+from benchmarks.store import DEFAULT_STORE, ResultStore
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = (1000, 2000, 4000)
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), "codesmell-benchmarks")
+
+# Files per pylint run in the pylint benchmark, as in a parallel run
+PYLINT_CHUNK = 200
+
+
+def benchmark_names() -> List[str]:
+    from src.engine import FILE_DETECTORS
+    return ["parse"] + list(FILE_DETECTORS) + ["duplicate_code", "pylint", "end_to_end"]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process and of its largest finished child, in MiB"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def _sources(corpus_dir: str):
+    from src.sources import iter_python_files, load_sources
+    return load_sources(iter_python_files([corpus_dir]), root=corpus_dir)
+
+
+def _run_detector(name: str, corpus_dir: str) -> tuple:
+    """(seconds, CPU seconds, findings) of one per-file detector, or of the parse"""
+    from src.engine import FILE_DETECTORS, FindingCollector, _thresholds
+    from src.config_loader import get_config
+    detect = FILE_DETECTORS.get(name)
+    thresholds = _thresholds(get_config())
+    collector = FindingCollector()
+    wall = cpu = 0.0
+    for parsed in _sources(corpus_dir):
+        if detect is not None:
+            parsed.tree  # parsed outside of the timed region
+        started, cpu_started = time.perf_counter(), time.process_time()
+        if detect is None:
+            parsed.tree
+        else:
+            detect(parsed, collector, thresholds)
+        wall += time.perf_counter() - started
+        cpu += time.process_time() - cpu_started
+        parsed.release()
+    return wall, cpu, len(collector.findings)
+
+
+def _run_duplicates(corpus_dir: str) -> tuple:
+    from src.config_loader import get_config
+    from src.Detector.duplicate_code_detector import extract_function_features, find_duplicates
+    functions = []
+    for parsed in _sources(corpus_dir):
+        functions.extend(extract_function_features(parsed.tree, parsed.filename))
+        parsed.release()
+    started, cpu_started = time.perf_counter(), time.process_time()
+    pairs = sum(1 for _ in find_duplicates(functions, get_config().get_threshold("duplicate_code_similarity", 80)))
+    return time.perf_counter() - started, time.process_time() - cpu_started, pairs
+
+
+def _run_pylint(corpus_dir: str) -> tuple:
+    from src.engine import FindingCollector
+    from src.Detector.pylint_output_detector import detect_files
+    collector = FindingCollector()
+    wall = cpu = 0.0
+    chunk = []
+    for parsed in list(_sources(corpus_dir)) + [None]:
+        if parsed is not None:
+            chunk.append(parsed)
+        if chunk and (parsed is None or len(chunk) == PYLINT_CHUNK):
+            started, cpu_started = time.perf_counter(), time.process_time()
+            detect_files(chunk, collector)
+            wall += time.perf_counter() - started
+            cpu += time.process_time() - cpu_started
+            chunk = []
+    return wall, cpu, len(collector.findings)
+
+
+def _run_end_to_end(corpus_dir: str, jobs: int) -> tuple:
+    from src import perf
+    from src.batch import run_batch
+    started, cpu_started = time.perf_counter(), perf.cpu_time()
+    summary = run_batch([corpus_dir], jobs=jobs, write_reports=False)
+    return time.perf_counter() - started, perf.cpu_time() - cpu_started, sum(summary["totals"].values())
+
+
+def measure(benchmark: str, corpus_dir: str, jobs: int = 1, ignore: tuple = ()) -> Dict[str, Any]:
+    """
+    Run one benchmark over a corpus in this process
+
+    Returns:
+        {"benchmark", "seconds", "cpu", "findings", "peak_rss_mb"}
+    """
+    from src.config_loader import get_config
+    config = get_config(os.path.join(ROOT, "config.yaml"))
+    config.config["ignore"]["detectors"] = list(config.config["ignore"].get("detectors") or []) + list(ignore)
+    if benchmark == "duplicate_code":
+        seconds, cpu, findings = _run_duplicates(corpus_dir)
+    elif benchmark == "pylint":
+        seconds, cpu, findings = _run_pylint(corpus_dir)
+    elif benchmark == "end_to_end":
+        seconds, cpu, findings = _run_end_to_end(corpus_dir, jobs)
+    elif benchmark in benchmark_names():
+        seconds, cpu, findings = _run_detector(benchmark, corpus_dir)
+    else:
+        raise ValueError("unknown benchmark: {}".format(benchmark))
+    return {"benchmark": benchmark, "seconds": round(seconds, 4), "cpu": round(cpu, 4), "findings": findings,
+            "peak_rss_mb": peak_rss_mb()}
+
+
+def measure_isolated(benchmark: str, corpus_dir: str, jobs: int = 1, ignore: tuple = ()) -> Dict[str, Any]:
+    """measure() in a new process, so that the peak RSS and the caches are those of this benchmark only"""
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+        return executor.submit(measure, benchmark, corpus_dir, jobs, ignore).result()
+
+
+def measure_repeated(benchmark: str, corpus_dir: str, repeat: int = 1, jobs: int = 1,
+                     ignore: tuple = ()) -> Dict[str, Any]:
+    """
+    measure_isolated() `repeat` times: the median time and peak RSS, and every sample in
+    row["samples"] for the comparison of two runs
+    """
+    runs = [measure_isolated(benchmark, corpus_dir, jobs, ignore) for _ in range(repeat)]
+    row = dict(runs[0])
+    row["samples"] = {"seconds": [run["seconds"] for run in runs], "peak_rss_mb": [run["peak_rss_mb"] for run in runs]}
+    for metric in ("seconds", "cpu", "peak_rss_mb"):
+        values = [run[metric] for run in runs if run[metric] is not None]
+        row[metric] = statistics.median(values) if values else None
+    return row
+
+
+def add_throughput(row: Dict[str, Any], info: Dict[str, Any], corpus: str = None) -> Dict[str, Any]:
+    seconds = max(row["seconds"], 1e-9)
+    row.update(files=info["files"], loc=info["loc"], files_per_s=round(info["files"] / seconds, 1),
+               loc_per_s=round(info["loc"] / seconds, 1))
+    if corpus is not None:
+        row["corpus"] = corpus
+    return row
+
+
+def scaling_exponents(rows: List[Dict[str, Any]]) -> Dict[str, List[Optional[float]]]:
+    """
+    Per benchmark, log(t2 / t1) / log(n2 / n1) between every two consecutive corpus sizes: about
+    1.0 when the time grows linearly with the number of files, 2.0 when quadratically
+    """
+    by_benchmark: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_benchmark.setdefault(row["benchmark"], []).append(row)
+    exponents = {}
+    for name, runs in by_benchmark.items():
+        runs = sorted(runs, key=lambda row: row["files"])
+        exponents[name] = [
+            round(math.log(max(b["seconds"], 1e-9) / max(a["seconds"], 1e-9)) / math.log(b["files"] / a["files"]), 2)
+            if b["files"] > a["files"] else None
+            for a, b in zip(runs, runs[1:])]
+    return exponents
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    lines = ["{:<24}{:>8}{:>10}{:>12}{:>14}{:>10}{:>10}".format(
+        "benchmark", "files", "seconds", "files/s", "LOC/s", "RSS MiB", "findings")]
+    for row in rows:
+        lines.append("{:<24}{:>8}{:>10.3f}{:>12.1f}{:>14.1f}{:>10}{:>10}".format(
+            row["benchmark"], row["files"], row["seconds"], row["files_per_s"], row["loc_per_s"],
+            "-" if row["peak_rss_mb"] is None else row["peak_rss_mb"], row["findings"]))
+    exponents = scaling_exponents(rows)
+    if any(exponents.values()):
+        lines += ["", "scaling exponent between consecutive sizes (1.0 = linear):"]
+        lines += ["  {:<24}{}".format(name, "  ".join("-" if value is None else str(value) for value in values))
+                  for name, values in exponents.items() if values]
+    return "\n".join(lines)
+
+
+def plot_scaling(rows: List[Dict[str, Any]], path: str):
+    """Seconds against files per benchmark, log-log, with a linear reference"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for name in dict.fromkeys(row["benchmark"] for row in rows):
+        runs = sorted((row for row in rows if row["benchmark"] == name), key=lambda row: row["files"])
+        ax.plot([row["files"] for row in runs], [row["seconds"] for row in runs], marker="o", label=name)
+    sizes = sorted({row["files"] for row in rows})
+    slowest = max(rows, key=lambda row: row["seconds"] if row["files"] == sizes[0] else 0)
+    ax.plot(sizes, [slowest["seconds"] * size / sizes[0] for size in sizes], "k--", linewidth=0.8, label="linear")
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("files")
+    ax.set_ylabel("seconds")
+    ax.legend(fontsize="small")
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CodeSmellTool benchmarks over synthetic corpora")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="corpus sizes in files, comma separated (default: %(default)s)")
+    parser.add_argument("--benchmarks", default=None,
+                        help="comma separated, from: {} (default: all but pylint)".format(", ".join(benchmark_names())))
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes of the end_to_end benchmark")
+    parser.add_argument("--ignore", action="append", default=[], metavar="DETECTOR",
+                        help="detector left out of end_to_end, e.g. pylint (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed")
+    for field in CorpusSpec._fields[2:]:
+        parser.add_argument("--" + field.replace("_", "-"), type=float, default=CorpusSpec._field_defaults[field],
+                            help="corpus density, see benchmarks/corpus.py (default: %(default)s)")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR,
+                        help="where the generated corpora are kept between runs (default: %(default)s)")
+    parser.add_argument("--json", metavar="PATH", help="write the result rows as JSON")
+    parser.add_argument("--plot", metavar="PNG", help="draw the scaling curves")
+    parser.add_argument("--repeat", type=int, default=1, help="runs of every benchmark (default: %(default)s)")
+    parser.add_argument("--save", action="store_true", help="add the results to the results store")
+    parser.add_argument("--label", help="label of the saved run, e.g. baseline (default: the commit)")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="results file (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    names = args.benchmarks.split(",") if args.benchmarks else [name for name in benchmark_names() if name != "pylint"]
+    unknown = set(names) - set(benchmark_names())
+    if unknown:
+        parser.error("unknown benchmark(s): {}".format(", ".join(sorted(unknown))))
+    densities = {field: getattr(args, field) for field in CorpusSpec._fields[2:]}
+    densities["functions"] = int(densities["functions"])
+
+    rows = []
+    for size in sorted(int(size) for size in args.sizes.split(",")):
+        spec = CorpusSpec(size, args.seed, **densities)
+        corpus_dir, info = write_corpus(spec, args.corpus_dir)
+        for name in names:
+            row = add_throughput(measure_repeated(name, corpus_dir, max(1, args.repeat), args.jobs,
+                                                  tuple(args.ignore)), info, corpus_key(spec))
+            rows.append(row)
+            print("{:<24}{:>8} files  {:>9.3f}s".format(name, size, row["seconds"]), file=sys.stderr, flush=True)
+
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump({"rows": rows, "scaling": scaling_exponents(rows)}, f, indent=2)
+    if args.plot:
+        plot_scaling(rows, args.plot)
+    if args.save:
+        store = ResultStore(args.store)
+        run = store.add_run(rows, args.label)
+        store.save()
+        print("saved as run #{} '{}' in {}".format(run["id"], run["label"], args.store))
+
+
+if __name__ == '__main__':
+    main()
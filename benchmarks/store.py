@@ -0,0 +1,87 @@
+"""
+Benchmark results store
+Every saved run of benchmarks/run.py is kept in one local JSON file (benchmarks/results.json by
+default, not versioned) with the samples of every benchmark and corpus size, the commit it measured
+and a fingerprint of the machine, so that benchmarks/compare.py can compare two runs made on the
+same machine.
+"""
+import datetime
+import hashlib
+import json
+import os
+import platform
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STORE = os.path.join(ROOT, "benchmarks", "results.json")
+
+
+def machine_fingerprint() -> Dict[str, Any]:
+    """What the timings depend on besides the code: CPU, memory, operating system and Python"""
+    try:
+        memory_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2 ** 20
+    except (AttributeError, ValueError, OSError):
+        memory_mb = None
+    machine = {"system": platform.system(), "release": platform.release(), "machine": platform.machine(),
+               "processor": platform.processor(), "cpus": os.cpu_count(), "memory_mb": memory_mb,
+               "python": platform.python_version(), "implementation": platform.python_implementation()}
+    machine["id"] = hashlib.sha1(json.dumps(machine, sort_keys=True).encode("utf8")).hexdigest()[:12]
+    return machine
+
+
+def current_commit() -> Optional[str]:
+    """Commit of the working tree measured, "+dirty" when it has uncommitted changes"""
+    from src.git_sources import GitError, run_git
+    try:
+        commit = run_git(["rev-parse", "--short", "HEAD"], ROOT).strip()
+        dirty = run_git(["status", "--porcelain", "--untracked-files=no"], ROOT).strip()
+    except GitError:
+        return None
+    return commit + ("+dirty" if dirty else "")
+
+
+def result_key(result: Dict[str, Any]) -> tuple:
+    """What two results must share to be compared: benchmark, corpus (size and densities)"""
+    return result["benchmark"], result["corpus"]
+
+
+class ResultStore:
+    """Saved benchmark runs, oldest first"""
+
+    def __init__(self, path: str = DEFAULT_STORE):
+        self.path = path
+        self.runs: List[Dict[str, Any]] = []
+        if os.path.exists(path):
+            with open(path, encoding="utf8") as f:
+                self.runs = json.load(f).get("runs", [])
+
+    def add_run(self, rows: List[Dict[str, Any]], label: Optional[str] = None) -> Dict[str, Any]:
+        """Add the result rows of a run of benchmarks/run.py; the label defaults to the commit"""
+        commit = current_commit()
+        run = {"id": len(self.runs) + 1, "label": label or commit or "run",
+               "created": datetime.datetime.now().isoformat(timespec="seconds"), "commit": commit,
+               "machine": machine_fingerprint(), "results": rows}
+        self.runs.append(run)
+        return run
+
+    def find(self, label: Optional[str] = None, machine: Optional[str] = None,
+             before: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Latest run with this label (or run id), on this machine id, older than run id `before`;
+        None when there is none
+        """
+        for run in reversed(self.runs):
+            if before is not None and run["id"] >= before:
+                continue
+            if label is not None and label not in (run["label"], str(run["id"])):
+                continue
+            if machine is not None and run["machine"]["id"] != machine:
+                continue
+            return run
+        return None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".part", "w", encoding="utf8") as f:
+            json.dump({"runs": self.runs}, f, indent=1)
+        os.replace(self.path + ".part", self.path)
@@ -1,6 +1,11 @@
 import os
 import subprocess
-from typing import List
+from typing import List, Tuple
+
+try:
+    from cohesion.module import Module
+except ImportError:  # cohesion missing: only the (failing) command line path is left
+    Module = None
 
 
 def output_class_cohesion(directory: str) -> str:
@@ -25,6 +30,32 @@ def output_class_cohesion(directory: str) -> str:
     return result.stdout
 
 
+def class_cohesion_in_tree(tree) -> List[Tuple[str, int, float]]:
+    """
+    Cohesion of every class of a parsed module, computed in-process
+
+    The percentage is the "Total" printed by the cohesion command: the average over the methods of
+    the share of class variables each one uses, unbound methods counting as 0.
+
+    Return:
+        [(class name, line number, percentage rounded like the command output), ...]
+    """
+    if Module is None:
+        return []
+    result = []
+    for class_name, structure in Module(tree).structure.items():
+        class_variable_count = len(structure["variables"])
+        total = 0.0
+        for function in structure["functions"].values():
+            bound = function["bounded"] or function["staticmethod"] or function["classmethod"]
+            if bound and class_variable_count:
+                total += 100.0 * len(function["variables"]) / class_variable_count
+        function_count = len(structure["functions"])
+        percentage = total / function_count if function_count else 0.0
+        result.append((class_name, structure["lineno"], round(percentage, 2)))
+    return result
+
+
 def generate_log(output):
     pass
     # print (output[1])
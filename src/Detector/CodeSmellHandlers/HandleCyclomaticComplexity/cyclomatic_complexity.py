@@ -1,13 +1,17 @@
 import os
 from typing import Iterable
 
-from radon.complexity import cc_visit
+from radon.complexity import cc_rank, cc_visit
 
+from ....perf import timed_files
 
-def output_cyclomatic_complexity(directory: str, min_rank: str = "C") -> int:
+
+def output_cyclomatic_complexity(directory: str, min_rank: str = "C", sink=None) -> int:
     """
     Count code blocks with cyclomatic complexity worse than the given rank.
 
+    When ``sink`` is given, every such block is also written to it as a finding.
+
     Returns
     -------
     int
@@ -15,7 +19,7 @@ def output_cyclomatic_complexity(directory: str, min_rank: str = "C") -> int:
     """
 
     total = 0
-    for filename in _iter_python_files(directory):
+    for filename in timed_files(_iter_python_files(directory)):
         path = os.path.join(directory, filename)
         try:
             with open(path, encoding="utf8") as file_obj:
@@ -24,14 +28,37 @@ def output_cyclomatic_complexity(directory: str, min_rank: str = "C") -> int:
             continue
 
         try:
-            blocks = cc_visit(source)
+            total += cyclomatic_complexity_in_source(filename, source, min_rank, sink)
         except (SyntaxError, UnicodeDecodeError):
             continue
 
-        for block in blocks:
-            if block.letter > min_rank:
-                total += 1
+    return total
 
+
+def cyclomatic_complexity_in_source(filename: str, source: str, min_rank: str = "C", sink=None) -> int:
+    """
+    Count (and optionally report) the blocks of one file ranked worse than ``min_rank``.
+
+    Raises
+    ------
+    SyntaxError
+        If the source cannot be parsed.
+    """
+
+    total = 0
+    for block in cc_visit(source):
+        # block.letter is the block type (F/M/C); the rank comes from the complexity score
+        rank = cc_rank(block.complexity)
+        if rank > min_rank:
+            total += 1
+            if sink is not None:
+                sink.add(
+                    "cyclomatic_complexity",
+                    filename,
+                    block.lineno,
+                    block.complexity,
+                    f"{block.name} has cyclomatic complexity {block.complexity} (rank {rank})",
+                )
     return total
 
 
@@ -23,34 +23,46 @@ def detect_useless_exception_per_file(file_path):
     
     """
     
-    smelly_lines = []
-    
     with open(file_path, "rt", encoding='UTF8') as f:
         data = f.read()
         module = ast.parse(data)
-        for instance in module.body:
-            # when the try/exception is in a function
-            if isinstance(instance, ast.FunctionDef):
-                # iterate through elements in the function
-                for obj in instance.body:
-                    if isinstance(obj, ast.Try):
-                        try_obj = obj
-                        for handler in try_obj.handlers:
-                            if handler.type is None or handler.type == 'Exception':
-                                smelly_lines.append((handler.lineno, 'Too general exception'))
-                                continue
-                            if len(handler.body) == 1 and isinstance(handler.body[0], ast.Pass):
-                                smelly_lines.append((handler.lineno, 'Empty exception detected'))
-            # when the try/exception is in a function
-            else:
-                if isinstance(instance, ast.Try):
-                    try_obj = instance
+    return detect_useless_exception_in_tree(module)
+
+
+def detect_useless_exception_in_tree(module):
+    """
+    Same as detect_useless_exception_per_file, on an already parsed module
+
+    Parameters:
+        module (ast.Module): parsed source code file
+
+    Return:
+        smelly_lines (list[(int, str)]): line number and reason of every smelly handler
+    """
+    smelly_lines = []
+    for instance in module.body:
+        # when the try/exception is in a function
+        if isinstance(instance, ast.FunctionDef):
+            # iterate through elements in the function
+            for obj in instance.body:
+                if isinstance(obj, ast.Try):
+                    try_obj = obj
                     for handler in try_obj.handlers:
                         if handler.type is None or handler.type == 'Exception':
                             smelly_lines.append((handler.lineno, 'Too general exception'))
                             continue
                         if len(handler.body) == 1 and isinstance(handler.body[0], ast.Pass):
                             smelly_lines.append((handler.lineno, 'Empty exception detected'))
+        # when the try/exception is in a function
+        else:
+            if isinstance(instance, ast.Try):
+                try_obj = instance
+                for handler in try_obj.handlers:
+                    if handler.type is None or handler.type == 'Exception':
+                        smelly_lines.append((handler.lineno, 'Too general exception'))
+                        continue
+                    if len(handler.body) == 1 and isinstance(handler.body[0], ast.Pass):
+                        smelly_lines.append((handler.lineno, 'Empty exception detected'))
 
     return smelly_lines
     
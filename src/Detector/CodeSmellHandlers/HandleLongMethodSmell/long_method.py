@@ -1,7 +1,11 @@
+import io
 import os
 import sys
 from subprocess import PIPE, run
-from typing import List
+from typing import Dict, List, Optional
+
+# Refactoring messages the pylint detector reports
+PYLINT_SMELL_MESSAGES = ("R0915", "R0913", "R0912", "R0904", "R0902")
 
 
 def output_long_methods(directory: str) -> str:
@@ -25,6 +29,79 @@ def output_long_methods(directory: str) -> str:
     return result.stdout
 
 
+def output_long_methods_in_process(file_paths: List[str], sources: Optional[Dict[str, str]] = None) -> str:
+    """
+    Same report as output_long_methods, produced by pylint running inside this process.
+
+    Used by long-lived processes (the analysis daemon), where pylint stays imported between runs.
+    Messages carry absolute paths: "<abspath>:<line>:<column>: <msg_id>: <msg> (<symbol>)".
+
+    Parameters:
+        file_paths (list[str]): paths of the files to check
+        sources (dict[str, str]): contents of paths that only exist in memory, by absolute path;
+            these are checked without touching the disk
+
+    Return:
+        stdout (str): text report of pylint
+    """
+    if not file_paths:
+        return ""
+    from astroid import MANAGER
+    from pylint.lint import Run
+    from pylint.reporters.text import TextReporter
+
+    # astroid keeps every module it parsed; drop the checked files so edited files are parsed again
+    checked = {os.path.abspath(path) for path in file_paths}
+    for name, module in list(MANAGER.astroid_cache.items()):
+        if getattr(module, "file", None) in checked:
+            del MANAGER.astroid_cache[name]
+
+    output = io.StringIO()
+    args = ["--disable=all", "--enable=" + ",".join(PYLINT_SMELL_MESSAGES), "--persistent=n", "--score=n",
+            "--msg-template={abspath}:{line}:{column}: {msg_id}: {msg} ({symbol})", *file_paths]
+    if sources:
+        run_class = _in_memory_run_class()
+        run_class.sources = sources
+        try:
+            run_class(args, reporter=TextReporter(output), exit=False)
+        finally:
+            run_class.sources = {}
+    else:
+        Run(args, reporter=TextReporter(output), exit=False)
+    return output.getvalue()
+
+
+_IN_MEMORY_RUN = None
+
+
+def _in_memory_run_class():
+    """pylint Run whose linter reads the files of Run.sources from memory instead of from disk"""
+    global _IN_MEMORY_RUN
+    if _IN_MEMORY_RUN is not None:
+        return _IN_MEMORY_RUN
+    from pylint.lint import PyLinter, Run
+    from pylint.typing import FileItem
+
+    class InMemoryLinter(PyLinter):
+        def _iterate_file_descrs(self, files_or_modules, *args, **kwargs):
+            on_disk = [path for path in files_or_modules if path not in InMemoryRun.sources]
+            for path in files_or_modules:
+                if path in InMemoryRun.sources:
+                    yield FileItem(os.path.splitext(os.path.basename(path))[0], path, path)
+            if on_disk:
+                yield from super()._iterate_file_descrs(on_disk, *args, **kwargs)
+
+        def get_ast(self, filepath, modname, data=None):
+            return super().get_ast(filepath, modname, InMemoryRun.sources.get(filepath, data))
+
+    class InMemoryRun(Run):
+        LinterClass = InMemoryLinter
+        sources: Dict[str, str] = {}
+
+    _IN_MEMORY_RUN = InMemoryRun
+    return InMemoryRun
+
+
 def get_file_list(directory: str) -> List[str]:
     file_list = []
     for filename in sorted(os.listdir(directory)):
@@ -2,19 +2,30 @@ import ast
 import astor
 import os
 
+from ....perf import timed_files
 
-def output_long_statements(directory, limit, type):
+
+def output_long_statements(directory, limit, type, sink=None):
     output_list = []
-    for filename in os.listdir(directory):
+    for filename in timed_files(os.listdir(directory)):
         if filename.endswith(".py"):
             file_path = os.path.join(directory, filename)
             long_stmts = detect_long_statement(file_path, limit, type)
             if len(long_stmts):
                 output_list.append((filename,long_stmts))
+                if sink is not None:
+                    emit_findings(filename, long_stmts, type, sink)
     worst_code = generate_log(output_list, type)
     return (output_list,worst_code)
 
 
+def emit_findings(filename, long_stmts, type, sink):
+    smell = "long_lambda" if type == ast.Lambda else "long_list_comp"
+    for stmt_lineno in long_stmts:
+        sink.add(smell, filename, stmt_lineno[1], len(stmt_lineno[0]),
+                 "Statement is {} characters long".format(len(stmt_lineno[0])))
+
+
 def generate_log(output_list,type):
     worst = {}
     metric = 0
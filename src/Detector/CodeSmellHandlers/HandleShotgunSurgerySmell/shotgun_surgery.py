@@ -10,6 +10,9 @@ import ast
 import astor
 import collections
 
+# Names that are not counted as external calls
+BUILTIN_NAMES = frozenset(dir(__builtins__))
+
 
 def detect_shotgun_surgery_per_file(file_path):
     """
@@ -22,31 +25,68 @@ def detect_shotgun_surgery_per_file(file_path):
         analysis (dict[string]: (string, bool)): ClassName: (number of external calls / total calls, isSmelly)
 
     """
-    # TODO: exclude function calls from stdlib or pip-packages
-    analysis = collections.defaultdict(list)
     with open(file_path, encoding='UTF8') as f:
         data = f.read()
         module = ast.parse(data)
-        for instance in module.body:
-            if isinstance(instance, ast.ClassDef):
-                functions, external_count, total_count = [], 0, 0
-                for classObj in instance.body:
-                    if isinstance(classObj, ast.FunctionDef):
-                        functions.append(classObj.name)
-
-                for classObj in ast.walk(instance):
-                    if isinstance(classObj, ast.Call):
-                        if astor.to_source(classObj).split('(')[0].split('.')[-1] not in functions and \
-                                astor.to_source(classObj).split('(')[0].split('.')[-1] not in dir(__builtins__):
-                            external_count += 1
-                            analysis[instance.name].append(classObj.lineno)
-                        total_count += 1
-
-                if external_count > 5:  # n = 5
-                    analysis[instance.name].append('{}/{} (external calls / total)'.format(external_count, total_count))
-                    # analysis[instance.name].append(True if external_count > 0 else False)
-                # TODO: decide metric n
+    return detect_shotgun_surgery_in_tree(module)
+
+
+def detect_shotgun_surgery_in_tree(module):
+    """
+    Same as detect_shotgun_surgery_per_file, on an already parsed module
+
+    Parameters:
+        module (ast.Module): parsed source code file
+
+    Return:
+        analysis (dict[string]: list): ClassName: line numbers of external calls (+ summary when smelly)
+    """
+    # TODO: exclude function calls from stdlib or pip-packages
+    analysis = collections.defaultdict(list)
+    for instance in module.body:
+        if isinstance(instance, ast.ClassDef):
+            functions, external_count, total_count = [], 0, 0
+            for classObj in instance.body:
+                if isinstance(classObj, ast.FunctionDef):
+                    functions.append(classObj.name)
+
+            for classObj in ast.walk(instance):
+                if isinstance(classObj, ast.Call):
+                    called = called_name(classObj)
+                    if called not in functions and called not in BUILTIN_NAMES:
+                        external_count += 1
+                        analysis[instance.name].append(classObj.lineno)
+                    total_count += 1
+
+            if external_count > 5:  # n = 5
+                analysis[instance.name].append('{}/{} (external calls / total)'.format(external_count, total_count))
+                # analysis[instance.name].append(True if external_count > 0 else False)
+            # TODO: decide metric n
 
     return analysis
 
+
+def called_name(call):
+    """
+    Name of the called function: the last dotted name before the first "(" of the call source,
+    e.g. "get" for self.cache.get(key) and "load" for self.load().items()
+
+    Same as astor.to_source(call).split('(')[0].split('.')[-1], without generating the source of
+    the call and all its arguments (once per nested call)
+    """
+    return _head(call.func)[0]
+
+
+def _head(node):
+    """(last dotted name before the first "(" of the source of node, whether its source has a "(")"""
+    if isinstance(node, ast.Name):
+        return node.id, False
+    if isinstance(node, ast.Attribute):
+        name, paren = _head(node.value)
+        return (name, True) if paren else (node.attr, False)
+    if isinstance(node, ast.Call):
+        return _head(node.func)[0], True
+    source = astor.to_source(node).strip()
+    return source.split('(')[0].split('.')[-1], '(' in source
+
 # ana = detect_shotgun_surgery_per_file('sample_file.py')
\ No newline at end of file
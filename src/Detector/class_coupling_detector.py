@@ -1,9 +1,12 @@
 import os
 
-from .CodeSmellHandlers.HandleClassCohesion.class_cohesion import output_class_cohesion
+from .CodeSmellHandlers.HandleClassCohesion.class_cohesion import output_class_cohesion, class_cohesion_in_tree
 
+# Classes below this cohesion percentage are reported
+COHESION_LIMIT = 30
 
-def detect_class_cohesion(directory, limit):
+
+def detect_class_cohesion(directory, limit, sink=None):
     path, dirs, files = next(os.walk(directory))
     output = output_class_cohesion(directory)
     total_num_targets = 0
@@ -11,13 +14,45 @@ def detect_class_cohesion(directory, limit):
     if not output:
         return total_num_targets
 
+    filename, class_name, class_lineno = 'N/A', 'N/A', 'N/A'
     output_arr = output.split()
     for idx,word in enumerate(output_arr):
-        if word == "Total:":
+        if word == "File:":
+            filename = output_arr[idx + 1]
+        elif word == "Class:":
+            class_name = output_arr[idx + 1]
+            class_lineno = _parse_lineno(output_arr[idx + 2])
+        elif word == "Total:":
             target_percentage = float(output_arr[idx + 1].split("%")[0])
             if target_percentage<limit and target_percentage != 0.0:
                 total_num_targets +=1
+                if sink is not None:
+                    emit_finding(filename, class_name, class_lineno, target_percentage, sink)
     # print("total number of classes with cohesion below " + str(limit) + " percent: " + str(total_num_targets) )
     return total_num_targets
 
+
+def detect_file(parsed, sink, limit=COHESION_LIMIT):
+    """Per-file entry point of the analysis engine; runs cohesion in-process instead of its command"""
+    num_targets = 0
+    for class_name, class_lineno, percentage in class_cohesion_in_tree(parsed.tree):
+        if percentage < limit and percentage != 0.0:
+            num_targets += 1
+            emit_finding(parsed.filename, class_name, class_lineno, percentage, sink)
+    return num_targets
+
+
+def emit_finding(filename, class_name, class_lineno, percentage, sink):
+    sink.add("class_cohesion", filename, class_lineno, percentage,
+             "Class {} has a cohesion of {:.2f}%".format(class_name, percentage),
+             class_name=class_name)
+
+
+def _parse_lineno(position):
+    # cohesion prints the class position as "(line:col)"
+    try:
+        return int(position.strip("()").split(":")[0])
+    except (ValueError, IndexError):
+        return 'N/A'
+
 # detect_class_cohesion("../../code-dump/flask-master", 50)
\ No newline at end of file
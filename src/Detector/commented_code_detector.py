@@ -8,7 +8,11 @@ import re
 from typing import List, Tuple, Dict
 try:
     from src.config_loader import get_config
+    from src.perf import timed_files
 except ImportError:
+    def timed_files(filenames):
+        return filenames
+
     def get_config():
         class SimpleConfig:
             def should_ignore_file(self, path):
@@ -18,12 +22,13 @@ except ImportError:
         return SimpleConfig()
 
 
-def detect_commented_code(directory: str) -> Tuple[int, Dict]:
+def detect_commented_code(directory: str, sink=None) -> Tuple[int, Dict]:
     """
     检测目录中所有Python文件的注释代码
     
     Args:
         directory: 要检测的目录路径
+        sink: 检测结果输出（可选），每发现一个注释代码块写入一条记录
         
     Returns:
         (注释代码块数量, 最严重的注释代码信息)
@@ -32,7 +37,7 @@ def detect_commented_code(directory: str) -> Tuple[int, Dict]:
     worst_block = {}
     max_lines = 0
     
-    for filename in os.listdir(directory):
+    for filename in timed_files(os.listdir(directory)):
         if filename.endswith(".py"):
             config = get_config()
             if config.should_ignore_file(os.path.join(directory, filename)):
@@ -46,6 +51,8 @@ def detect_commented_code(directory: str) -> Tuple[int, Dict]:
                     
                     for start_line, end_line, block_lines in file_blocks:
                         commented_blocks.append((filename, start_line, end_line, block_lines))
+                        if sink is not None:
+                            _emit_finding(filename, start_line, end_line, block_lines, sink)
                         if block_lines > max_lines:
                             max_lines = block_lines
                             worst_block = {
@@ -63,6 +70,29 @@ def detect_commented_code(directory: str) -> Tuple[int, Dict]:
     return len(commented_blocks), worst_block
 
 
+def detect_file(parsed, sink) -> int:
+    """
+    分析引擎的单文件入口
+    
+    Args:
+        parsed: 源文件 (src.sources.ParsedFile)，只用到其文本行
+        sink: 检测结果输出
+        
+    Returns:
+        该文件中的注释代码块数量
+    """
+    file_blocks = _detect_commented_code_in_file(parsed.lines)
+    for start_line, end_line, block_lines in file_blocks:
+        _emit_finding(parsed.filename, start_line, end_line, block_lines, sink)
+    return len(file_blocks)
+
+
+def _emit_finding(filename: str, start_line: int, end_line: int, block_lines: int, sink):
+    """将一个注释代码块写入检测结果输出"""
+    sink.add("commented_code", filename, start_line, block_lines,
+             f"{block_lines} lines of commented-out code", end_lineno=end_line)
+
+
 def _detect_commented_code_in_file(lines: List[str]) -> List[Tuple[int, int, int]]:
     """
     在单个文件中检测注释代码
@@ -1,7 +1,13 @@
 from .CodeSmellHandlers.HandleCyclomaticComplexity.cyclomatic_complexity import (
+    cyclomatic_complexity_in_source,
     output_cyclomatic_complexity,
 )
 
 
-def detect_cyclomatic_complexity(directory: str) -> int:
-    return output_cyclomatic_complexity(directory)
\ No newline at end of file
+def detect_cyclomatic_complexity(directory: str, sink=None) -> int:
+    return output_cyclomatic_complexity(directory, sink=sink)
+
+
+def detect_file(parsed, sink, min_rank: str = "C") -> int:
+    """Per-file entry point of the analysis engine"""
+    return cyclomatic_complexity_in_source(parsed.filename, parsed.source, min_rank, sink)
@@ -4,12 +4,18 @@
 使用简单的AST节点比较方法
 """
 import ast
+import itertools
+import math
 import os
-from typing import List, Tuple, Dict
-from collections import defaultdict
+from typing import List, Optional, Tuple, Dict
+from collections import Counter, defaultdict
 try:
     from src.config_loader import get_config
+    from src.perf import timed_files
 except ImportError:
+    def timed_files(filenames):
+        return filenames
+
     def get_config():
         class SimpleConfig:
             def get_threshold(self, name, default):
@@ -22,12 +28,13 @@ except ImportError:
         return SimpleConfig()
 
 
-def detect_duplicate_code(directory: str) -> Tuple[int, Dict]:
+def detect_duplicate_code(directory: str, sink=None) -> Tuple[int, Dict]:
     """
     检测目录中所有Python文件的重复代码
     
     Args:
         directory: 要检测的目录路径
+        sink: 检测结果输出（可选），每对重复函数写入一条记录
         
     Returns:
         (重复代码块数量, 最严重的重复代码信息)
@@ -42,7 +49,7 @@ def detect_duplicate_code(directory: str) -> Tuple[int, Dict]:
     # 收集所有函数
     all_functions = []
     
-    for filename in os.listdir(directory):
+    for filename in timed_files(os.listdir(directory)):
         if filename.endswith(".py"):
             if config.should_ignore_file(os.path.join(directory, filename)):
                 continue
@@ -52,30 +59,19 @@ def detect_duplicate_code(directory: str) -> Tuple[int, Dict]:
                 with open(file_path, encoding='UTF8') as f:
                     data = f.read()
                     tree = ast.parse(data)
-                    functions = _extract_functions(tree, filename)
-                    all_functions.extend(functions)
+                    all_functions.extend(extract_function_features(tree, filename))
             except Exception as e:
                 continue
     
     # 比较函数找出重复
-    for i, func1 in enumerate(all_functions):
-        for func2 in all_functions[i+1:]:
-            similarity = _calculate_similarity(func1["ast"], func2["ast"])
-            
-            if similarity >= similarity_threshold:
-                duplicates.append({
-                    "file1": func1["filename"],
-                    "file2": func2["filename"],
-                    "name1": func1["name"],
-                    "name2": func2["name"],
-                    "lineno1": func1["lineno"],
-                    "lineno2": func2["lineno"],
-                    "similarity": similarity
-                })
-                
-                if similarity > max_similarity:
-                    max_similarity = similarity
-                    worst_duplicate = duplicates[-1]
+    for duplicate in find_duplicates(all_functions, similarity_threshold):
+        duplicates.append(duplicate)
+        if sink is not None:
+            _emit_finding(duplicate, sink)
+        
+        if duplicate["similarity"] > max_similarity:
+            max_similarity = duplicate["similarity"]
+            worst_duplicate = duplicate
     
     # 生成日志
     _generate_log(duplicates)
@@ -99,6 +95,136 @@ def _extract_functions(tree: ast.AST, filename: str) -> List[Dict]:
     return functions
 
 
+def extract_function_features(tree: ast.AST, filename: str) -> List[Dict]:
+    """
+    提取文件中所有函数的结构特征（不保留AST，可跨运行缓存）
+    
+    Returns:
+        [{"name", "filename", "lineno", "features"}, ...]
+    """
+    return [{"name": func["name"], "filename": func["filename"], "lineno": func["lineno"],
+             "features": frozenset(_extract_features(func["ast"]))}
+            for func in _extract_functions(tree, filename)]
+
+
+def find_duplicates(functions: List[Dict], similarity_threshold: float, other_functions: List[Dict] = ()):
+    """
+    两两比较函数特征，逐个产生相似度不低于阈值的重复函数对
+    
+    Args:
+        functions: extract_function_features 的结果（可来自多个文件）
+        similarity_threshold: 相似度阈值（百分比）
+        other_functions: 增量检测时其余未变化的函数；它们只与 functions 比较，彼此之间不再比较
+    """
+    pool = list(functions) + list(other_functions)
+    index = _FeatureIndex(pool, similarity_threshold)
+    for i, func1 in enumerate(functions):
+        for j in index.candidates(func1["features"]):
+            if j > i:
+                duplicate = _duplicate_pair(func1, pool[j], similarity_threshold)
+                if duplicate is not None:
+                    yield duplicate
+
+
+def find_duplicates_between(functions: List[Dict], other_functions: List[Dict], similarity_threshold: float):
+    """
+    只比较两组函数之间的函数对（组内不比较），用于合并分片结果时查找跨分片的重复函数
+
+    每对中文件名较小的函数作为 file1，与整体检测时按文件名顺序得到的结果一致
+    """
+    other_functions = list(other_functions)
+    index = _FeatureIndex(other_functions, similarity_threshold, functions)
+    for func1 in functions:
+        for j in index.candidates(func1["features"]):
+            func2 = other_functions[j]
+            first, second = (func1, func2) if func1["filename"] <= func2["filename"] else (func2, func1)
+            duplicate = _duplicate_pair(first, second, similarity_threshold)
+            if duplicate is not None:
+                yield duplicate
+
+
+class _FeatureIndex:
+    """
+    候选函数对的倒排索引（前缀过滤），候选结果与两两比较得到的重复函数对完全一致
+
+    Jaccard 相似度不低于 t 的两组特征 x、y（|y| <= |x|），按全局一致的顺序（稀有特征在前）排列后，
+    x 的前 |x| - ceil(t|x|) + 1 个特征（长前缀）与 y 的前 |y| - ceil(2t/(1+t)|y|) + 1 个特征（短前缀）
+    中必有一个相同；大小相差超过 t 倍的两组也不可能达到阈值。因此每个函数只需与前缀中有相同
+    特征的函数比较，而不是与所有函数比较。
+    """
+
+    # 空特征集合的前缀：空集合之间的相似度为 100
+    EMPTY = ("empty",)
+
+    def __init__(self, functions: List[Dict], similarity_threshold: float, queries: List[Dict] = ()):
+        """
+        Args:
+            functions: 被索引的函数
+            similarity_threshold: 相似度阈值（百分比）
+            queries: 将用来查询的其他函数，参与特征的全局排序
+        """
+        # 略微放宽阈值，避免浮点误差漏掉恰好等于阈值的函数对
+        self.ratio = similarity_threshold / 100 - 1e-9
+        frequency = Counter(feature for func in itertools.chain(functions, queries) for feature in func["features"])
+        self._order = lambda feature: (frequency[feature], feature)
+        self._sizes = [len(func["features"]) for func in functions]
+        # 短前缀 / 长前缀中的特征 -> 函数位置
+        self._short, self._long = defaultdict(list), defaultdict(list)
+        for position, func in enumerate(functions):
+            short, long = self._prefixes(func["features"])
+            for feature in short:
+                self._short[feature].append(position)
+            for feature in long:
+                self._long[feature].append(position)
+
+    def _prefixes(self, features) -> Tuple[list, list]:
+        if not features:
+            return [self.EMPTY], [self.EMPTY]
+        ordered = sorted(features, key=self._order)
+        size = len(ordered)
+        return (ordered[:size - math.ceil(2 * self.ratio / (1 + self.ratio) * size) + 1],
+                ordered[:size - math.ceil(self.ratio * size) + 1])
+
+    def candidates(self, features) -> List[int]:
+        """索引中可能与这组特征相似的函数的位置（升序）"""
+        if self.ratio <= 0:
+            # 阈值为 0 时任意两个函数都是重复函数
+            return list(range(len(self._sizes)))
+        size = len(features)
+        short, long = self._prefixes(features)
+        found = set()
+        for feature in long:
+            found.update(position for position in self._short.get(feature, ())
+                         if self.ratio * size <= self._sizes[position] <= size)
+        for feature in short:
+            found.update(position for position in self._long.get(feature, ())
+                         if size < self._sizes[position] and self.ratio * self._sizes[position] <= size)
+        return sorted(found)
+
+
+def _duplicate_pair(func1: Dict, func2: Dict, similarity_threshold: float) -> Optional[Dict]:
+    similarity = _feature_similarity(func1["features"], func2["features"])
+    if similarity < similarity_threshold:
+        return None
+    return {
+        "file1": func1["filename"],
+        "file2": func2["filename"],
+        "name1": func1["name"],
+        "name2": func2["name"],
+        "lineno1": func1["lineno"],
+        "lineno2": func2["lineno"],
+        "similarity": similarity
+    }
+
+
+def _feature_similarity(features1: set, features2: set) -> float:
+    """两组函数特征的Jaccard相似度 (0-100)，特征均为空时视为完全相同"""
+    union = len(features1 | features2)
+    if union == 0:
+        return 100.0
+    return (len(features1 & features2) / union) * 100
+
+
 def _calculate_similarity(node1: ast.AST, node2: ast.AST) -> float:
     """
     计算两个AST节点的相似度
@@ -146,6 +272,15 @@ def _extract_features(node: ast.AST) -> set:
     return features
 
 
+def _emit_finding(dup: Dict, sink):
+    """将一对重复函数写入检测结果输出"""
+    sink.add("duplicate_code", dup["file1"], dup["lineno1"], round(dup["similarity"], 1),
+             f"Function {dup['name1']} is {dup['similarity']:.1f}% similar to "
+             f"{dup['name2']} in {dup['file2']}",
+             name=dup["name1"],
+             related={"filename": dup["file2"], "lineno": dup["lineno2"], "name": dup["name2"]})
+
+
 def _generate_log(duplicates: List[Dict]):
     """生成重复代码日志"""
     config = get_config()
@@ -1,9 +1,20 @@
 import ast
-from .CodeSmellHandlers.HandleLongStatementSmell.long_statement import output_long_statements
+from .CodeSmellHandlers.HandleLongStatementSmell.long_statement import output_long_statements, \
+    get_long_statement_source, emit_findings
 
-def detect_long_list_comp(directory, limit):
+# Statements longer than this many characters are reported
+LONG_LIST_COMP_LIMIT = 72
+
+def detect_long_list_comp(directory, limit, sink=None):
     num_long_statements = 0
-    output = output_long_statements(directory,limit,ast.ListComp)
+    output = output_long_statements(directory,limit,ast.ListComp,sink)
     for file_stmt_tuple in output[0]:
         num_long_statements += len(file_stmt_tuple[1])
     return (num_long_statements,output[1])
+
+
+def detect_file(parsed, sink, limit=LONG_LIST_COMP_LIMIT):
+    """Per-file entry point of the analysis engine"""
+    long_stmts = get_long_statement_source(parsed.tree, limit, ast.ListComp)
+    emit_findings(parsed.filename, long_stmts, ast.ListComp, sink)
+    return len(long_stmts)
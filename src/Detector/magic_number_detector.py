@@ -10,7 +10,11 @@ from typing import List, Tuple, Dict
 # 尝试导入配置，如果失败则使用默认值
 try:
     from src.config_loader import get_config
+    from src.perf import timed_files
 except ImportError:
+    def timed_files(filenames):
+        return filenames
+
     def get_config():
         class SimpleConfig:
             def get_threshold(self, name, default):
@@ -23,12 +27,13 @@ except ImportError:
         return SimpleConfig()
 
 
-def detect_magic_numbers(directory: str) -> Tuple[int, Dict]:
+def detect_magic_numbers(directory: str, sink=None) -> Tuple[int, Dict]:
     """
     检测目录中所有Python文件的魔法数字
     
     Args:
         directory: 要检测的目录路径
+        sink: 检测结果输出（可选），每发现一个魔法数字写入一条记录
         
     Returns:
         (魔法数字总数, 最严重的魔法数字信息)
@@ -40,7 +45,7 @@ def detect_magic_numbers(directory: str) -> Tuple[int, Dict]:
     worst_magic = {}
     max_count = 0
     
-    for filename in os.listdir(directory):
+    for filename in timed_files(os.listdir(directory)):
         if filename.endswith(".py"):
             if config.should_ignore_file(os.path.join(directory, filename)):
                 continue
@@ -54,6 +59,8 @@ def detect_magic_numbers(directory: str) -> Tuple[int, Dict]:
                     
                     for number, count, lineno in file_magic:
                         magic_numbers.append((filename, number, count, lineno))
+                        if sink is not None:
+                            _emit_finding(filename, number, count, lineno, sink)
                         if count > max_count:
                             max_count = count
                             worst_magic = {
@@ -71,6 +78,30 @@ def detect_magic_numbers(directory: str) -> Tuple[int, Dict]:
     return len(magic_numbers), worst_magic
 
 
+def detect_file(parsed, sink) -> int:
+    """
+    分析引擎的单文件入口
+    
+    Args:
+        parsed: 已解析的源文件 (src.sources.ParsedFile)
+        sink: 检测结果输出
+        
+    Returns:
+        该文件中的魔法数字数量
+    """
+    threshold = get_config().get_threshold("magic_number_threshold", 3)
+    file_magic = _detect_magic_numbers_in_file(parsed.tree, threshold)
+    for number, count, lineno in file_magic:
+        _emit_finding(parsed.filename, number, count, lineno, sink)
+    return len(file_magic)
+
+
+def _emit_finding(filename: str, number, count: int, lineno: int, sink):
+    """将一个魔法数字写入检测结果输出"""
+    sink.add("magic_number", filename, lineno, count,
+             f"Magic number {number} appears {count} times", number=number)
+
+
 def _detect_magic_numbers_in_file(tree: ast.AST, threshold: int) -> List[Tuple[float, int, int]]:
     """
     在单个文件中检测魔法数字
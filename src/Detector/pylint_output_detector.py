@@ -3,14 +3,24 @@ import os
 import collections
 import re
 # import CodeSmellHandlers.HandleLongMethodSmell.long_method as lm
-from .CodeSmellHandlers.HandleLongMethodSmell.long_method import output_long_methods
+from .CodeSmellHandlers.HandleLongMethodSmell.long_method import output_long_methods, \
+    output_long_methods_in_process
 from ..config_loader import get_config
-def detect_pylint_output(directory):
+SMELL_MESSAGES = {'long_method': 'Method has {} statements',
+                  'long_parameter': 'Method has {} parameters',
+                  'too_many_branches': 'Method has {} branches',
+                  'too_many_methods': 'Class has {} public methods',
+                  'too_many_attributes': 'Class has {} instance attributes'}
+
+
+def detect_pylint_output(directory, sink=None):
     
     output_list = detect_pylint_output_helper(directory)
     analyzed = analyze_result(output_list)
     dirname = directory.split('/')[-1]
     generate_log(dirname, analyzed)
+    if sink is not None:
+        emit_findings(analyzed, sink)
 
     # type: (total number, largest metric)
     na_tuple = (0, {'filename': 'N/A', 'lineno': 'N/A', 'metric': 'N/A'})
@@ -42,6 +52,40 @@ def detect_pylint_output_helper(directory):
     return output_lines
 
 
+def detect_files(parsed_files, sink):
+    """
+    Entry point of the analysis engine: run pylint in-process over several files at once
+
+    Sources that only live in memory are handed to pylint under a virtual path and never
+    written to disk. Findings are named after ParsedFile.filename.
+
+    Parameters:
+        parsed_files (list[ParsedFile]): files to check
+        sink: receives one finding per smell
+
+    Return:
+        smell_info (dict[list[dict]]): as analyze_result
+    """
+    names, paths, in_memory = {}, [], {}
+    for idx, parsed in enumerate(parsed_files):
+        path = parsed.disk_path
+        if path is None:
+            path = os.path.abspath(os.path.join("<memory>", "{:05d}".format(idx), os.path.basename(parsed.filename)))
+            in_memory[path] = parsed.source
+        names[os.path.abspath(path)] = parsed.filename
+        paths.append(path)
+    output = output_long_methods_in_process(paths, in_memory)
+
+    output_lines = [line for line in output.splitlines() if len(line) > 3 and
+                    re.search("(R0915|R0913|R0912|R0904|R0902)", line) is not None]
+    analyzed = analyze_result(output_lines)
+    for smell in analyzed:
+        for elem in analyzed[smell]:
+            elem['filename'] = names.get(os.path.abspath(elem['filename']), elem['filename'])
+    emit_findings(analyzed, sink)
+    return analyzed
+
+
 def analyze_result(smell_list):
     """ 
     Categorize smells based on their types and put filename, lineno, and metric info
@@ -82,7 +126,8 @@ def smell_to_obj(smell):
                   'R0912': 'too_many_branches', 'R0904': 'too_many_methods', \
                   'R0902': 'too_many_attributes'}
     
-    tokens = [tok.lstrip() for tok in smell.split(':')]
+    # split from the right: the file name may itself contain ':' (Windows drive letters)
+    tokens = [tok.lstrip() for tok in smell.rsplit(':', 4)]
     filename, lineno = tokens[0], int(tokens[1])
     smell_type = tokens[3]
     first, sec = tokens[4].find('('), tokens[4].find('/')
@@ -92,6 +137,20 @@ def smell_to_obj(smell):
         
     return obj
 
+def emit_findings(log_object, sink):
+    """
+    Write the analyzed smells to a findings sink
+
+    Parameters:
+        log_object (dict[list[dict]]): output of analyze_result
+        sink (ReportWriters): receives one finding per smell
+    """
+    for smell in log_object:
+        for elem in log_object[smell]:
+            sink.add(smell, elem['filename'], elem['lineno'], elem['metric'],
+                     SMELL_MESSAGES[smell].format(elem['metric']))
+
+
 def generate_log(dirname, log_object):
     config = get_config()
     log_dir = config.get_logs_dir()
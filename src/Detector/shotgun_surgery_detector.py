@@ -1,11 +1,13 @@
 import os
 import collections
 
-from .CodeSmellHandlers.HandleShotgunSurgerySmell.shotgun_surgery import detect_shotgun_surgery_per_file
+from ..perf import timed_files
+from .CodeSmellHandlers.HandleShotgunSurgerySmell.shotgun_surgery import detect_shotgun_surgery_per_file, \
+    detect_shotgun_surgery_in_tree
 
 
-def detect_shotgun_surgery(directory):
-    output_list = output_shotgun_surgery(directory)
+def detect_shotgun_surgery(directory, sink=None):
+    output_list = output_shotgun_surgery(directory, sink)
     num_smelly_class, top = shotgun_output_formatter(output_list)
 
     return num_smelly_class, top
@@ -28,17 +30,37 @@ def shotgun_output_formatter(output_list):
     return smelly_class, top_class
 
 
-def output_shotgun_surgery(directory):
+def output_shotgun_surgery(directory, sink=None):
     output_list = collections.defaultdict(list)
-    for filename in os.listdir(directory):
+    for filename in timed_files(os.listdir(directory)):
         if filename.endswith(".py"):
             file_path = os.path.join(directory, filename)
             ss = detect_shotgun_surgery_per_file(file_path)
             if len(ss) > 0:
                 output_list[filename] = ss
+                if sink is not None:
+                    emit_findings(filename, ss, sink)
 
     return output_list
 
+
+def detect_file(parsed, sink):
+    """Per-file entry point of the analysis engine"""
+    analysis = detect_shotgun_surgery_in_tree(parsed.tree)
+    emit_findings(parsed.filename, analysis, sink)
+    return analysis
+
+
+def emit_findings(filename, analysis, sink):
+    for className, calls in analysis.items():
+        call_lines = [call for call in calls if isinstance(call, int)]
+        summary = [call for call in calls if not isinstance(call, int)]
+        message = 'Class {} makes {} external function calls'.format(className, len(call_lines))
+        if summary:
+            message += ' ({})'.format(summary[0])
+        sink.add("shotgun_surgery", filename, min(call_lines) if call_lines else 'N/A', len(call_lines),
+                 message, class_name=className)
+
 # test run: remove later
 # output = output_shotgun_surgery("../../code-dump/flask-master")
 # ssout, top = detect_shotgun_surgery("../../code-dump/flask-master")
\ No newline at end of file
@@ -3,11 +3,17 @@
 检测类中未使用的属性和方法
 """
 import ast
+import bisect
 import os
-from typing import List, Tuple, Dict, Set
+from collections import defaultdict
+from typing import List, Optional, Tuple, Dict
 try:
     from src.config_loader import get_config
+    from src.perf import timed_files
 except ImportError:
+    def timed_files(filenames):
+        return filenames
+
     def get_config():
         class SimpleConfig:
             def should_ignore_file(self, path):
@@ -17,12 +23,13 @@ except ImportError:
         return SimpleConfig()
 
 
-def detect_unused_members(directory: str) -> Tuple[int, Dict]:
+def detect_unused_members(directory: str, sink=None) -> Tuple[int, Dict]:
     """
     检测目录中所有Python文件的未使用成员
     
     Args:
         directory: 要检测的目录路径
+        sink: 检测结果输出（可选），每个未使用成员写入一条记录
         
     Returns:
         (未使用成员总数, 最严重的文件信息)
@@ -31,7 +38,7 @@ def detect_unused_members(directory: str) -> Tuple[int, Dict]:
     worst_file = {}
     max_unused = 0
     
-    for filename in os.listdir(directory):
+    for filename in timed_files(os.listdir(directory)):
         if filename.endswith(".py"):
             config = get_config()
             if config.should_ignore_file(os.path.join(directory, filename)):
@@ -47,6 +54,8 @@ def detect_unused_members(directory: str) -> Tuple[int, Dict]:
                     if file_unused:
                         unused_count = len(file_unused)
                         unused_members.append((filename, file_unused))
+                        if sink is not None:
+                            _emit_findings(filename, file_unused, sink)
                         if unused_count > max_unused:
                             max_unused = unused_count
                             worst_file = {
@@ -64,6 +73,30 @@ def detect_unused_members(directory: str) -> Tuple[int, Dict]:
     return total_unused, worst_file
 
 
+def detect_file(parsed, sink) -> int:
+    """
+    分析引擎的单文件入口
+    
+    Args:
+        parsed: 已解析的源文件 (src.sources.ParsedFile)
+        sink: 检测结果输出
+        
+    Returns:
+        该文件中的未使用成员数量
+    """
+    file_unused = _detect_unused_members_in_file(parsed.tree)
+    _emit_findings(parsed.filename, file_unused, sink)
+    return len(file_unused)
+
+
+def _emit_findings(filename: str, members: List[Dict], sink):
+    """将未使用成员写入检测结果输出"""
+    for member in members:
+        sink.add("unused_member", filename, member["lineno"], 1,
+                 f"Unused {member['type']} {member['name']}",
+                 member_type=member["type"], name=member["name"])
+
+
 def _detect_unused_members_in_file(tree: ast.AST) -> List[Dict]:
     """
     在单个文件中检测未使用的类成员
@@ -74,24 +107,44 @@ def _detect_unused_members_in_file(tree: ast.AST) -> List[Dict]:
     Returns:
         [{"type": "attribute"/"method", "name": "...", "lineno": ...}, ...]
     """
-    unused = []
-    
-    for node in ast.walk(tree):
+    # 一次前序遍历：每个类的子树是一段连续的位置区间，成员在区间内有使用位置即为被使用；
+    # 嵌套类不再重复遍历外层类已遍历过的子树
+    classes = []
+    uses = defaultdict(list)
+    position = 0
+    stack = [(tree, 0, None)]
+    while stack:
+        node, depth, span = stack.pop()
+        if node is None:
+            # 类的子树遍历完毕
+            span[2] = position
+            continue
+        position += 1
+        name = _used_member_name(node)
+        if name is not None:
+            uses[name].append(position)
         if isinstance(node, ast.ClassDef):
-            class_members = _get_class_members(node)
-            used_members = _get_used_members(node)
-            
-            for member_name, member_info in class_members.items():
-                # 排除特殊方法和私有方法（可能被外部调用）
-                if member_name.startswith('_'):
-                    continue
-                
-                if member_name not in used_members:
-                    unused.append({
-                        "type": member_info["type"],
-                        "name": member_name,
-                        "lineno": member_info["lineno"]
-                    })
+            span = [depth, position, None, node]
+            classes.append(span)
+            stack.append((None, depth, span))
+        stack.extend((child, depth + 1, None) for child in reversed(list(ast.iter_child_nodes(node))))
+
+    unused = []
+    # 按 ast.walk 的顺序（广度优先）报告
+    for _, start, end, node in sorted(classes, key=lambda span: span[:2]):
+        for member_name, member_info in _get_class_members(node).items():
+            # 排除特殊方法和私有方法（可能被外部调用）
+            if member_name.startswith('_'):
+                continue
+
+            positions = uses.get(member_name, ())
+            first = bisect.bisect_left(positions, start)
+            if first == len(positions) or positions[first] > end:
+                unused.append({
+                    "type": member_info["type"],
+                    "name": member_name,
+                    "lineno": member_info["lineno"]
+                })
     
     return unused
 
@@ -117,25 +170,15 @@ def _get_class_members(class_node: ast.ClassDef) -> Dict[str, Dict]:
     return members
 
 
-def _get_used_members(class_node: ast.ClassDef) -> Set[str]:
-    """获取类中被使用的成员名称"""
-    used = set()
-    
-    # 遍历类中所有节点，查找成员访问
-    for node in ast.walk(class_node):
-        if isinstance(node, ast.Attribute):
-            # self.xxx 或 obj.xxx
-            if isinstance(node.value, ast.Name) and node.value.id == 'self':
-                used.add(node.attr)
-            elif isinstance(node.value, ast.Name):
-                # 可能是类实例访问
-                used.add(node.attr)
-        elif isinstance(node, ast.Call):
-            # 方法调用
-            if isinstance(node.func, ast.Attribute):
-                used.add(node.func.attr)
-    
-    return used
+def _used_member_name(node: ast.AST) -> Optional[str]:
+    """节点使用的成员名称：self.xxx、obj.xxx 或方法调用 a.b.xxx()"""
+    if isinstance(node, ast.Attribute):
+        if isinstance(node.value, ast.Name):
+            return node.attr
+    elif isinstance(node, ast.Call):
+        if isinstance(node.func, ast.Attribute):
+            return node.func.attr
+    return None
 
 
 def _generate_log(unused_members: List[Tuple[str, List[Dict]]]):
@@ -1,19 +1,35 @@
 import os
-from .CodeSmellHandlers.HandleExceptionSmell.useless_exception import detect_useless_exception_per_file
+from ..perf import timed_files
+from .CodeSmellHandlers.HandleExceptionSmell.useless_exception import detect_useless_exception_per_file, \
+    detect_useless_exception_in_tree
 
-def detect_useless_exception(directory):
+def detect_useless_exception(directory, sink=None):
     output_list = []
-    for filename in os.listdir(directory):
+    for filename in timed_files(os.listdir(directory)):
         if filename.endswith(".py"):
             file_path = os.path.join(directory, filename)
             long_stmts = detect_useless_exception_per_file(file_path)
             output_list.append((filename,long_stmts))
+            if sink is not None:
+                emit_findings(filename, long_stmts, sink)
     dir_name = os.path.basename(os.path.normpath(directory))
     log_count = generate_log(dir_name, output_list)
     
     return ([line for line in output_list if line[1]], log_count)
 
 
+def detect_file(parsed, sink):
+    """Per-file entry point of the analysis engine"""
+    smelly_lines = detect_useless_exception_in_tree(parsed.tree)
+    emit_findings(parsed.filename, smelly_lines, sink)
+    return smelly_lines
+
+
+def emit_findings(filename, smelly_lines, sink):
+    for lineno, reason in smelly_lines:
+        sink.add("useless_exception", filename, lineno, message=reason)
+
+
 def generate_log(dir_name, output_list):
     log_count = 0
     log_dir = os.path.join("output", "logs")
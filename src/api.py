@@ -0,0 +1,108 @@
+"""
+Library API
+Analyze code held in memory from another program:
+
+    from src.api import analyze, write_reports
+
+    results = analyze([("app/models.py", source), "scripts/tool.py"])
+    for finding in results.findings:
+        ...
+    write_reports(results, "my-project")   # optional: findings files and HTML report
+
+analyze() reads the file paths it is given and nothing else; it writes no logs, charts or
+reports. Files are only written by the renderers, when they are called.
+"""
+import os
+from typing import Iterable, Iterator, Optional, Union
+
+from .archive_sources import is_archive, iter_archive_sources
+from .engine import AnalysisEngine, Results
+from .sources import ParsedFile, iter_python_files, load_sources
+
+# A source: a ParsedFile, a (file name, source code) pair, or the path of a file, directory or
+# zip/tar archive
+Source = Union[ParsedFile, tuple, str, os.PathLike]
+
+
+def iter_sources(sources: Iterable[Source], root: Optional[str] = None,
+                 errors: Optional[list] = None, config=None) -> Iterator[ParsedFile]:
+    """
+    Turn the accepted kinds of sources into ParsedFile objects, lazily
+
+    Args:
+        sources: ParsedFile objects, (file name, source code) pairs, or paths of files, directories and
+            archives (members are named by their path inside the archive)
+        root: files read from disk are named relative to this directory (default: working directory)
+        errors: missing paths and unreadable files (or sources that are not UTF-8) are skipped and
+            appended here as (name, error message)
+        config: ConfigLoader whose ignore rules select the files of directories and archives
+            (default: the global configuration)
+    """
+    for source in sources:
+        if isinstance(source, ParsedFile):
+            yield source
+        elif isinstance(source, tuple):
+            filename, code = source
+            name = os.fspath(filename).replace(os.sep, "/")
+            if isinstance(code, bytes):
+                try:
+                    code = code.decode("utf8")
+                except UnicodeDecodeError as e:
+                    if errors is not None:
+                        errors.append((name, str(e)))
+                    continue
+            yield ParsedFile(name, code)
+        elif isinstance(source, (str, os.PathLike)) and not os.path.exists(source):
+            if errors is not None:
+                errors.append((os.fspath(source), "no such file or directory"))
+        elif isinstance(source, (str, os.PathLike)) and os.path.isfile(source) and is_archive(os.fspath(source)):
+            yield from iter_archive_sources(os.fspath(source), errors=errors, config=config)
+        elif isinstance(source, (str, os.PathLike)):
+            yield from load_sources(iter_python_files([os.fspath(source)], config), root=root, errors=errors)
+        else:
+            raise TypeError("unsupported source: {!r}".format(source))
+
+
+def analyze(sources: Iterable[Source], config=None, sink=None, root: Optional[str] = None,
+            engine: Optional[AnalysisEngine] = None, deadline: Optional[float] = None) -> Results:
+    """
+    Run every enabled detector over the sources and return the results in memory
+
+    Args:
+        sources: ParsedFile objects, (file name, source code) pairs, or paths of files, directories and
+            zip/tar archives; file names must be unique
+        config: ConfigLoader with thresholds and ignore rules (default: the global configuration)
+        sink: receives every finding as soon as it is known (write(finding))
+        root: files read from disk are named relative to this directory
+        engine: analysis engine to reuse, keeping its cache warm between calls
+        deadline: seconds the analysis may take: the cheapest detectors run first over all files and
+            the run stops at the deadline, with partial results (see Results.partial)
+
+    Returns:
+        Results: findings, per-smell totals, statistics and errors (unreadable files included)
+    """
+    engine = engine or AnalysisEngine(config)
+    read_errors = []
+    results = engine.analyze(iter_sources(sources, root, read_errors, config or engine.config), sink,
+                             deadline=deadline)
+    results.errors.extend(read_errors)
+    return results
+
+
+def write_reports(results: Results, dirname: str, extra_formats=(), recorder=None):
+    """
+    Renderer: write the findings files enabled in the configuration (and the HTML report if
+    enabled) to the output directory, as the command line tool does
+
+    Args:
+        results: as returned by analyze()
+        dirname: project name used in the report file names
+        extra_formats: formats generated in addition to the configuration, e.g. ("html",)
+        recorder: perf.Recorder of the run when timings are recorded (performance sidecar)
+    """
+    from .detector import write_findings_reports
+    summary = results.summary()
+    report_summary = {"totals": summary["totals"], "stats": summary["stats"], "skipped": summary["skipped"]}
+    if "partial" in summary:
+        report_summary.update((key, summary[key]) for key in ("partial", "stages", "incomplete_files"))
+    write_findings_reports(dirname, results.findings, report_summary, extra_formats, recorder)
@@ -0,0 +1,127 @@
+"""
+Archive sources
+Analyze zip and tar archives (a release tarball, an uploaded project) without extracting them:
+the Python members are read one at a time straight from the archive and handed to the analysis
+engine as ParsedFile objects named by their path inside the archive. Tar archives are read as a
+stream, so an upload does not even need to be seekable.
+"""
+import os
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator, Optional, Union
+
+from .config_loader import get_config
+from .sources import ParsedFile
+
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# Members larger than this are skipped (and reported as errors) instead of being read into memory
+MAX_MEMBER_SIZE = 16 * 1024 * 1024
+
+
+class ArchiveError(Exception):
+    """The archive cannot be read"""
+
+
+def is_archive(name: str) -> bool:
+    return name.lower().endswith(ZIP_SUFFIXES + TAR_SUFFIXES)
+
+
+def archive_project_name(name: str) -> str:
+    """Project name of an archive: its file name without the archive suffix ("flask-2.0.tar.gz" -> "flask-2.0")"""
+    base = os.path.basename(name.replace("\\", "/"))
+    for suffix in sorted(ZIP_SUFFIXES + TAR_SUFFIXES, key=len, reverse=True):
+        if base.lower().endswith(suffix):
+            return base[:-len(suffix)] or "archive"
+    return base
+
+
+def _member_name(name: str) -> str:
+    name = name.replace("\\", "/")
+    while name.startswith("./"):
+        name = name[2:]
+    return name.lstrip("/")
+
+
+def _wanted(name: str, config=None) -> bool:
+    return name.endswith(".py") and not (config or get_config()).should_ignore_file(name)
+
+
+def _decode(name: str, data: bytes, errors: Optional[list]) -> Optional[ParsedFile]:
+    try:
+        return ParsedFile(name, data.decode("utf8"))
+    except UnicodeDecodeError as e:
+        if errors is not None:
+            errors.append((name, str(e)))
+        return None
+
+
+def _too_large(name: str, size: int, errors: Optional[list]) -> bool:
+    if size <= MAX_MEMBER_SIZE:
+        return False
+    if errors is not None:
+        errors.append((name, "skipped: {} bytes exceeds the member size limit".format(size)))
+    return True
+
+
+def iter_zip_sources(archive: Union[str, BinaryIO], errors: Optional[list] = None,
+                     config=None) -> Iterator[ParsedFile]:
+    """ParsedFile objects of the Python members of a zip archive (path or seekable file object), in archive order"""
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                name = _member_name(info.filename)
+                if info.is_dir() or not _wanted(name, config) or _too_large(name, info.file_size, errors):
+                    continue
+                parsed = _decode(name, zf.read(info), errors)
+                if parsed is not None:
+                    yield parsed
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError) as e:
+        raise ArchiveError("cannot read zip archive: {}".format(e))
+
+
+def iter_tar_sources(archive: Union[str, BinaryIO], errors: Optional[list] = None,
+                     config=None) -> Iterator[ParsedFile]:
+    """
+    ParsedFile objects of the Python members of a (possibly compressed) tar archive, in archive order
+
+    The archive is read front to back in stream mode; only the current member is held in memory.
+    """
+    try:
+        if isinstance(archive, (str, os.PathLike)):
+            tf = tarfile.open(archive, mode="r|*")
+        else:
+            tf = tarfile.open(fileobj=archive, mode="r|*")
+        with tf:
+            for member in tf:
+                name = _member_name(member.name)
+                if not member.isfile() or not _wanted(name, config) or _too_large(name, member.size, errors):
+                    continue
+                parsed = _decode(name, tf.extractfile(member).read(), errors)
+                if parsed is not None:
+                    yield parsed
+    except (tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError("cannot read tar archive: {}".format(e))
+
+
+def iter_archive_sources(archive: Union[str, BinaryIO], name: Optional[str] = None,
+                         errors: Optional[list] = None, config=None) -> Iterator[ParsedFile]:
+    """
+    ParsedFile objects of the Python members of a zip or tar archive, named by their path inside it
+
+    Args:
+        archive: path of the archive, or a binary file object (seekable for zip archives)
+        name: file name deciding the format when archive is a file object (e.g. the upload name)
+        errors: members that are too large or not UTF-8 are skipped and appended here as (name, message)
+        config: ConfigLoader whose ignore rules apply (default: the global configuration)
+
+    Raises:
+        ArchiveError: the archive is corrupt or its format is not supported
+    """
+    name = name or (os.fspath(archive) if isinstance(archive, (str, os.PathLike)) else "")
+    if name.lower().endswith(ZIP_SUFFIXES):
+        return iter_zip_sources(archive, errors, config)
+    if name.lower().endswith(TAR_SUFFIXES):
+        return iter_tar_sources(archive, errors, config)
+    raise ArchiveError("not a zip or tar archive: {}".format(name or "<stream>"))
@@ -0,0 +1,167 @@
+"""
+Batch mode
+Analyze many projects in one invocation. The files of all projects are scheduled together on one
+shared worker pool, most expensive first whatever project they belong to, so no worker idles at a
+project boundary; each project is finished (duplicate detection, reports) as soon as all its files
+are back. A combined summary of all projects is written to <output dir>/batch_summary.json.
+"""
+import collections
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from . import perf
+from .config_loader import get_config
+from .engine import AnalysisEngine
+from .parallel import DEFAULT_CHUNK_SIZE, TimingStore, WorkerPool, assemble_results, default_jobs, \
+    default_timings_path, estimate_costs, file_size, schedule_chunks
+from .sources import display_name, iter_python_files
+
+SUMMARY_FILENAME = "batch_summary.json"
+
+
+def read_project_list(list_file: str) -> List[str]:
+    """
+    Project directories of a list file: one per line, blank lines and "#" comments are skipped,
+    relative paths are relative to the directory of the list file
+    """
+    base = os.path.dirname(os.path.abspath(list_file))
+    projects = []
+    with open(list_file, encoding="utf8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                projects.append(os.path.normpath(os.path.join(base, os.path.expanduser(line))))
+    return projects
+
+
+def project_names(directories: List[str]) -> List[str]:
+    """Report name of every project: its directory name, numbered when several projects share it"""
+    names, seen = [], collections.Counter()
+    for directory in directories:
+        name = os.path.basename(os.path.normpath(directory)) or "project"
+        seen[name] += 1
+        names.append(name if seen[name] == 1 else "{}-{}".format(name, seen[name]))
+    return names
+
+
+class ProjectRun:
+    """Progress of one project of the batch"""
+
+    def __init__(self, name: str, root: str):
+        self.name = name
+        self.root = root
+        self.files: Dict[str, Any] = {}
+        self.errors: List[tuple] = []
+        # chunks still being analyzed
+        self.chunks = 0
+        # Results once finished; its elapsed time counts from the start of the batch
+        self.results = None
+
+
+def run_batch(directories: List[str], jobs: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              write_reports: bool = True, progress=None) -> Dict[str, Any]:
+    """
+    Analyze several projects over one worker pool
+
+    Args:
+        directories: project directories
+        jobs: worker processes (default: one per CPU)
+        chunk_size: most files per task
+        write_reports: write the findings reports of every project, the combined summary and the
+            file timings used to schedule the next run; the findings of a project are dropped from
+            memory once written
+        progress: called with each ProjectRun as soon as it is finished
+
+    Returns:
+        combined summary: {"projects": [...], "totals", "files", "errors", "skipped", "elapsed"}
+    """
+    from .api import write_reports as render
+
+    started = time.perf_counter()
+    config = get_config()
+    plan = AnalysisEngine(config).prepare()
+    runs = [ProjectRun(name, directory) for name, directory in zip(project_names(directories), directories)]
+
+    tasks = []
+    with perf.stage("discovery"):
+        for index, run in enumerate(runs):
+            if not os.path.isdir(run.root):
+                run.errors.append((run.root, "not a directory"))
+                continue
+            tasks.extend((index, path, display_name(path, run.root)) for path in iter_python_files([run.root]))
+    timings = TimingStore(default_timings_path() if write_reports else None)
+    chunks = schedule_chunks(tasks, jobs or default_jobs(), estimate_costs(tasks, timings), chunk_size)
+    paths = {}
+    for chunk in chunks:
+        for index, path, name in chunk:
+            paths[index, name] = path
+        # a chunk may hold files of several projects; count it once for each of them
+        for index in {index for index, _, _ in chunk}:
+            runs[index].chunks += 1
+
+    def finish(run: ProjectRun):
+        with perf.stage("duplicate_code", detector=True):
+            run.results = assemble_results(run.files, plan.duplicates, plan.thresholds["duplicate"], run.errors,
+                                           time.perf_counter() - started)
+        run.files = {}
+        if write_reports:
+            with perf.stage("reports"):
+                render(run.results, run.name)
+        if progress is not None:
+            progress(run)
+        if write_reports:
+            # the findings are in the reports now; keep only the totals for the combined summary
+            run.results.findings = []
+
+    for run in runs:
+        if run.chunks == 0:
+            finish(run)
+    with WorkerPool(jobs, config) as pool:
+        for outcomes, errors in pool.run(chunks):
+            touched = set()
+            for index, name, file_result, error, seconds in outcomes:
+                run = runs[index]
+                touched.add(index)
+                if file_result is None:
+                    run.errors.append((name, error))
+                else:
+                    run.files[name] = file_result
+                    path = paths[index, name]
+                    timings.record(path, file_size(path), seconds)
+            for index in sorted(touched):
+                run = runs[index]
+                run.errors.extend(("pylint", error) for error in errors)
+                run.chunks -= 1
+                if run.chunks == 0:
+                    finish(run)
+    timings.save()
+
+    summary = combined_summary(runs, time.perf_counter() - started)
+    if write_reports:
+        output_dir = config.get_output_dir()
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, SUMMARY_FILENAME), "w", encoding="utf8") as f:
+            json.dump(summary, f, indent=2)
+    return summary
+
+
+def combined_summary(runs: List[ProjectRun], elapsed: float) -> Dict[str, Any]:
+    totals = collections.Counter()
+    projects = []
+    for run in runs:
+        summary = run.results.summary()
+        totals.update(summary["totals"])
+        projects.append({"project": run.name, "root": run.root, "files": summary["files"],
+                         "findings": sum(summary["totals"].values()), "totals": summary["totals"],
+                         "errors": summary["errors"], "skipped": summary["skipped"],
+                         "elapsed": summary["elapsed"]})
+    return {
+        "projects": projects,
+        "totals": dict(totals),
+        "files": sum(project["files"] for project in projects),
+        "errors": sum(len(project["errors"]) for project in projects),
+        "skipped": sum(len(project["skipped"]) for project in projects),
+        "elapsed": round(elapsed, 4),
+    }
@@ -2,6 +2,7 @@
 配置加载模块
 支持从YAML配置文件加载配置，并提供默认配置
 """
+import copy
 import os
 import yaml
 from typing import Dict, Any, List, Optional, TYPE_CHECKING
@@ -39,6 +40,14 @@ class ConfigLoader:
             "generate_pdf": True,
             "generate_html": False,
             "generate_json": False,
+            "generate_ndjson": False,
+            "generate_sarif": False,
+            "generate_timings": False,
+        },
+        "limits": {
+            "file_timeout": 60,
+            "worker_memory_mb": 0,
+            "max_tasks_per_worker": 100,
         },
         "visualization": {
             "chart_types": ["bar", "pie"],
@@ -54,7 +63,7 @@ class ConfigLoader:
         Args:
             config_path: 配置文件路径，如果为None则使用默认配置
         """
-        self.config = self.DEFAULT_CONFIG.copy()
+        self.config = copy.deepcopy(self.DEFAULT_CONFIG)
         if config_path and os.path.exists(config_path):
             self.load_config(config_path)
     
@@ -86,12 +95,12 @@ class ConfigLoader:
         import fnmatch
         
         # 检查目录忽略规则
-        for pattern in self.config.get("ignore", {}).get("directories", []):
+        for pattern in self.config.get("ignore", {}).get("directories") or []:
             if fnmatch.fnmatch(file_path, f"*{pattern}*"):
                 return True
         
         # 检查文件忽略规则
-        for pattern in self.config.get("ignore", {}).get("files", []):
+        for pattern in self.config.get("ignore", {}).get("files") or []:
             if fnmatch.fnmatch(file_path, pattern):
                 return True
         
@@ -99,9 +108,13 @@ class ConfigLoader:
     
     def should_ignore_detector(self, detector_name: str) -> bool:
         """检查检测器是否应该被忽略"""
-        ignored = self.config.get("ignore", {}).get("detectors", [])
+        ignored = self.config.get("ignore", {}).get("detectors") or []
         return detector_name in ignored
     
+    def get_limit(self, name: str, default: Any = None) -> Any:
+        """获取并行分析的资源限制（0 或未设置表示不限制）"""
+        return self.config.get("limits", {}).get(name, default)
+
     def get_output_dir(self) -> str:
         """获取输出目录"""
         return self.config.get("output", {}).get("directory", "output")
@@ -114,6 +127,10 @@ class ConfigLoader:
         """获取日志目录"""
         return self.config.get("output", {}).get("logs_directory", "output/logs")
 
+    def should_generate(self, report_format: str) -> bool:
+        """检查是否生成某种格式的报告（pdf/html/json/ndjson/sarif）"""
+        return bool(self.config.get("output", {}).get(f"generate_{report_format}", False))
+
 
 # 全局配置实例
 _global_config: Optional[ConfigLoader] = None
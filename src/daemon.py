@@ -0,0 +1,131 @@
+"""
+Analysis daemon
+A long-lived local process that keeps the detectors (pylint, radon, astroid, ...) imported and the
+per-file results of the analysis engine cached, so that small runs (pre-commit hooks, editors)
+do not pay interpreter start-up and imports every time.
+
+The daemon listens on a localhost TCP port. Each connection carries one request and its response,
+both as JSON lines (UTF-8, one object per line):
+
+    request   {"cmd": "analyze", "paths": ["/abs/path", ...], "root": "/abs/cwd"}
+    response  {"finding": {...}}             one line per finding, sent as soon as it is known
+              {"done": true, "totals": ..., "stats": ..., "files": ..., "cached_files": ...,
+               "errors": [...], "elapsed": ...}
+
+    request   {"cmd": "ping"}       response {"ok": true, "pid": ..., "cached_files": ...}
+    request   {"cmd": "shutdown"}   response {"ok": true}
+
+Errors are answered with {"error": "<message>"}. tools/smell_client.py is the matching client.
+"""
+import json
+import os
+import socketserver
+import threading
+from typing import Any, Dict
+
+from .engine import AnalysisEngine
+from .sources import ParsedFile, iter_python_files, load_sources
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Longest accepted request line
+MAX_REQUEST_SIZE = 1 << 20
+
+# Analyzed once at start-up so the first real request does not pay pylint's initialization
+_WARM_UP_SOURCE = "class Warm:\n    def run(self, a, b):\n        return [x for x in (a, b)]\n"
+
+
+class _SocketSink:
+    """Stream findings to the client; a client that went away stops the writes, not the analysis"""
+
+    def __init__(self, handler: "_RequestHandler"):
+        self.handler = handler
+
+    def write(self, finding: Dict[str, Any]):
+        self.handler.send({"finding": finding})
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def setup(self):
+        super().setup()
+        self.connected = True
+
+    def send(self, message: Dict[str, Any]):
+        if not self.connected:
+            return
+        try:
+            self.wfile.write(json.dumps(message, ensure_ascii=False).encode("utf8") + b"\n")
+        except OSError:
+            self.connected = False
+
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_SIZE)
+        try:
+            request = json.loads(line)
+            cmd = request.get("cmd")
+        except (ValueError, AttributeError):
+            self.send({"error": "invalid request"})
+            return
+
+        if cmd == "ping":
+            self.send({"ok": True, "pid": os.getpid(), "cached_files": len(self.server.engine.cache)})
+        elif cmd == "shutdown":
+            self.send({"ok": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif cmd == "analyze":
+            self._analyze(request)
+        else:
+            self.send({"error": "unknown command: {}".format(cmd)})
+
+    def _analyze(self, request: Dict[str, Any]):
+        paths = request.get("paths") or []
+        root = request.get("root") or os.getcwd()
+        if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+            self.send({"error": "paths must be a list of strings"})
+            return
+        paths = [os.path.join(root, path) for path in paths]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            self.send({"error": "no such file or directory: {}".format(", ".join(missing))})
+            return
+
+        errors = []
+        # pylint is not thread safe: one analysis at a time, further clients wait
+        with self.server.lock:
+            results = self.server.engine.analyze(
+                load_sources(iter_python_files(paths), root=root, errors=errors),
+                sink=_SocketSink(self), keep_findings=False)
+        summary = results.summary()
+        summary["errors"] = [list(error) for error in errors] + summary["errors"]
+        self.send(dict(done=True, **summary))
+
+
+class AnalysisServer(socketserver.ThreadingTCPServer):
+    """TCP server owning one warm AnalysisEngine"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), engine: AnalysisEngine = None):
+        super().__init__(address, _RequestHandler)
+        self.engine = engine or AnalysisEngine()
+        self.lock = threading.Lock()
+
+    def warm_up(self):
+        """Run the detectors once so every lazily imported module is loaded"""
+        with self.lock:
+            self.engine.analyze([ParsedFile("<warm-up>.py", _WARM_UP_SOURCE)])
+            self.engine.cache.clear()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Run the daemon until it receives a shutdown request (or Ctrl+C)"""
+    with AnalysisServer((host, port)) as server:
+        server.warm_up()
+        print("Code smell daemon listening on {}:{} (pid {})".format(host, server.server_address[1], os.getpid()),
+              flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -14,15 +14,23 @@ from .Detector.commented_code_detector import detect_commented_code
 from .Detector.unused_member_detector import detect_unused_members
 from .Detector.duplicate_code_detector import detect_duplicate_code
 from .config_loader import get_config
+from . import perf
 from tools.viz_generator import add_viz
+from tools.report_html import generate_html_report
+from tools.report_writers import findings_path, open_report_writers
+from tools.findings_index import build_findings_index
 
-def detect_main(directory, config_path=None):
+# Streaming findings formats, each enabled by output.generate_<format> in config.yaml
+REPORT_FORMATS = ("json", "ndjson", "sarif")
+
+def detect_main(directory, config_path=None, extra_formats=()):
     """
     主检测函数
     
     Args:
         directory: 要检测的目录路径
         config_path: 配置文件路径（可选）
+        extra_formats: 在配置之外额外生成的报告格式（如 Web 端总是需要 "html"）
     """
     # 加载配置
     if config_path:
@@ -44,175 +52,248 @@ def detect_main(directory, config_path=None):
     except Exception:
         pass
     
+    dirname = os.path.basename(os.path.normpath(directory))
+
+    # Open the streaming writers selected in the output config; findings are written as they are detected.
+    # The HTML report pages through the indexed NDJSON file, so it needs NDJSON output as well.
+    output_dir = config.get_output_dir()
+    formats = {fmt for fmt in REPORT_FORMATS + ("pdf", "html", "timings") if config.should_generate(fmt)}
+    formats.update(extra_formats)
+
+    # Timings of every stage, detector and file (see src/perf.py), into the caller's recorder when
+    # it is already recording (e.g. --trace)
+    outer = perf.active()
+    recorder = outer or (perf.start() if "timings" in formats else None)
+
     # Get stats for files in directory
-    stats_dict = get_stats(directory)
+    with perf.stage("stats"):
+        stats_dict = get_stats(directory)
+    if "html" in formats:
+        formats.add("ndjson")
+    sink = open_report_writers(dirname, output_dir, [fmt for fmt in REPORT_FORMATS if fmt in formats])
 
-    # Setup PDF
-    pdf = FPDF(format='letter')
-    pdf.add_page()
+    try:
+        summary_lines, totals = _run_detectors(directory, sink, config, stats_dict)
+    except BaseException:
+        # no half-written findings files or open handles are left behind (the web app lives on)
+        sink.abort()
+        if recorder is not None and recorder is not outer:
+            perf.stop()
+        raise
+
+    sink.close({"project": dirname, "totals": totals, "stats": stats_dict})
+    if "ndjson" in formats:
+        with perf.stage("findings_index"):
+            build_findings_index(findings_path(output_dir, dirname, "ndjson"))
+
+    with perf.stage("charts"):
+        add_viz()
+
+    plot_dir = config.get_plots_dir()
+    # Create plots directory if it doesn't exist
+    if not os.path.exists(plot_dir):
+        os.makedirs(plot_dir, exist_ok=True)
     
-    # Enable Unicode support for Chinese characters
-    pdf.set_auto_page_break(auto=True, margin=15)
+    # Create output directory if it doesn't exist
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
 
-    dirname = os.path.basename(os.path.normpath(directory))
+    if "pdf" in formats:
+        if recorder is not None and "timings" in formats:
+            add_summary_line(summary_lines, "[ Performance ]", 10)
+            for text in perf.report_lines(recorder.summary()):
+                add_summary_line(summary_lines, text, 10)
+        with perf.stage("pdf"):
+            write_pdf_report(dirname, summary_lines, plot_dir, output_dir)
 
-    # Print Title
-    pdf.set_font("times", style='b', size=24)
-    header_text = 'Code Smell Summary: {}'.format(dirname)
-    write_pdf_line(pdf, header_text, 20)
+    # the HTML report shows the timings known so far; the sidecar is completed once it is written
+    timings = recorder is not None and "timings" in formats
+    if timings:
+        perf.write_sidecar(dirname, recorder)
+    else:
+        perf.remove_sidecar(dirname)
+    if "html" in formats:
+        with perf.stage("html"):
+            generate_html_report(dirname)
+    if recorder is not None and recorder is not outer:
+        perf.stop()
+    if timings:
+        perf.write_sidecar(dirname, recorder)
+
+
+def _run_detectors(directory, sink, config, stats_dict):
+    """
+    Run every detector over the code-dump directory, writing the findings to sink
+
+    Returns:
+        (summary lines of the PDF report, per-smell totals)
+    """
+    # Summary lines are collected first and rendered to PDF at the end (if enabled)
+    summary_lines = []
+    totals = {}
 
-    pdf.set_font("times", size=12)
     # Print Pylint Output
     header_text = "[ Long Methods ]"
-    write_pdf_line(pdf, header_text, 10)
-    long_method, long_params, long_branches, many_attrbs, many_methods = \
-        detect_pylint_output(directory)
+    add_summary_line(summary_lines, header_text, 10)
+    with perf.stage("pylint", detector=True):
+        long_method, long_params, long_branches, many_attrbs, many_methods = \
+            detect_pylint_output(directory, sink)
+    totals.update(long_method=long_method[0], long_parameter=long_params[0], too_many_branches=long_branches[0],
+                  too_many_attributes=many_attrbs[0], too_many_methods=many_methods[0])
     pylint_text = "   - Number of Long Methods / Total number of Methods: {} / {}".format(str(long_method[0]),
                                                                                           str(stats_dict["methods"]))
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "   - Longest Method:"
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * File Name: {}".format(long_method[1]['filename'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Line Number: {}".format(long_method[1]['lineno'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Number of Statements: {}".format(long_method[1]['metric'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
 
     header_text = "[ Long Parameter ]"
-    write_pdf_line(pdf, header_text, 10)
-    pdf.set_font("times", size=12)
+    add_summary_line(summary_lines, header_text, 10)
     pylint_text = "   - Number of Methods with Long Parameter / Total number of Methods: {} / {}".format(
         str(long_params[0]), str(stats_dict["methods"]))
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "   - Method with Longest Parameter:"
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * File Name: {}".format(long_params[1]['filename'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Line Number: {}".format(long_params[1]['lineno'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Number of Parameters: {}".format(long_params[1]['metric'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
 
     header_text = "[ Long Branches ]"
-    write_pdf_line(pdf, header_text, 10)
-    pdf.set_font("times", size=12)
+    add_summary_line(summary_lines, header_text, 10)
     pylint_text = "   - Number of Long Branches: {}".format(str(long_branches[0]))
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "   - Longest Branch:"
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * File Name: {}".format(long_branches[1]['filename'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Line Number: {}".format(long_branches[1]['lineno'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Number of Branches: {}".format(long_branches[1]['metric'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
 
     header_text = "[ Too Many Attributes in Class ]"
-    write_pdf_line(pdf, header_text, 10)
-    pdf.set_font("times", size=12)
+    add_summary_line(summary_lines, header_text, 10)
     pylint_text = "   - Number of Classes with Many Attributes: {}/{}".format(str(many_attrbs[0]),
                                                                               str(stats_dict["classes"]))
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "   - Class with most Attributes:"
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * File Name: {}".format(many_attrbs[1]['filename'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Line Number: {}".format(many_attrbs[1]['lineno'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Number of Attributes in Class: {}".format(many_attrbs[1]['metric'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
 
     header_text = "[ Too Many Methods in Class ]"
-    write_pdf_line(pdf, header_text, 10)
-    pdf.set_font("times", size=12)
+    add_summary_line(summary_lines, header_text, 10)
     pylint_text = "   - Number of Classes with Many Methods: {}/{}".format(str(many_methods[0]),
                                                                            str(stats_dict["classes"]))
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "   - Class with most methods:"
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * File Name: {}".format(many_methods[1]['filename'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Line Number: {}".format(many_methods[1]['lineno'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
     pylint_text = "              * Number of Methods in Class: {}".format(many_methods[1]['metric'])
-    write_pdf_line(pdf, pylint_text, 10)
+    add_summary_line(summary_lines, pylint_text, 10)
 
     # Print useless try...except
 
     header_text = "[ Useless Try/Except Clauses ]"
-    write_pdf_line(pdf, header_text, 10)
-    useless_try = detect_useless_exception(directory)
+    add_summary_line(summary_lines, header_text, 10)
+    with perf.stage("useless_exception", detector=True):
+        useless_try = detect_useless_exception(directory, sink)
+    totals["useless_exception"] = useless_try[1]
     body_text = "   - Number of Useless Try-Except / Total Try-Except: {}/{}".format(str(useless_try[1]),
                                                                                      str(stats_dict["try"]))
-    write_pdf_line(pdf, body_text, 10)
+    add_summary_line(summary_lines, body_text, 10)
 
     # Print Shotgun Surgery
     header_text = "[ Shotgun Surgery ]"
-    num_shotgun, most_external = detect_shotgun_surgery(directory)
-    write_pdf_line(pdf, header_text, 10)
+    with perf.stage("shotgun_surgery", detector=True):
+        num_shotgun, most_external = detect_shotgun_surgery(directory, sink)
+    totals["shotgun_surgery"] = num_shotgun
+    add_summary_line(summary_lines, header_text, 10)
     body_text = "   - Smelly Class / Total Class: {}/{}".format(num_shotgun, str(stats_dict["classes"]))
-    write_pdf_line(pdf, body_text, 10)
+    add_summary_line(summary_lines, body_text, 10)
     body_text = "   - Class with Most External Functions:"
-    write_pdf_line(pdf, body_text, 10)
+    add_summary_line(summary_lines, body_text, 10)
     text = "              * File Name: {}".format(most_external[0])
-    write_pdf_line(pdf, text, 10)
+    add_summary_line(summary_lines, text, 10)
     text = "              * Class Name: {}".format(most_external[1])
-    write_pdf_line(pdf, text, 10)
+    add_summary_line(summary_lines, text, 10)
     text = "              * Number of External Function Calls: {}".format(most_external[2])
-    write_pdf_line(pdf, text, 10)
+    add_summary_line(summary_lines, text, 10)
 
     # Print Cohesion Output
     header_text = "[ Class Cohesion ]"
-    write_pdf_line(pdf, header_text, 10)
-    cohesion_output = detect_class_cohesion(directory, 30)
+    add_summary_line(summary_lines, header_text, 10)
+    with perf.stage("class_cohesion", detector=True):
+        cohesion_output = detect_class_cohesion(directory, 30, sink)
+    totals["class_cohesion"] = cohesion_output
     cohesion_text = "   - Classes with Low Cohesion/Total number of Classe: {}/{}".format(str(cohesion_output),
                                                                                           str(stats_dict["classes"]))
-    write_pdf_line(pdf, cohesion_text, 10)
+    add_summary_line(summary_lines, cohesion_text, 10)
 
     # Print Code Complexity
     header_text = "[ Code Complexity ]"
-    write_pdf_line(pdf, header_text, 10)
-    cc_output = detect_cyclomatic_complexity(directory)
+    add_summary_line(summary_lines, header_text, 10)
+    with perf.stage("cyclomatic_complexity", detector=True):
+        cc_output = detect_cyclomatic_complexity(directory, sink)
+    totals["cyclomatic_complexity"] = cc_output
     cc_text = "   - Blocks with Cyclomatic Complexity Rank Lower than 'C' / Total Number of Code Blocks: {}/{}".format(
         str(cc_output), str(stats_dict["codeblocks"]))
-    write_pdf_line(pdf, cc_text, 10)
+    add_summary_line(summary_lines, cc_text, 10)
 
     # Print Long Lambda
     header_text = "[ Long Lambda ]"
-    write_pdf_line(pdf, header_text, 10)
-    long_lambda_output = detect_long_lambda(directory, 60)
+    add_summary_line(summary_lines, header_text, 10)
+    with perf.stage("long_lambda", detector=True):
+        long_lambda_output = detect_long_lambda(directory, 60, sink)
+    totals["long_lambda"] = long_lambda_output[0]
     long_lambda_text = "   - Number of Long Lambda Functions / Number of Lambda Functions: {}/{}".format(
         str(long_lambda_output[0]), str(stats_dict["lambdas"]))
-    write_pdf_line(pdf, long_lambda_text, 10)
+    add_summary_line(summary_lines, long_lambda_text, 10)
 
     if long_lambda_output[1] != {}:
         text = "   - Longest Lambda:"
-        write_pdf_line(pdf, text, 10)
+        add_summary_line(summary_lines, text, 10)
         text = "              * Filename: {}".format(str(long_lambda_output[1]['filename']))
-        write_pdf_line(pdf, text, 10)
+        add_summary_line(summary_lines, text, 10)
         text = "              * Line Number: {}".format(str(long_lambda_output[1]['lineno']))
-        write_pdf_line(pdf, text, 10)
+        add_summary_line(summary_lines, text, 10)
         text = "              * Lambda Length: {}".format(str(long_lambda_output[1]['line length']))
-        write_pdf_line(pdf, text, 10)
+        add_summary_line(summary_lines, text, 10)
 
     # Print Long List Comprehension
     header_text = "[ Long List Comprehension ]"
-    write_pdf_line(pdf, header_text, 10)
-    long_list_comp_output = detect_long_list_comp(directory, 72)
+    add_summary_line(summary_lines, header_text, 10)
+    with perf.stage("long_list_comp", detector=True):
+        long_list_comp_output = detect_long_list_comp(directory, 72, sink)
+    totals["long_list_comp"] = long_list_comp_output[0]
     long_list_comp_text = "   - Number of Long List Comprehension / Number of List Comprehensions: {}/{}".format(
         str(long_list_comp_output[0]), str(stats_dict["listcomps"]))
-    write_pdf_line(pdf, long_list_comp_text, 10)
+    add_summary_line(summary_lines, long_list_comp_text, 10)
 
     if long_list_comp_output[1] != {}:
         text = "   - Longest List Comprehension:"
-        write_pdf_line(pdf, text, 10)
+        add_summary_line(summary_lines, text, 10)
         text = "              * Filename: {}".format(str(long_list_comp_output[1]['filename']))
-        write_pdf_line(pdf, text, 10)
+        add_summary_line(summary_lines, text, 10)
         text = "              * Line Number: {}".format(str(long_list_comp_output[1]['lineno']))
-        write_pdf_line(pdf, text, 10)
+        add_summary_line(summary_lines, text, 10)
         text = "              * List Comprehension Length: {}".format(str(long_list_comp_output[1]['line length']))
-        write_pdf_line(pdf, text, 10)
+        add_summary_line(summary_lines, text, 10)
 
     # New Detectors
     config = get_config()
@@ -220,88 +301,152 @@ def detect_main(directory, config_path=None):
     # Magic Number Detection
     if not config.should_ignore_detector("magic_number"):
         header_text = "[ Magic Numbers ]"
-        write_pdf_line(pdf, header_text, 10)
-        magic_output = detect_magic_numbers(directory)
+        add_summary_line(summary_lines, header_text, 10)
+        with perf.stage("magic_number", detector=True):
+            magic_output = detect_magic_numbers(directory, sink)
+        totals["magic_number"] = magic_output[0]
         magic_text = "   - Number of Magic Numbers Found: {}".format(str(magic_output[0]))
-        write_pdf_line(pdf, magic_text, 10)
+        add_summary_line(summary_lines, magic_text, 10)
         if magic_output[1] and magic_output[1].get('number') is not None:
             text = "   - Most Frequent Magic Number:"
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Filename: {}".format(str(magic_output[1]['filename']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Number: {}".format(str(magic_output[1]['number']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Occurrences: {}".format(str(magic_output[1]['count']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Line Number: {}".format(str(magic_output[1]['lineno']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
 
     # Commented Code Detection
     if not config.should_ignore_detector("commented_code"):
         header_text = "[ Commented Code ]"
-        write_pdf_line(pdf, header_text, 10)
-        commented_output = detect_commented_code(directory)
+        add_summary_line(summary_lines, header_text, 10)
+        with perf.stage("commented_code", detector=True):
+            commented_output = detect_commented_code(directory, sink)
+        totals["commented_code"] = commented_output[0]
         commented_text = "   - Number of Commented Code Blocks: {}".format(str(commented_output[0]))
-        write_pdf_line(pdf, commented_text, 10)
+        add_summary_line(summary_lines, commented_text, 10)
         if commented_output[1] and commented_output[1].get('filename'):
             text = "   - Largest Commented Block:"
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Filename: {}".format(str(commented_output[1]['filename']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Lines: {} (from line {} to {})".format(
                 str(commented_output[1]['lines']),
                 str(commented_output[1]['start_line']),
                 str(commented_output[1]['end_line']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
 
     # Unused Member Detection
     if not config.should_ignore_detector("unused_member"):
         header_text = "[ Unused Class Members ]"
-        write_pdf_line(pdf, header_text, 10)
-        unused_output = detect_unused_members(directory)
+        add_summary_line(summary_lines, header_text, 10)
+        with perf.stage("unused_member", detector=True):
+            unused_output = detect_unused_members(directory, sink)
+        totals["unused_member"] = unused_output[0]
         unused_text = "   - Number of Unused Members: {}".format(str(unused_output[0]))
-        write_pdf_line(pdf, unused_text, 10)
+        add_summary_line(summary_lines, unused_text, 10)
         if unused_output[1] and unused_output[1].get('filename'):
             text = "   - File with Most Unused Members:"
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Filename: {}".format(str(unused_output[1]['filename']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Unused Count: {}".format(str(unused_output[1]['unused_count']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
 
     # Duplicate Code Detection
     if not config.should_ignore_detector("duplicate_code"):
         header_text = "[ Duplicate Code ]"
-        write_pdf_line(pdf, header_text, 10)
-        duplicate_output = detect_duplicate_code(directory)
+        add_summary_line(summary_lines, header_text, 10)
+        with perf.stage("duplicate_code", detector=True):
+            duplicate_output = detect_duplicate_code(directory, sink)
+        totals["duplicate_code"] = duplicate_output[0]
         duplicate_text = "   - Number of Duplicate Code Pairs: {}".format(str(duplicate_output[0]))
-        write_pdf_line(pdf, duplicate_text, 10)
+        add_summary_line(summary_lines, duplicate_text, 10)
         if duplicate_output[1] and duplicate_output[1].get('file1'):
             text = "   - Most Similar Duplicate:"
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * File 1: {} (function: {}, line: {})".format(
                 str(duplicate_output[1]['file1']),
                 str(duplicate_output[1]['name1']),
                 str(duplicate_output[1]['lineno1']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * File 2: {} (function: {}, line: {})".format(
                 str(duplicate_output[1]['file2']),
                 str(duplicate_output[1]['name2']),
                 str(duplicate_output[1]['lineno2']))
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
             text = "              * Similarity: {:.1f}%".format(duplicate_output[1]['similarity'])
-            write_pdf_line(pdf, text, 10)
+            add_summary_line(summary_lines, text, 10)
 
     line = "================================================================================="
-    write_pdf_line(pdf, line, 20)
+    add_summary_line(summary_lines, line, 20)
+    return summary_lines, totals
 
-    add_viz()
 
-    plot_dir = config.get_plots_dir()
-    # Create plots directory if it doesn't exist
-    if not os.path.exists(plot_dir):
-        os.makedirs(plot_dir, exist_ok=True)
+def write_findings_reports(dirname, findings, summary, extra_formats=(), recorder=None):
+    """
+    Write already computed findings to the findings files enabled in the config, and refresh
+    the HTML report if enabled. NDJSON is always written: it is cheap and the HTML report and
+    the findings API read it.
+
+    Args:
+        dirname: project name
+        findings: iterable of finding dicts
+        summary: summary written after the findings ("project" is added)
+        extra_formats: formats generated in addition to the config (the web app always needs "html")
+        recorder: timings of the run, written to the performance sidecar; without it the sidecar of
+            an earlier run is removed
+    """
+    config = get_config()
+    output_dir = config.get_output_dir()
+    formats = [fmt for fmt in REPORT_FORMATS
+               if fmt == "ndjson" or fmt in extra_formats or config.should_generate(fmt)]
+    sink = open_report_writers(dirname, output_dir, formats)
+    try:
+        for finding in findings:
+            sink.write(finding)
+    except BaseException:
+        sink.abort()
+        raise
+    sink.close(dict(summary, project=dirname))
+    build_findings_index(findings_path(output_dir, dirname, "ndjson"))
+    if recorder is not None:
+        perf.write_sidecar(dirname, recorder)
+    else:
+        perf.remove_sidecar(dirname)
+    if "html" in extra_formats or config.should_generate("html"):
+        generate_html_report(dirname)
+
+
+def write_pdf_report(dirname, lines, plot_dir, output_dir):
+    """
+    Render the collected summary lines and bar charts to <output_dir>/<dirname>_review.pdf
+
+    Args:
+        dirname: project name
+        lines: list of (text, text_height) summary lines
+        plot_dir: directory containing the generated charts
+        output_dir: directory the PDF is written to
+    """
+    # Setup PDF
+    pdf = FPDF(format='letter')
+    pdf.add_page()
     
+    # Enable Unicode support for Chinese characters
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    # Print Title
+    pdf.set_font("times", style='b', size=24)
+    header_text = 'Code Smell Summary: {}'.format(dirname)
+    write_pdf_line(pdf, header_text, 20)
+
+    pdf.set_font("times", size=12)
+    for text, text_height in lines:
+        write_pdf_line(pdf, text, text_height)
+
     # Add plots to PDF if they exist
     if os.path.exists(plot_dir) and os.listdir(plot_dir):
         for filename in sorted(os.listdir(plot_dir)):
@@ -309,15 +454,14 @@ def detect_main(directory, config_path=None):
                 pdf.image(os.path.join(plot_dir, filename), w = pdf.w/3.0, h = pdf.h/5.0)
                 pdf.ln(0.15)
     
-    # Create output directory if it doesn't exist
-    output_dir = config.get_output_dir()
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir, exist_ok=True)
-    
     # Output stream to PDF
     pdf.output(os.path.join(output_dir, "{}_review.pdf".format(dirname)))
 
 
+def add_summary_line(lines, text, text_height):
+    lines.append((text, text_height))
+
+
 def write_pdf_line(pdf, text, text_height):
     pdf.write(text_height,text)
     pdf.ln()
@@ -0,0 +1,145 @@
+"""
+Diff mode
+Analyze only the Python files a git change touches, read from the repository at the head commit
+(or from the index for staged changes), and only report smells on changed lines. Duplicate
+detection compares the changed functions with the rest of the repository through the persistent
+function index instead of parsing every file.
+"""
+import ast
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .config_loader import get_config
+from .engine import AnalysisEngine, FindingCollector, Results
+from .function_index import INDEX_FILENAME, FunctionIndex
+from .git_sources import BlobReader, changed_files, changed_lines, parse_range, repo_root, staged_base, \
+    tree_blobs
+from .Detector.duplicate_code_detector import _emit_finding as emit_duplicate, find_duplicates
+
+SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def default_index_path() -> str:
+    return os.path.join(get_config().get_output_dir(), "cache", INDEX_FILENAME)
+
+
+def scope_spans(tree) -> Dict[int, int]:
+    """First line -> last line of every function and class; smells reported on a definition cover its body"""
+    return {node.lineno: node.end_lineno for node in ast.walk(tree) if isinstance(node, SCOPE_NODES)}
+
+
+def in_ranges(first: int, last: int, ranges: List[Tuple[int, int]]) -> bool:
+    return any(start <= last and first <= end for start, end in ranges)
+
+
+def finding_in_ranges(finding, spans: Dict[int, int], ranges: List[Tuple[int, int]]) -> bool:
+    """Whether a finding touches a changed line; findings without a usable line are kept"""
+    lineno = finding.get("lineno")
+    if not isinstance(lineno, int):
+        return True
+    last = finding.get("end_lineno") or spans.get(lineno, lineno)
+    return in_ranges(lineno, last, ranges)
+
+
+def analyze_diff(spec: str, repo: str = ".", sink=None, index_path: str = None,
+                 engine: AnalysisEngine = None) -> Results:
+    """
+    Analyze the Python files changed by a git range
+
+    Args:
+        spec: "<base>..<head>", "<base>...<head>" or "<base>" (compared with HEAD)
+        repo: any directory inside the repository
+        sink: receives every reported finding (write(finding))
+        index_path: function index file; default <output dir>/cache/function_index.json
+        engine: analysis engine to reuse
+
+    Returns:
+        Results holding the findings on changed lines; file names are relative to the repository root
+    """
+    root = repo_root(repo)
+    base, head = parse_range(spec, root)
+    return analyze_changes(root, base, head, sink, index_path, engine)
+
+
+def analyze_staged(repo: str = ".", sink=None, index_path: str = None, engine: AnalysisEngine = None) -> Results:
+    """
+    Analyze exactly what is staged for the next commit (the index), against HEAD
+
+    Blobs are read from the object store, so unstaged edits in the working tree are ignored.
+    Arguments and result as analyze_diff().
+    """
+    root = repo_root(repo)
+    return analyze_changes(root, staged_base(root), None, sink, index_path, engine)
+
+
+def analyze_changes(root: str, base: str, head: Optional[str], sink=None, index_path: str = None,
+                    engine: AnalysisEngine = None) -> Results:
+    """
+    Analyze the Python files changed between base and head (None: the index) of the repository at root
+
+    Files are parsed and analyzed one by one as `git cat-file` streams their contents.
+    """
+    started = time.perf_counter()
+    paths = changed_files(root, base, head)
+    ranges = changed_lines(root, base, head, paths)
+    blobs = tree_blobs(root, head)
+    engine = engine or AnalysisEngine()
+    plan = engine.prepare()
+    results = Results()
+
+    def emit(finding):
+        results.add(finding)
+        if sink is not None:
+            sink.write(finding)
+
+    changed, pending, read_errors = [], [], []
+    with BlobReader(root) as reader:
+        for parsed in reader.iter_sources({path: blobs[path] for path in paths if path in blobs}, read_errors):
+            try:
+                spans = scope_spans(parsed.tree)
+            except (SyntaxError, ValueError):
+                spans = {}
+            file_result, cached = engine.file_result(parsed, plan)
+            if not cached and plan.pylint and file_result.parsed:
+                pending.append((parsed, file_result))
+            changed.append((parsed.filename, file_result, spans))
+        if pending:
+            _, error = engine.run_pylint(pending)
+            if error:
+                results.errors.append(("pylint", error))
+        results.errors.extend(read_errors)
+
+        changed_functions, other_functions = [], []
+        for name, file_result, spans in changed:
+            results.files += 1
+            results.add_stats(file_result.stats)
+            results.errors.extend((name, error) for error in file_result.errors)
+            for finding in file_result.findings:
+                if finding_in_ranges(finding, spans, ranges[name]):
+                    emit(finding)
+            for func in file_result.functions:
+                if in_ranges(func["lineno"], spans.get(func["lineno"], func["lineno"]), ranges[name]):
+                    changed_functions.append(func)
+                else:
+                    other_functions.append(func)
+
+        if plan.duplicates and changed_functions:
+            index = FunctionIndex(index_path or default_index_path())
+            rest = {path: blob for path, blob in blobs.items() if path not in ranges}
+            missing = {path: blob for path, blob in rest.items() if blob not in index}
+            for parsed in reader.iter_sources(missing):
+                index.add_source(missing[parsed.filename], parsed.source)
+            for path, blob in sorted(rest.items()):
+                other_functions.extend(index.functions(blob, path))
+            index.retain(blobs.values())
+            index.save()
+
+            collector = FindingCollector()
+            for duplicate in find_duplicates(changed_functions, plan.thresholds["duplicate"], other_functions):
+                emit_duplicate(duplicate, collector)
+            for finding in collector.findings:
+                emit(finding)
+
+    results.elapsed = time.perf_counter() - started
+    return results
@@ -0,0 +1,507 @@
+"""
+Analysis engine
+Runs every detector over ParsedFile sources (see src/sources.py) instead of over a directory.
+Per-file results are cached by file name and content hash, so a long-lived process such as the
+analysis daemon only analyzes the files that changed since the previous run.
+
+Each file is parsed once and handed to the per-file detectors of FILE_DETECTORS; pylint then runs
+in-process over all new files at once, and duplicate detection compares the function features of
+every file (cached ones included) at the end. A token prefilter (see src/prefilter.py) skips the
+detectors that cannot match a file, and the parse when nothing needs the tree.
+
+With a deadline the run goes stage by stage over all files instead, cheapest first (see
+DEADLINE_STAGES), and stops at the deadline: the results are then partial and record which stages
+and files were completed.
+"""
+import ast
+import collections
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config_loader import get_config
+from . import metrics, perf
+from .findings import make_finding
+from .prefilter import TokenCache, may_match, needs_tree
+from .Detector import class_coupling_detector, commented_code_detector, cyclomatic_complexity_detector, \
+    long_lambda_detector, long_list_comp_detector, magic_number_detector, shotgun_surgery_detector, \
+    unused_member_detector, useless_exception_detector
+from .Detector.duplicate_code_detector import _emit_finding as emit_duplicate, extract_function_features, \
+    find_duplicates
+from .Detector.pylint_output_detector import detect_files as detect_pylint_files
+
+# Files whose results are kept between runs
+DEFAULT_CACHE_SIZE = 20000
+
+# Counters of get_stats, per AST node type
+STATS_NODES = {"FunctionDef": "methods", "ClassDef": "classes", "Lambda": "lambdas", "Try": "try",
+               "ListComp": "listcomps"}
+
+
+def _thresholds(config) -> Dict[str, Any]:
+    return {
+        "cohesion": config.get_threshold("low_cohesion", class_coupling_detector.COHESION_LIMIT),
+        "cc_rank": config.get_threshold("cyclomatic_complexity_rank", "C"),
+        "lambda": config.get_threshold("long_lambda", long_lambda_detector.LONG_LAMBDA_LIMIT),
+        "list_comp": config.get_threshold("long_list_comp", long_list_comp_detector.LONG_LIST_COMP_LIMIT),
+        "magic": config.get_threshold("magic_number_threshold", 3),
+        "duplicate": config.get_threshold("duplicate_code_similarity", 80),
+    }
+
+
+# Detector name (as used in ignore.detectors) -> function(parsed, sink, thresholds)
+FILE_DETECTORS = collections.OrderedDict([
+    ("useless_exception", lambda parsed, sink, t: useless_exception_detector.detect_file(parsed, sink)),
+    ("shotgun_surgery", lambda parsed, sink, t: shotgun_surgery_detector.detect_file(parsed, sink)),
+    ("class_cohesion", lambda parsed, sink, t: class_coupling_detector.detect_file(parsed, sink, t["cohesion"])),
+    ("cyclomatic_complexity",
+     lambda parsed, sink, t: cyclomatic_complexity_detector.detect_file(parsed, sink, t["cc_rank"])),
+    ("long_lambda", lambda parsed, sink, t: long_lambda_detector.detect_file(parsed, sink, t["lambda"])),
+    ("long_list_comp", lambda parsed, sink, t: long_list_comp_detector.detect_file(parsed, sink, t["list_comp"])),
+    ("magic_number", lambda parsed, sink, t: magic_number_detector.detect_file(parsed, sink)),
+    ("commented_code", lambda parsed, sink, t: commented_code_detector.detect_file(parsed, sink)),
+    ("unused_member", lambda parsed, sink, t: unused_member_detector.detect_file(parsed, sink)),
+])
+
+
+# Per-file detectors that cost several times more than the others; with a deadline they run after
+# duplicate detection
+EXPENSIVE_DETECTORS = ("class_cohesion", "cyclomatic_complexity")
+
+# Stages of a run with a deadline, in the order they run: the cheap per-file detectors, duplicate
+# detection, the expensive per-file detectors, pylint
+DEADLINE_STAGES = ("detectors", "duplicate_code", "expensive_detectors", "pylint")
+
+# Most files pylint checks at once with a deadline, so that the deadline is checked between two
+# runs; chunks are smaller when the time left would not be enough for them
+DEADLINE_PYLINT_CHUNK = 50
+
+# Prefix of the error of a file that cannot be parsed
+PARSE_ERROR = "cannot parse: "
+
+
+def pylint_chunk_size(seconds_left: float, seconds_per_file: Optional[float]) -> int:
+    """
+    Files to give the next pylint run with a deadline: one while its speed is unknown, else as many
+    as fit in the time left (at most DEADLINE_PYLINT_CHUNK); 0 when not even one file fits
+    """
+    if seconds_per_file is None:
+        return 1
+    if seconds_per_file <= 0:
+        return DEADLINE_PYLINT_CHUNK
+    return min(DEADLINE_PYLINT_CHUNK, int(seconds_left / seconds_per_file))
+
+
+class FindingCollector:
+    """Sink that keeps the findings in a list"""
+
+    def __init__(self):
+        self.findings: List[Dict[str, Any]] = []
+
+    def add(self, smell: str, filename: str, lineno: Any, metric: Any = None, message: str = "", **extra: Any):
+        self.write(make_finding(smell, filename, lineno, metric, message, **extra))
+
+    def write(self, finding: Dict[str, Any]):
+        self.findings.append(finding)
+
+
+class FileResult:
+    """Everything the engine keeps about one analyzed file"""
+    __slots__ = ("findings", "stats", "functions", "errors")
+
+    def __init__(self):
+        self.findings: List[Dict[str, Any]] = []
+        self.stats: Dict[str, int] = {}
+        # function features for duplicate detection (see extract_function_features)
+        self.functions: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+
+    @property
+    def parsed(self) -> bool:
+        """False when the source could not be parsed; errors of single detectors do not count"""
+        return not any(error.startswith(PARSE_ERROR) for error in self.errors)
+
+
+class FileCache:
+    """Least recently used FileResult per (file name, content hash)"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[tuple, FileResult]" = collections.OrderedDict()
+
+    def get(self, filename: str, digest: str) -> Optional[FileResult]:
+        key = (filename, digest)
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+        metrics.CACHE_REQUESTS.inc(cache="file", result="miss" if result is None else "hit")
+        return result
+
+    def put(self, filename: str, digest: str, result: FileResult):
+        self._entries[(filename, digest)] = result
+        self._entries.move_to_end((filename, digest))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Results:
+    """Findings, per-smell totals and project statistics of one analysis run"""
+
+    def __init__(self, keep_findings: bool = True):
+        self.keep_findings = keep_findings
+        self.findings: List[Dict[str, Any]] = []
+        self.totals: Dict[str, int] = collections.Counter()
+        self.stats: Dict[str, int] = collections.Counter()
+        # (file name or stage, error message)
+        self.errors: List[tuple] = []
+        # (file name, reason) of the files not analyzed because they exceeded a resource limit
+        self.skipped: List[tuple] = []
+        self.files = 0
+        self.cached_files = 0
+        self.elapsed = 0.0
+        # With a deadline: {stage: {"files": files completed, "complete": bool}} in DEADLINE_STAGES
+        # order, and {file name: stages not run} of the files not completed; None without a deadline
+        self.stages: Optional[Dict[str, Dict[str, Any]]] = None
+        self.incomplete: Dict[str, List[str]] = {}
+
+    @property
+    def partial(self) -> bool:
+        """Some stage did not complete: the run stopped at its deadline, or a pylint run failed"""
+        return self.stages is not None and not all(stage["complete"] for stage in self.stages.values())
+
+    def add(self, finding: Dict[str, Any]):
+        self.totals[finding["smell"]] += 1
+        if self.keep_findings:
+            self.findings.append(finding)
+
+    def add_stats(self, stats: Dict[str, int]):
+        self.stats.update(stats)
+
+    def summary(self) -> Dict[str, Any]:
+        stats = {name: self.stats.get(name, 0) for name in STATS_NODES.values()}
+        stats["codeblocks"] = stats["methods"] + stats["classes"]
+        summary = {
+            "totals": dict(self.totals),
+            "stats": stats,
+            "files": self.files,
+            "cached_files": self.cached_files,
+            "errors": [list(error) for error in self.errors],
+            "skipped": [list(skipped) for skipped in self.skipped],
+            "elapsed": round(self.elapsed, 4),
+        }
+        if self.stages is not None:
+            summary.update(partial=self.partial, stages=self.stages, incomplete_files=self.incomplete)
+        return summary
+
+
+def file_stats(tree) -> Dict[str, int]:
+    """Counts of methods, classes, lambdas, try blocks and list comprehensions of one file"""
+    stats = collections.Counter()
+    for node in ast.walk(tree):
+        name = STATS_NODES.get(type(node).__name__)
+        if name:
+            stats[name] += 1
+    return dict(stats)
+
+
+# What a run executes: [(name, detect function)], thresholds, whether pylint and duplicates run
+AnalysisPlan = collections.namedtuple("AnalysisPlan", ["detectors", "thresholds", "pylint", "duplicates"])
+
+
+class AnalysisEngine:
+    """
+    Analyze sources with warm caches
+
+    One engine is meant to live as long as its process; it is not thread safe (pylint is not),
+    callers serialize access to analyze().
+    """
+
+    def __init__(self, config=None, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.config = config
+        self.cache = FileCache(cache_size)
+        # prefilter tokens depend on the content only: they survive a change of settings
+        self.tokens = TokenCache(cache_size)
+        self._settings = None
+
+    def _current_settings(self, config):
+        ignored = tuple(sorted(name for name in list(FILE_DETECTORS) + ["pylint", "duplicate_code"]
+                               if config.should_ignore_detector(name)))
+        return tuple(sorted(_thresholds(config).items())) + ignored
+
+    def prepare(self) -> "AnalysisPlan":
+        """Read the enabled detectors and thresholds from the configuration for the next run"""
+        config = self.config or get_config()
+        settings = self._current_settings(config)
+        if settings != self._settings:
+            # thresholds or enabled detectors changed: cached findings are no longer valid
+            self.cache.clear()
+            self._settings = settings
+        detectors = [(name, detect) for name, detect in FILE_DETECTORS.items()
+                     if not config.should_ignore_detector(name)]
+        return AnalysisPlan(detectors, _thresholds(config), not config.should_ignore_detector("pylint"),
+                            not config.should_ignore_detector("duplicate_code"))
+
+    def analyze(self, sources: Iterable, sink=None, keep_findings: bool = True,
+                deadline: Optional[float] = None) -> Results:
+        """
+        Run all enabled detectors over the sources
+
+        Args:
+            sources: ParsedFile objects; file names must be unique
+            sink: receives every finding as soon as it is known (write(finding))
+            keep_findings: also keep the findings in Results.findings
+            deadline: seconds the run may take; it then runs stage by stage, cheapest first, and
+                stops at the deadline (see Results.partial)
+
+        Returns:
+            Results of the run
+        """
+        started = time.perf_counter()
+        plan = self.prepare()
+        results = Results(keep_findings)
+
+        def emit(finding):
+            results.add(finding)
+            if sink is not None:
+                sink.write(finding)
+
+        if deadline is not None:
+            self._analyze_by_stage(sources, plan, results, emit, started + deadline)
+            results.elapsed = time.perf_counter() - started
+            return results
+
+        pending, functions = [], []
+        for parsed in sources:
+            results.files += 1
+            file_result, cached = self.file_result(parsed, plan)
+            if cached:
+                results.cached_files += 1
+            elif plan.pylint and file_result.parsed:
+                pending.append((parsed, file_result))
+            for finding in file_result.findings:
+                emit(finding)
+            for error in file_result.errors:
+                results.errors.append((parsed.filename, error))
+            results.add_stats(file_result.stats)
+            functions.extend(file_result.functions)
+
+        if pending:
+            with perf.stage("pylint", detector=True):
+                pylint_findings, error = self.run_pylint(pending)
+            if error:
+                results.errors.append(("pylint", error))
+            for findings in pylint_findings.values():
+                for finding in findings:
+                    emit(finding)
+
+        if plan.duplicates:
+            collector = FindingCollector()
+            with perf.stage("duplicate_code", detector=True):
+                for duplicate in find_duplicates(functions, plan.thresholds["duplicate"]):
+                    emit_duplicate(duplicate, collector)
+            for finding in collector.findings:
+                emit(finding)
+
+        results.elapsed = time.perf_counter() - started
+        return results
+
+    def file_result(self, parsed, plan: "AnalysisPlan"):
+        """
+        Per-file detector results of one file, from the cache when its content is unchanged
+
+        A new result still lacks the pylint findings when plan.pylint is set and the file parsed;
+        pass it to run_pylint(), which completes and caches it.
+
+        Returns:
+            (FileResult, whether it came from the cache)
+        """
+        file_result = self._cached(parsed)
+        if file_result is not None:
+            return file_result, True
+        file_result = self._analyze_file(parsed, plan.detectors, plan.thresholds)
+        if not plan.pylint or file_result.errors:
+            self.cache.put(parsed.filename, parsed.digest, file_result)
+        return file_result, False
+
+    def _cached(self, parsed) -> Optional[FileResult]:
+        metrics.FILES_ANALYZED.inc()
+        metrics.LINES_ANALYZED.inc(metrics.line_count(parsed.source))
+        return self.cache.get(parsed.filename, parsed.digest)
+
+    def _analyze_by_stage(self, sources: Iterable, plan: "AnalysisPlan", results: Results, emit, stop_at: float):
+        """
+        Run the stages of DEADLINE_STAGES one after the other over all files until perf_counter()
+        reaches stop_at; only the results of the files that completed every stage are cached
+        """
+        from .parallel import BudgetExceeded, time_budget
+
+        def expired():
+            return time.perf_counter() >= stop_at
+
+        cheap = [(name, detect) for name, detect in plan.detectors if name not in EXPENSIVE_DETECTORS]
+        expensive = [(name, detect) for name, detect in plan.detectors if name in EXPENSIVE_DETECTORS]
+        enabled = {"detectors": True, "duplicate_code": plan.duplicates, "expensive_detectors": bool(expensive),
+                   "pylint": plan.pylint}
+        stages = [stage for stage in DEADLINE_STAGES if enabled[stage]]
+        # duplicate detection compares all files at once, the other stages go file by file
+        file_stages = [stage for stage in stages if stage != "duplicate_code"]
+        results.stages = collections.OrderedDict((stage, {"files": 0, "complete": False}) for stage in stages)
+        # files analyzed in this run (not from the cache), files not reached before the deadline
+        new, functions, not_started = [], [], []
+
+        for parsed in sources:
+            results.files += 1
+            file_result = self._cached(parsed)
+            if file_result is None and expired():
+                not_started.append(parsed.filename)
+                continue
+            if file_result is not None:
+                results.cached_files += 1
+                finished = file_stages
+            else:
+                file_result = self._analyze_file(parsed, cheap, plan.thresholds)
+                finished = file_stages[:1]
+                if not file_result.parsed:
+                    # not parsed: the other stages have nothing to check either
+                    finished = file_stages
+                    self.cache.put(parsed.filename, parsed.digest, file_result)
+                else:
+                    new.append((parsed, file_result))
+            for stage in finished:
+                results.stages[stage]["files"] += 1
+            for finding in file_result.findings:
+                emit(finding)
+            for error in file_result.errors:
+                results.errors.append((parsed.filename, error))
+            results.add_stats(file_result.stats)
+            functions.extend(file_result.functions)
+        results.stages["detectors"]["complete"] = not not_started
+        stopped = bool(not_started)
+
+        if plan.duplicates and not stopped and not expired():
+            collector = FindingCollector()
+            with perf.stage("duplicate_code", detector=True):
+                for duplicate in find_duplicates(functions, plan.thresholds["duplicate"]):
+                    emit_duplicate(duplicate, collector)
+            for finding in collector.findings:
+                emit(finding)
+            results.stages["duplicate_code"].update(files=results.files, complete=True)
+        stopped = stopped or (plan.duplicates and not results.stages["duplicate_code"]["complete"])
+
+        # stage -> how many of the new files (in order) it completed
+        done = {stage: 0 for stage in ("expensive_detectors", "pylint")}
+        if expensive and not stopped:
+            for parsed, file_result in new:
+                if expired():
+                    break
+                found, failed = len(file_result.findings), len(file_result.errors)
+                self._analyze_file(parsed, expensive, plan.thresholds, file_result)
+                for finding in file_result.findings[found:]:
+                    emit(finding)
+                for error in file_result.errors[failed:]:
+                    results.errors.append((parsed.filename, error))
+                done["expensive_detectors"] += 1
+            stopped = done["expensive_detectors"] < len(new)
+
+        # files pylint was run over (failed chunks included), files of the failed chunks
+        checked, pylint_failed = 0, set()
+        if plan.pylint and not stopped:
+            # pylint seconds per file so far: the chunks are sized to fit in the time left, since a
+            # running chunk is only interrupted in the main thread (see time_budget), not e.g. in
+            # the request threads of the web app
+            pylint_seconds = 0.0
+            while checked < len(new) and not expired():
+                left = stop_at - time.perf_counter()
+                size = pylint_chunk_size(left, pylint_seconds / checked if checked else None)
+                if not size:
+                    break
+                chunk = new[checked:checked + size]
+                started = time.perf_counter()
+                try:
+                    with time_budget(max(left, 0.001)), perf.stage("pylint", detector=True):
+                        pylint_findings, error = self.run_pylint(chunk)
+                except BudgetExceeded:
+                    break
+                pylint_seconds += time.perf_counter() - started
+                checked += len(chunk)
+                if error:
+                    # the files of a failed chunk have not completed the pylint stage
+                    results.errors.append(("pylint", error))
+                    pylint_failed.update(parsed.filename for parsed, _ in chunk)
+                    continue
+                for findings in pylint_findings.values():
+                    for finding in findings:
+                        emit(finding)
+                done["pylint"] += len(chunk)
+        elif not stopped:
+            for parsed, file_result in new:
+                self.cache.put(parsed.filename, parsed.digest, file_result)
+
+        for stage, files in done.items():
+            if stage in results.stages:
+                results.stages[stage]["files"] += files
+                results.stages[stage]["complete"] = files == len(new)
+        reached = dict(done, pylint=checked)
+        for position, (parsed, _) in enumerate(new):
+            missing = [stage for stage in file_stages[1:]
+                       if position >= reached[stage] or stage == "pylint" and parsed.filename in pylint_failed]
+            if missing:
+                results.incomplete[parsed.filename] = missing
+        for filename in not_started:
+            results.incomplete[filename] = list(file_stages)
+
+    def run_pylint(self, pending):
+        """
+        Run pylint once over new files and add its findings to their results
+
+        Args:
+            pending: [(ParsedFile, FileResult)] as returned by file_result()
+
+        Returns:
+            ({file name: pylint findings}, error message or None); on error nothing is cached
+        """
+        collector = FindingCollector()
+        try:
+            detect_pylint_files([parsed for parsed, _ in pending], collector)
+        except Exception as e:
+            return {}, str(e)
+        by_file = collections.defaultdict(list)
+        for finding in collector.findings:
+            by_file[finding["filename"]].append(finding)
+        for parsed, file_result in pending:
+            file_result.findings.extend(by_file.get(parsed.filename, []))
+            self.cache.put(parsed.filename, parsed.digest, file_result)
+        return by_file, None
+
+    def _analyze_file(self, parsed, detectors, thresholds, file_result: Optional[FileResult] = None) -> FileResult:
+        """Result of some detectors on one file; with file_result, add their findings to that result"""
+        more = file_result is not None
+        file_result = file_result if more else FileResult()
+        tokens = self.tokens.tokens(parsed)
+        detectors = [(name, detect) for name, detect in detectors if may_match(name, tokens)]
+        tree = None
+        if needs_tree([name for name, _ in detectors], tokens):
+            try:
+                with perf.measure("parse", parsed.filename):
+                    tree = parsed.tree
+            except (SyntaxError, ValueError) as e:
+                file_result.errors.append(PARSE_ERROR + str(e))
+                return file_result
+        collector = FindingCollector()
+        for name, detect in detectors:
+            try:
+                with perf.measure(name, parsed.filename):
+                    detect(parsed, collector, thresholds)
+            except Exception as e:  # one broken detector must not stop the others
+                file_result.errors.append("{}: {}".format(name, e))
+        file_result.findings.extend(collector.findings)
+        if tree is not None and not more:
+            file_result.stats = file_stats(tree)
+            file_result.functions = extract_function_features(tree, parsed.filename)
+        parsed.release()
+        return file_result
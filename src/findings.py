@@ -0,0 +1,78 @@
+"""
+Finding records
+A finding is a plain dict describing one code smell occurrence. Detectors and report writers share this format.
+"""
+from typing import Any, Dict, Iterable, Optional
+
+
+# Smell id -> (report title, short description). The order is the order used in reports.
+SMELL_TYPES = {
+    "long_method": ("Long Methods", "Method has too many statements"),
+    "long_parameter": ("Long Parameters", "Method has too many parameters"),
+    "too_many_branches": ("Too Many Branches", "Method has too many branches"),
+    "too_many_attributes": ("Too Many Attributes", "Class has too many instance attributes"),
+    "too_many_methods": ("Too Many Methods", "Class has too many public methods"),
+    "useless_exception": ("Useless Exceptions", "Try/except clause that catches too much or does nothing"),
+    "shotgun_surgery": ("Shotgun Surgery", "Class makes many external function calls"),
+    "class_cohesion": ("Class Cohesion", "Class has low cohesion"),
+    "cyclomatic_complexity": ("Code Complexity", "Code block has a high cyclomatic complexity"),
+    "long_lambda": ("Long Lambda", "Lambda expression is too long"),
+    "long_list_comp": ("Long List Comprehension", "List comprehension is too long"),
+    "magic_number": ("Magic Numbers", "Unnamed numeric literal used repeatedly"),
+    "commented_code": ("Commented Code", "Block of commented-out code"),
+    "unused_member": ("Unused Members", "Class member that is never used"),
+    "duplicate_code": ("Duplicate Code", "Function is structurally similar to another function"),
+}
+
+# Smells whose worst occurrence is the one with the lowest metric
+LOWER_IS_WORSE = {"class_cohesion"}
+
+
+def make_finding(smell: str, filename: str, lineno: Any, metric: Any = None, message: str = "",
+                 **extra: Any) -> Dict[str, Any]:
+    """
+    Build a finding record
+
+    Args:
+        smell: smell id, one of SMELL_TYPES
+        filename: file the smell was found in
+        lineno: line number of the smell
+        metric: detector specific metric (statements, length, count, similarity, ...)
+        message: human readable description
+        extra: additional detector specific fields
+
+    Returns:
+        finding dict
+    """
+    finding = {
+        "smell": smell,
+        "filename": filename,
+        "lineno": lineno,
+        "metric": metric,
+        "message": message or SMELL_TYPES.get(smell, ("", ""))[1],
+    }
+    finding.update(extra)
+    return finding
+
+
+def smell_title(smell: str, default: Optional[str] = None) -> str:
+    """Return the report title of a smell id"""
+    return SMELL_TYPES.get(smell, (default or smell, ""))[0]
+
+
+def worst_findings(findings: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Smell id -> the finding with the most extreme numeric metric (the worst case shown in reports)"""
+    worst: Dict[str, Dict[str, Any]] = {}
+    for finding in findings:
+        metric = finding.get("metric")
+        if isinstance(metric, bool) or not isinstance(metric, (int, float)):
+            continue
+        current = worst.get(finding["smell"])
+        if current is None:
+            worst[finding["smell"]] = finding
+        elif finding["smell"] in LOWER_IS_WORSE:
+            if metric < current["metric"]:
+                worst[finding["smell"]] = finding
+        elif metric > current["metric"]:
+            worst[finding["smell"]] = finding
+    return worst
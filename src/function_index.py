@@ -0,0 +1,77 @@
+"""
+Function index
+Persistent cache of the duplicate-detection features of every function, keyed by the git blob id
+of the file that contains it. A blob id names the exact file contents, so an entry never goes
+stale: diff mode compares the changed functions against the rest of the repository by reading
+only the blobs that are not in the index yet.
+"""
+import ast
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from .Detector.duplicate_code_detector import extract_function_features
+
+INDEX_VERSION = 1
+
+INDEX_FILENAME = "function_index.json"
+
+
+class FunctionIndex:
+    """{blob id: [{"name", "lineno", "features"}]} stored as one JSON file"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[str, List[Dict]] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf8") as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION:
+                    self._entries = data["blobs"]
+            except (OSError, ValueError, KeyError):
+                self._entries = {}
+
+    def __contains__(self, blob: str) -> bool:
+        return blob in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def functions(self, blob: str, filename: str) -> List[Dict]:
+        """Features of the functions of a blob, named as in extract_function_features"""
+        return [{"name": func["name"], "filename": filename, "lineno": func["lineno"],
+                 "features": frozenset(func["features"])}
+                for func in self._entries.get(blob, [])]
+
+    def add_source(self, blob: str, source: str) -> bool:
+        """Index the functions of a blob; False if it cannot be parsed"""
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError):
+            self._entries[blob] = []
+            self._dirty = True
+            return False
+        self._entries[blob] = [{"name": func["name"], "lineno": func["lineno"], "features": sorted(func["features"])}
+                               for func in extract_function_features(tree, "")]
+        self._dirty = True
+        return True
+
+    def retain(self, blobs: Iterable[str]):
+        """Drop the entries of blobs that are no longer referenced"""
+        keep = set(blobs)
+        stale = [blob for blob in self._entries if blob not in keep]
+        for blob in stale:
+            del self._entries[blob]
+        self._dirty = self._dirty or bool(stale)
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".part"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump({"version": INDEX_VERSION, "blobs": self._entries}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self._dirty = False
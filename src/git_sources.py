@@ -0,0 +1,206 @@
+"""
+Git sources
+Read the files of a change straight from a local git repository: which Python files a diff
+(or the staged changes) touch, which of their lines changed, and the contents of blobs through
+one long-running `git cat-file --batch` process (no checkout, no copy to code-dump).
+"""
+import re
+import subprocess
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config_loader import get_config
+from .sources import ParsedFile
+
+
+# Id of the empty tree, the base of a repository without commits
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+
+class GitError(Exception):
+    """A git command failed or its output could not be understood"""
+
+
+def run_git(args: List[str], cwd: str) -> str:
+    """Run a git command and return its standard output"""
+    try:
+        result = subprocess.run(["git", "-c", "core.quotepath=off", *args], cwd=cwd, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, check=False)
+    except FileNotFoundError:
+        raise GitError("git is not installed")
+    if result.returncode != 0:
+        raise GitError("git {} failed: {}".format(args[0], result.stderr.decode("utf8", "replace").strip()))
+    return result.stdout.decode("utf8", "surrogateescape")
+
+
+def repo_root(path: str = ".") -> str:
+    return run_git(["rev-parse", "--show-toplevel"], path).strip()
+
+
+def parse_range(spec: str, root: str) -> Tuple[str, str]:
+    """
+    Resolve "<base>..<head>", "<base>...<head>" (from the merge base) or "<base>" (against HEAD)
+    into a pair of commit ids
+    """
+    if "..." in spec:
+        base, head = spec.split("...", 1)
+        head = head or "HEAD"
+        base = run_git(["merge-base", base or "HEAD", head], root).strip()
+    elif ".." in spec:
+        base, head = spec.split("..", 1)
+    else:
+        base, head = spec, ""
+    return (run_git(["rev-parse", "--verify", (base or "HEAD") + "^{commit}"], root).strip(),
+            run_git(["rev-parse", "--verify", (head or "HEAD") + "^{commit}"], root).strip())
+
+
+def _is_python(path: str) -> bool:
+    return path.endswith(".py") and not get_config().should_ignore_file(path)
+
+
+def _diff_args(base: str, head: Optional[str]) -> List[str]:
+    return ["--cached", base] if head is None else [base, head]
+
+
+def staged_base(root: str) -> str:
+    """Commit the staged changes are compared with: HEAD, or the empty tree before the first commit"""
+    try:
+        return run_git(["rev-parse", "--verify", "HEAD^{commit}"], root).strip()
+    except GitError:
+        return EMPTY_TREE
+
+
+def changed_files(root: str, base: str, head: Optional[str]) -> List[str]:
+    """
+    Python files added or modified between base and head (head None: in the index), relative
+    to the repository root; renames count as added files
+    """
+    args = ["diff", "--name-only", "--no-renames", "--diff-filter=AM", "-z", *_diff_args(base, head)]
+    output = run_git(args + ["--", "*.py"], root)
+    return [path for path in output.split("\0") if path and _is_python(path)]
+
+
+_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+def changed_lines(root: str, base: str, head: Optional[str], paths: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Line ranges (first, last; 1-based, inclusive) of every path that are new or modified in head
+
+    Lines that were only deleted leave no range; the line following the deletion is marked instead,
+    so that a smell whose code lost lines is still reported.
+    """
+    ranges: Dict[str, List[Tuple[int, int]]] = {path: [] for path in paths}
+    if not paths:
+        return ranges
+    args = ["diff", "-U0", "--no-color", "--no-renames", "--no-ext-diff", *_diff_args(base, head), "--", *paths]
+    current = None
+    for line in run_git(args, root).splitlines():
+        if line.startswith("+++ "):
+            name = line[4:]
+            current = name[2:] if name.startswith("b/") else None
+            continue
+        match = _HUNK.match(line)
+        if match and current in ranges:
+            start, count = int(match.group(1)), int(match.group(2) or 1)
+            if count == 0:
+                ranges[current].append((start + 1, start + 1))
+            else:
+                ranges[current].append((start, start + count - 1))
+    return ranges
+
+
+def tree_blobs(root: str, revision: Optional[str]) -> Dict[str, str]:
+    """Blob id of every Python file of a commit (revision None: of the index, i.e. what is staged)"""
+    blobs = {}
+    if revision is None:
+        # "<mode> <object> <stage>\t<path>"
+        for entry in run_git(["ls-files", "--stage", "-z"], root).split("\0"):
+            if "\t" in entry:
+                info, path = entry.split("\t", 1)
+                if _is_python(path):
+                    blobs[path] = info.split()[1]
+        return blobs
+    # "<mode> <type> <object>\t<path>"
+    for entry in run_git(["ls-tree", "-r", "-z", revision], root).split("\0"):
+        if "\t" in entry:
+            info, path = entry.split("\t", 1)
+            mode, kind, obj = info.split()
+            if kind == "blob" and _is_python(path):
+                blobs[path] = obj
+    return blobs
+
+
+class BlobReader:
+    """
+    Read blobs through one `git cat-file --batch` process
+
+    Requests are written by a separate thread while contents are read back, so large batches
+    stream through the pipe without either side waiting for the other.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._process = None
+
+    def __enter__(self):
+        self._process = subprocess.Popen(["git", "cat-file", "--batch"], cwd=self.root, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+
+    def _send(self, objects: List[str]):
+        try:
+            for obj in objects:
+                self._process.stdin.write(obj.encode("utf8") + b"\n")
+            self._process.stdin.flush()
+        except OSError:  # git exited; the reader side reports the missing objects
+            pass
+
+    def iter_blobs(self, objects: Iterable[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """Yield (object, contents) in request order; contents is None for a missing object"""
+        objects = list(objects)
+        writer = threading.Thread(target=self._send, args=(objects,), daemon=True)
+        writer.start()
+        stdout = self._process.stdout
+        for obj in objects:
+            header = stdout.readline()
+            if not header:
+                raise GitError("git cat-file exited early")
+            fields = header.split()
+            if len(fields) < 3 or fields[1] == b"missing":
+                yield obj, None
+                continue
+            data = stdout.read(int(fields[2]))
+            stdout.read(1)  # newline after the contents
+            yield obj, data
+        writer.join()
+
+    def iter_sources(self, blobs: Dict[str, str], errors: Optional[list] = None):
+        """
+        Yield ParsedFile objects for {path: blob id}; blobs that are missing or not UTF-8 are
+        skipped and appended to errors as (path, message)
+        """
+        paths = list(blobs)
+        for path, (_, data) in zip(paths, self.iter_blobs(blobs[path] for path in paths)):
+            try:
+                if data is None:
+                    raise ValueError("blob {} not found".format(blobs[path]))
+                source = data.decode("utf8")
+            except (UnicodeDecodeError, ValueError) as e:
+                if errors is not None:
+                    errors.append((path, str(e)))
+                continue
+            yield ParsedFile(path, source)
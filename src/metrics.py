@@ -0,0 +1,190 @@
+"""
+Process metrics
+Counters, gauges and histograms kept in memory by the process that analyzes (the web app, the
+daemon) and rendered in the Prometheus text exposition format by render(), e.g. for the /metrics
+endpoint of web_app.py. Updating a metric takes one lock and a dict lookup; there is no dependency
+on prometheus_client.
+
+The engine counts the files and lines it analyzes and the hits of its caches, the worker pool
+its busy workers; the web app adds its jobs, their stage durations and the uploaded bytes.
+"""
+import abc
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of the duration histograms: analyses take from milliseconds to minutes
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+_registry: List["Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric(abc.ABC):
+    """A named metric with optional labels; values per combination of label values"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        if register:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError("{} takes the labels {}".format(self.name, ", ".join(self.labelnames)))
+        return tuple(labels[name] for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines of the exposition format, one per combination of label values"""
+
+    def render(self) -> str:
+        lines = ["# HELP {} {}".format(self.name, self.documentation.replace("\\", "\\\\").replace("\n", "\\n")),
+                 "# TYPE {} {}".format(self.name, self.kind)]
+        return "\n".join(lines + self.samples()) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """Monotonic total, e.g. files analyzed; its name ends in _total"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return ["{}{} {}".format(self.name, _labels(self.labelnames, key), _number(value)) for key, value in values]
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. jobs running; or computed when rendered by a function"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 function: Optional[Callable[[], Dict[Tuple, float]]] = None, register: bool = True):
+        super().__init__(name, documentation, labels, register)
+        # returns {label values: value}
+        self.function = function
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            return ["{}{} {}".format(self.name, _labels(self.labelnames, key), _number(value))
+                    for key, value in sorted(self.function().items())]
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. durations, in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DURATION_BUCKETS, register: bool = True):
+        super().__init__(name, documentation, labels, register)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # per bucket counts (the last one is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, [list(entry[0]), entry[1], entry[2]]) for key, entry in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                lines.append("{}_bucket{} {}".format(
+                    self.name, _labels(self.labelnames, key, 'le="{}"'.format(_number(bound))), cumulative))
+            lines.append("{}_sum{} {}".format(self.name, _labels(self.labelnames, key), _number(total)))
+            lines.append("{}_count{} {}".format(self.name, _labels(self.labelnames, key), count))
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    return "".join(metric.render() for metric in _registry)
+
+
+def reset():
+    """Forget every value (tests)"""
+    for metric in _registry:
+        metric.reset()
+
+
+def line_count(source: str) -> int:
+    return source.count("\n") + (1 if source and not source.endswith("\n") else 0)
+
+
+FILES_ANALYZED = Counter("codesmell_files_analyzed_total", "Source files analyzed (cached results included)")
+LINES_ANALYZED = Counter("codesmell_lines_analyzed_total", "Lines of the source files analyzed")
+CACHE_REQUESTS = Counter("codesmell_cache_requests_total", "Lookups in the analysis caches",
+                         ["cache", "result"])
+
+
+def _hit_ratios() -> Dict[Tuple, float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in list(CACHE_REQUESTS._values.items()):
+        entry = totals.setdefault(cache, [0, 0])
+        entry[0 if result == "hit" else 1] += value
+    return {(cache,): hits / (hits + misses) for cache, (hits, misses) in totals.items() if hits + misses}
+
+
+CACHE_HIT_RATIO = Gauge("codesmell_cache_hit_ratio", "Share of the cache lookups that hit, since the process started",
+                        ["cache"], function=_hit_ratios)
+WORKERS = Gauge("codesmell_worker_pool_workers", "Worker processes of the running worker pools")
+WORKERS_BUSY = Gauge("codesmell_worker_pool_busy", "Worker processes analyzing a chunk right now")
+WORKER_BUSY_SECONDS = Counter("codesmell_worker_pool_busy_seconds_total",
+                              "Seconds the workers spent analyzing files; divided by the workers: utilization")
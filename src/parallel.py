@@ -0,0 +1,460 @@
+"""
+Parallel analysis
+Runs the per-file stages of the analysis engine (the detectors of FILE_DETECTORS and pylint) in a
+pool of worker processes. Work is handed out as chunks of files read from disk; every worker keeps
+one AnalysisEngine, so pylint stays imported for the life of the worker. The cross-file stage
+(duplicate detection) runs in the parent once all files of a project are back, see
+assemble_results().
+
+File sizes are very skewed in real projects, so the chunks are planned by estimated cost (see
+schedule_chunks): the time a file took in a previous run when it is known, its size otherwise.
+Expensive files get a chunk of their own and are dispatched first, small files are batched so that
+a chunk is worth the inter-process round trip.
+
+A pathological file must not take the run down: every file gets a time budget (limits.file_timeout)
+and workers an address-space cap (limits.worker_memory_mb); a file that exceeds them, or whose
+analysis kills its worker process, is reported as "skipped (budget exceeded)". Workers are replaced
+after limits.max_tasks_per_worker chunks to bound the memory growth of long runs.
+"""
+import contextlib
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import metrics, perf, profiling
+from .config_loader import get_config
+from .engine import AnalysisEngine, FileResult, FindingCollector, Results
+from .sources import ParsedFile
+from .Detector.duplicate_code_detector import _emit_finding as emit_duplicate, find_duplicates
+
+# Most files per task: bounds the memory of a chunk and the work lost when a worker fails
+DEFAULT_CHUNK_SIZE = 16
+
+# Chunks planned per worker: several, so that the last chunks even out the load between workers
+CHUNKS_PER_WORKER = 4
+
+# Fixed cost of a file in bytes of source, for the work every file needs whatever its size
+FILE_OVERHEAD = 2048
+
+TIMINGS_FILENAME = "timings.json"
+
+# Error message prefix of the files whose analysis was stopped by a limit
+SKIPPED = "skipped (budget exceeded)"
+
+# One task: (key, disk path, file name); key tells the caller which project the file belongs to
+FileTask = Tuple[object, str, str]
+
+# Result of one file: (key, file name, FileResult or None if unreadable, read error or None, seconds)
+FileOutcome = Tuple[object, str, Optional[FileResult], Optional[str], float]
+
+_worker_engine: Optional[AnalysisEngine] = None
+
+# seconds a file may take in this process, 0 for no limit
+_file_timeout = 0
+
+# part file receiving the trace events of this worker process, when the parent is tracing
+_trace_part: Optional[str] = None
+
+# statistics file of this worker process, when the parent runs with --profile cpu
+_profile_path: Optional[str] = None
+
+
+class BudgetExceeded(BaseException):
+    """
+    A file took longer than its time budget; not an Exception, so that the "one broken detector
+    must not stop the others" handlers do not swallow it
+    """
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def is_skipped(error: Optional[str]) -> bool:
+    return bool(error) and error.startswith(SKIPPED)
+
+
+def _init_worker(config, worker_process: bool = True, trace_prefix: Optional[str] = None,
+                 profile_prefix: Optional[str] = None):
+    global _worker_engine, _file_timeout, _trace_part, _profile_path
+    # every file is analyzed once per batch: caching results in the worker would only hold memory
+    _worker_engine = AnalysisEngine(config, cache_size=0)
+    _file_timeout = config.get_limit("file_timeout", 0) or 0
+    if worker_process:
+        # a forked worker inherits the recorder of its parent: only trace into a fresh one
+        if trace_prefix:
+            perf.start(trace=True)
+            _trace_part = "{}.{}".format(trace_prefix, os.getpid())
+        else:
+            perf.stop()
+        if profile_prefix:
+            profiling.start_cpu(workers=False)
+            _profile_path = "{}.{}.pstats".format(profile_prefix, os.getpid())
+    memory_mb = config.get_limit("worker_memory_mb", 0) or 0
+    if worker_process and memory_mb:
+        try:
+            import resource
+        except ImportError:  # not available on Windows
+            return
+        limit = int(memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+
+
+def _on_alarm(signum, frame):
+    raise BudgetExceeded()
+
+
+@contextlib.contextmanager
+def time_budget(seconds: float):
+    """
+    Raise BudgetExceeded inside the block once it ran for `seconds`; without a limit, or where
+    SIGALRM cannot be used (Windows, threads other than the main thread), the block is not limited
+    """
+    if not seconds or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _skipped(reason: str) -> str:
+    return "{}: {}".format(SKIPPED, reason)
+
+
+def _analyze_one(engine, plan, path, name):
+    """(ParsedFile, FileResult, cached) of one file within the time budget; raises on a read error"""
+    parsed = ParsedFile.from_path(path, name)
+    with time_budget(_file_timeout):
+        file_result, cached = engine.file_result(parsed, plan)
+    return parsed, file_result, cached
+
+
+def analyze_chunk(chunk: List[FileTask]) -> Tuple[List[FileOutcome], List[str]]:
+    """
+    Worker side: run the per-file detectors and one pylint pass over a chunk of files
+
+    Returns:
+        (outcome of every file, errors of the chunk such as a failed pylint run)
+    """
+    with perf.stage("chunk"):
+        result = _analyze_chunk(chunk)
+    if _trace_part is not None:
+        # written after every chunk: a recycled or crashed worker loses at most one chunk of events
+        perf.append_trace_part(_trace_part, perf.active().drain_events())
+    if _profile_path is not None:
+        profiling.dump_cpu(_profile_path)
+    return result
+
+
+def _analyze_chunk(chunk: List[FileTask]) -> Tuple[List[FileOutcome], List[str]]:
+    engine = _worker_engine or AnalysisEngine(cache_size=0)
+    plan = engine.prepare()
+    outcomes, pending, errors = [], [], []
+    for key, path, name in chunk:
+        started = time.perf_counter()
+        try:
+            parsed, file_result, cached = _analyze_one(engine, plan, path, name)
+        except (OSError, UnicodeDecodeError) as e:
+            outcomes.append((key, name, None, str(e), time.perf_counter() - started))
+            continue
+        except BudgetExceeded:
+            outcomes.append((key, name, None, _skipped("took more than {}s".format(_file_timeout)),
+                             time.perf_counter() - started))
+            continue
+        except (MemoryError, RecursionError) as e:
+            outcomes.append((key, name, None, _skipped(type(e).__name__), time.perf_counter() - started))
+            continue
+        if not cached and plan.pylint and file_result.parsed:
+            pending.append((parsed, file_result, len(parsed.source)))
+        outcomes.append((key, name, file_result, None, time.perf_counter() - started))
+    if pending:
+        started = time.perf_counter()
+        try:
+            with time_budget(_file_timeout * len(pending)), perf.stage("pylint", detector=True):
+                _, error = engine.run_pylint([(parsed, file_result) for parsed, file_result, _ in pending])
+        except (BudgetExceeded, MemoryError, RecursionError):
+            # find the file that is too expensive: check the files one at a time
+            error = None
+            for parsed, file_result, _ in pending:
+                try:
+                    with time_budget(_file_timeout):
+                        engine.run_pylint([(parsed, file_result)])
+                except (BudgetExceeded, MemoryError, RecursionError):
+                    file_result.errors.append(_skipped("pylint took more than {}s".format(_file_timeout)))
+        if error:
+            errors.append(error)
+        # one pylint run covers the whole chunk: share its time out by file size
+        pylint_seconds = time.perf_counter() - started
+        sizes = {id(file_result): size + FILE_OVERHEAD for _, file_result, size in pending}
+        total = sum(sizes.values())
+        outcomes = [(key, name, file_result, read_error,
+                     seconds + pylint_seconds * sizes.get(id(file_result), 0) / total)
+                    for key, name, file_result, read_error, seconds in outcomes]
+    # a file pylint could not finish within its budget is skipped as a whole
+    outcomes = [(key, name, None, file_result.errors[-1], seconds)
+                if file_result is not None and file_result.errors and is_skipped(file_result.errors[-1])
+                else (key, name, file_result, read_error, seconds)
+                for key, name, file_result, read_error, seconds in outcomes]
+    return outcomes, errors
+
+
+def make_chunks(tasks: Iterable[FileTask], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[List[FileTask]]:
+    """Chunks of chunk_size files, in task order"""
+    chunks, chunk = [], []
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) >= chunk_size:
+            chunks.append(chunk)
+            chunk = []
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class TimingStore:
+    """
+    Seconds every file took in the previous run, with its size then, stored as one JSON file
+    ({disk path: [size, seconds]}); used to estimate the cost of the next run
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[str, List[float]] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path: str, size: int) -> Optional[float]:
+        """Estimated seconds of a file, scaled by how much it grew or shrank since it was timed"""
+        entry = self._entries.get(os.path.abspath(path))
+        if entry is None:
+            return None
+        old_size, seconds = entry
+        return seconds * (size + FILE_OVERHEAD) / (old_size + FILE_OVERHEAD)
+
+    def record(self, path: str, size: int, seconds: float):
+        self._entries[os.path.abspath(path)] = [size, round(seconds, 6)]
+        self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".part", "w", encoding="utf8") as f:
+            json.dump(self._entries, f, separators=(",", ":"))
+        os.replace(self.path + ".part", self.path)
+        self._dirty = False
+
+
+def default_timings_path(filename: str = TIMINGS_FILENAME) -> str:
+    return os.path.join(get_config().get_output_dir(), "cache", filename)
+
+
+def file_size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+def estimate_costs(tasks: List[FileTask], timings: Optional[TimingStore] = None) -> List[float]:
+    """
+    Estimated seconds of every task: its previous timing, or its size times the average speed of
+    the timed files (without timings, costs are only relative: bytes plus FILE_OVERHEAD)
+    """
+    sizes = [file_size(path) for _, path, _ in tasks]
+    known = [timings.get(path, size) if timings is not None else None for (_, path, _), size in zip(tasks, sizes)]
+    timed_bytes = sum(size + FILE_OVERHEAD for size, seconds in zip(sizes, known) if seconds is not None)
+    timed_seconds = sum(seconds for seconds in known if seconds is not None)
+    per_byte = timed_seconds / timed_bytes if timed_bytes and timed_seconds else 1.0
+    return [seconds if seconds is not None else (size + FILE_OVERHEAD) * per_byte
+            for size, seconds in zip(sizes, known)]
+
+
+def schedule_chunks(tasks: List[FileTask], jobs: int, costs: Optional[List[float]] = None,
+                    max_files: int = DEFAULT_CHUNK_SIZE) -> List[List[FileTask]]:
+    """
+    Plan the chunks of a run, most expensive first
+
+    Files are taken by decreasing cost. A chunk is closed once it reaches the target cost (the
+    total cost spread over CHUNKS_PER_WORKER chunks per worker) or max_files files, so that
+    expensive files run alone, right at the start, and cheap files travel in batches.
+    Dispatching the longest work first keeps a big file from being started last, while every
+    other worker idles (longest-processing-time-first scheduling).
+    """
+    if not tasks:
+        return []
+    if costs is None:
+        costs = estimate_costs(tasks)
+    target = sum(costs) / (max(1, jobs) * CHUNKS_PER_WORKER)
+    chunks, chunk, chunk_cost = [], [], 0.0
+    for cost, task in sorted(zip(costs, tasks), key=lambda item: -item[0]):
+        chunk.append(task)
+        chunk_cost += cost
+        if chunk_cost >= target or len(chunk) >= max_files:
+            chunks.append((chunk_cost, chunk))
+            chunk, chunk_cost = [], 0.0
+    if chunk:
+        chunks.append((chunk_cost, chunk))
+    chunks.sort(key=lambda item: -item[0])
+    return [chunk for _, chunk in chunks]
+
+
+class WorkerPool:
+    """
+    Process pool running analyze_chunk(); with one job the chunks run in this process instead
+
+    Use as a context manager; run() may be called several times on the same pool. When this
+    process records a trace, the spans of the workers are merged into it on exit.
+    """
+
+    def __init__(self, jobs: Optional[int] = None, config=None):
+        self.jobs = max(1, jobs or default_jobs())
+        self.config = config or get_config()
+        self._executor = None
+        self._trace_dir = None
+        self._busy = 0
+
+    def __enter__(self):
+        metrics.WORKERS.inc(self.jobs)
+        if self.jobs > 1:
+            recorder = perf.active()
+            if recorder is not None and recorder.events is not None:
+                self._trace_dir = tempfile.mkdtemp(prefix="trace-")
+            self._start()
+        else:
+            _init_worker(self.config, worker_process=False)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop()
+        self._set_busy(0)
+        metrics.WORKERS.dec(self.jobs)
+        if self._trace_dir is not None:
+            events = perf.read_trace_parts(os.path.join(self._trace_dir, "worker.*"))
+            recorder = perf.active()
+            if recorder is not None and recorder.events is not None:
+                recorder.events.extend(events)
+            shutil.rmtree(self._trace_dir, ignore_errors=True)
+            self._trace_dir = None
+
+    def _start(self):
+        options = {}
+        max_tasks = self.config.get_limit("max_tasks_per_worker", 0)
+        if max_tasks and sys.version_info >= (3, 11):
+            # replaced workers are started with "spawn": a fork of this process would inherit its memory
+            options["max_tasks_per_child"] = int(max_tasks)
+        trace_prefix = os.path.join(self._trace_dir, "worker") if self._trace_dir else None
+        self._executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                             initargs=(self.config, True, trace_prefix, profiling.worker_prefix()),
+                                             **options)
+
+    def _stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _set_busy(self, busy: int):
+        """Workers of this pool analyzing a chunk, for the metrics of the process"""
+        metrics.WORKERS_BUSY.inc(busy - self._busy)
+        self._busy = busy
+
+    @staticmethod
+    def _count_busy_time(outcomes: List[FileOutcome]):
+        metrics.WORKER_BUSY_SECONDS.inc(sum(outcome[4] for outcome in outcomes))
+
+    def run(self, chunks: Iterable[List[FileTask]]) -> Iterator[Tuple[List[FileOutcome], List[str]]]:
+        """
+        Yield the result of every chunk as soon as it is done (not in submission order); chunks are
+        started in the order given
+
+        When a worker process dies (killed for its memory, crashed in a C extension) the pool is
+        restarted and the unfinished chunks are retried one file at a time; a file whose retry
+        fails again is run alone in the pool and reported as skipped if it still brings it down.
+        """
+        if self._executor is None:
+            for chunk in chunks:
+                self._set_busy(1)
+                outcomes, spans = analyze_chunk(chunk)
+                self._set_busy(0)
+                self._count_busy_time(outcomes)
+                yield outcomes, spans
+            return
+        queue, suspects = list(chunks), []
+        while queue or suspects:
+            if queue:
+                batch, queue, alone = queue, [], False
+            else:
+                batch, suspects, alone = suspects[:1], suspects[1:], True
+            broken = False
+            running = {self._executor.submit(analyze_chunk, chunk): chunk for chunk in batch}
+            while running:
+                self._set_busy(min(len(running), self.jobs))
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = running.pop(future)
+                    try:
+                        outcomes, spans = future.result()
+                        self._count_busy_time(outcomes)
+                        yield outcomes, spans
+                    except BrokenProcessPool:
+                        broken = True
+                        if alone:
+                            key, _, name = chunk[0]
+                            yield [(key, name, None, _skipped("worker process died"), 0.0)], []
+                        elif len(chunk) > 1:
+                            queue.extend([task] for task in chunk)
+                        else:
+                            suspects.append(chunk)
+            if broken:
+                self._stop()
+                self._start()
+
+
+def assemble_results(files: Dict[str, FileResult], duplicates: bool, threshold, errors=(),
+                     elapsed: float = 0.0) -> Results:
+    """
+    Results of a project from the per-file results of all its files, in file name order, plus
+    the duplicate pairs between them when duplicates is set; errors of skipped files go to
+    Results.skipped
+    """
+    results = Results()
+    functions = []
+    for name in sorted(files):
+        file_result = files[name]
+        results.files += 1
+        for finding in file_result.findings:
+            results.add(finding)
+        results.errors.extend((name, error) for error in file_result.errors)
+        results.add_stats(file_result.stats)
+        functions.extend(file_result.functions)
+    for name, error in errors:
+        (results.skipped if is_skipped(error) else results.errors).append((name, error))
+    if duplicates:
+        collector = FindingCollector()
+        for duplicate in find_duplicates(functions, threshold):
+            emit_duplicate(duplicate, collector)
+        for finding in collector.findings:
+            results.add(finding)
+    results.elapsed = elapsed
+    return results
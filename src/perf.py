@@ -0,0 +1,281 @@
+"""
+Performance instrumentation
+Records the wall and CPU time of every stage of a run (pylint, each detector, charts, PDF...), of
+every detector summed over the files, and of every file, so that a slow run shows where its time
+went. The results are written as a JSON sidecar next to the reports, <project>_performance.json,
+and rendered as the "Performance" section of the PDF and HTML reports.
+
+A recorder started with trace=True also keeps every span as a Chrome trace event (write_trace()),
+to be opened in chrome://tracing or Perfetto; worker processes write their spans to part files
+that the parent merges (see src/parallel.py).
+
+Recording is off unless a Recorder is started; stage(), measure() and timed_files() then cost a
+global lookup each.
+"""
+import contextlib
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .config_loader import get_config
+
+SIDECAR_SUFFIX = "_performance.json"
+
+# Slowest files listed in the reports
+DEFAULT_TOP_FILES = 10
+
+_NO_RECORDING = contextlib.nullcontext()
+
+_recorder: Optional["Recorder"] = None
+
+
+def cpu_time() -> float:
+    """CPU time of this process and of its finished child processes (pylint, cohesion...)"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class Recorder:
+    """Wall and CPU time per stage, per detector and per file"""
+
+    def __init__(self, top_files: int = DEFAULT_TOP_FILES, trace: bool = False):
+        self.top_files = top_files
+        # Chrome trace events ("X" complete events), when tracing
+        self.events: Optional[List[Dict[str, Any]]] = [] if trace else None
+        # name -> [wall, cpu, calls], in the order the stages first ran
+        self.stages: Dict[str, List[float]] = {}
+        self.detectors: Dict[str, List[float]] = {}
+        # file name -> {"wall", "cpu", "detectors": {detector: wall}}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.current_stage: Optional[str] = None
+        # profiling.MemoryTracker, with --profile memory
+        self.memory = None
+        self._started = (time.perf_counter(), cpu_time())
+
+    @staticmethod
+    def _add(table: Dict[str, List[float]], name: str, wall: float, cpu: float):
+        entry = table.setdefault(name, [0.0, 0.0, 0])
+        entry[0] += wall
+        entry[1] += cpu
+        entry[2] += 1
+
+    def add_file(self, filename: str, detector: Optional[str], wall: float, cpu: float):
+        entry = self.files.setdefault(filename, {"wall": 0.0, "cpu": 0.0, "detectors": {}})
+        entry["wall"] += wall
+        entry["cpu"] += cpu
+        if detector:
+            entry["detectors"][detector] = entry["detectors"].get(detector, 0.0) + wall
+
+    def span(self, name: str, category: str, started: float, wall: float, **args):
+        """Add a trace event for a span that started at perf_counter() `started`, when tracing"""
+        if self.events is not None:
+            event = {"name": name, "cat": category, "ph": "X", "ts": round(started * 1e6, 1),
+                     "dur": round(wall * 1e6, 1), "pid": os.getpid(), "tid": threading.get_native_id()}
+            if args:
+                event["args"] = args
+            self.events.append(event)
+
+    def drain_events(self) -> List[Dict[str, Any]]:
+        """Trace events recorded since the previous call"""
+        if not self.events:
+            return []
+        events, self.events = self.events, []
+        return events
+
+    @contextlib.contextmanager
+    def stage(self, name: str, detector: bool = False):
+        """Time a stage of the run; a detector stage also counts as that detector's time"""
+        previous, self.current_stage = self.current_stage, name
+        if self.memory is not None:
+            self.memory.enter(name)
+        started, cpu = time.perf_counter(), cpu_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - started, cpu_time() - cpu
+            if self.memory is not None:
+                self.memory.exit(name, detector)
+            self._add(self.stages, name, wall, cpu)
+            self.span(name, "stage", started, wall)
+            if detector:
+                self._add(self.detectors, name, wall, cpu)
+            self.current_stage = previous
+
+    @contextlib.contextmanager
+    def measure(self, detector: str, filename: str):
+        """Time one detector (or step such as "parse") on one file"""
+        started, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - started, time.process_time() - cpu
+            self._add(self.detectors, detector, wall, cpu)
+            self.add_file(filename, detector, wall, cpu)
+            self.span(detector, "detector", started, wall, file=filename)
+            if self.memory is not None:
+                self.memory.sample()
+
+    def summary(self) -> Dict[str, Any]:
+        """Machine-readable timings, as written to the sidecar file"""
+        def rows(table, key):
+            return [{key: name, "wall": round(wall, 4), "cpu": round(cpu, 4), "calls": calls}
+                    for name, (wall, cpu, calls) in table.items()]
+
+        slowest = sorted(self.files.items(), key=lambda item: -item[1]["wall"])[:self.top_files]
+        return {
+            "wall": round(time.perf_counter() - self._started[0], 4),
+            "cpu": round(cpu_time() - self._started[1], 4),
+            "stages": rows(self.stages, "stage"),
+            "detectors": sorted(rows(self.detectors, "detector"), key=lambda row: -row["wall"]),
+            "files": len(self.files),
+            "slowest_files": [{"file": name, "wall": round(entry["wall"], 4), "cpu": round(entry["cpu"], 4),
+                               "detectors": {detector: round(wall, 4)
+                                             for detector, wall in sorted(entry["detectors"].items(),
+                                                                          key=lambda item: -item[1])}}
+                              for name, entry in slowest],
+        }
+
+
+def start(top_files: int = DEFAULT_TOP_FILES, trace: bool = False) -> Recorder:
+    """Start recording in this process"""
+    global _recorder
+    _recorder = Recorder(top_files, trace)
+    return _recorder
+
+
+def stop() -> Optional[Recorder]:
+    """Stop recording and return the recorder of the run, if any"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def active() -> Optional[Recorder]:
+    return _recorder
+
+
+@contextlib.contextmanager
+def recording(enabled: bool = True) -> Iterator[Optional[Recorder]]:
+    """
+    Recorder for a block: the one already recording (e.g. for --trace), else a new one when
+    enabled, stopped at the end of the block; None when not recording
+    """
+    outer = _recorder
+    if outer is not None or not enabled:
+        yield outer
+        return
+    recorder = start()
+    try:
+        yield recorder
+    finally:
+        if _recorder is recorder:
+            stop()
+
+
+def stage(name: str, detector: bool = False):
+    """Context manager timing a stage, when recording"""
+    return _NO_RECORDING if _recorder is None else _recorder.stage(name, detector)
+
+
+def measure(detector: str, filename: str):
+    """Context manager timing a detector on one file, when recording"""
+    return _NO_RECORDING if _recorder is None else _recorder.measure(detector, filename)
+
+
+def timed_files(filenames: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the file names of a detector's loop over a directory; when recording, the time spent on
+    every .py file (until the next name is requested) is added to that file for the current stage
+    """
+    recorder = _recorder
+    if recorder is None:
+        yield from filenames
+        return
+    for filename in filenames:
+        if not filename.endswith(".py"):
+            yield filename
+            continue
+        started, cpu = time.perf_counter(), time.process_time()
+        yield filename
+        wall = time.perf_counter() - started
+        recorder.add_file(filename, recorder.current_stage, wall, time.process_time() - cpu)
+        recorder.span(recorder.current_stage or "file", "detector", started, wall, file=filename)
+        if recorder.memory is not None:
+            recorder.memory.sample()
+
+
+def sidecar_path(dirname: str) -> str:
+    """Timings file of a project: <output dir>/<project>_performance.json"""
+    return os.path.join(get_config().get_output_dir(), dirname + SIDECAR_SUFFIX)
+
+
+def write_sidecar(dirname: str, recorder: Recorder) -> str:
+    path = sidecar_path(dirname)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(dict(recorder.summary(), project=dirname), f, indent=2)
+    return path
+
+
+def remove_sidecar(dirname: str) -> None:
+    """Drop the timings of an earlier run, so the reports do not show them for a run without timings"""
+    try:
+        os.remove(sidecar_path(dirname))
+    except FileNotFoundError:
+        pass
+
+
+def read_sidecar(dirname: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(sidecar_path(dirname), encoding="utf8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def report_lines(timings: Dict[str, Any]) -> List[str]:
+    """Plain text lines of the performance section (PDF report)"""
+    lines = ["   - Total: {:.2f}s wall, {:.2f}s CPU".format(timings["wall"], timings["cpu"]),
+             "   - Stages (wall / CPU):"]
+    lines += ["              * {}: {:.3f}s / {:.3f}s".format(row["stage"], row["wall"], row["cpu"])
+              for row in timings["stages"]]
+    if timings["slowest_files"]:
+        lines.append("   - Slowest files:")
+        for row in timings["slowest_files"]:
+            slowest = next(iter(row["detectors"]), None)
+            lines.append("              * {}: {:.3f}s{}".format(
+                row["file"], row["wall"], " (mostly {})".format(slowest) if slowest else ""))
+    return lines
+
+
+def append_trace_part(path: str, events: List[Dict[str, Any]]):
+    """Append trace events to a part file (one JSON event per line), e.g. from a worker process"""
+    if events:
+        with open(path, "a", encoding="utf8") as f:
+            f.writelines(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+
+
+def read_trace_parts(pattern: str) -> List[Dict[str, Any]]:
+    """Events of the part files matching a glob pattern; the files are removed"""
+    events = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf8") as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+        os.unlink(path)
+    return events
+
+
+def write_trace(path: str, events: List[Dict[str, Any]]) -> str:
+    """Write a Chrome trace-event file, naming the main process and the worker processes"""
+    main_pid = os.getpid()
+    names = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+              "args": {"name": "CodeSmellTool" if pid == main_pid else "worker {}".format(pid)}}
+             for pid in sorted({event["pid"] for event in events} | {main_pid})]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf8") as f:
+        json.dump({"traceEvents": names + sorted(events, key=lambda event: event["ts"]),
+                   "displayTimeUnit": "ms"}, f, separators=(",", ":"))
+    return path
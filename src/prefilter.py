@@ -0,0 +1,92 @@
+"""
+Token prefilter
+Most detectors can only report something on specific syntax: a long lambda needs the keyword
+`lambda`, a useless exception handler needs `except`, the class detectors need `class`. scan()
+finds which of these tokens a file contains in one regular expression pass over its text, without
+parsing it; the engine then skips the detectors that cannot match, and the parse itself when no
+remaining detector, statistic or duplicate feature needs the syntax tree.
+
+The scan is conservative: a keyword inside a string or comment counts as present, so a detector is
+skipped only when it cannot possibly report anything.
+"""
+import collections
+import re
+from typing import FrozenSet, Iterable
+
+from . import metrics
+
+# Pseudo-tokens: the file contains a comment / a digit
+COMMENT = "#"
+NUMBER = "0-9"
+
+_KEYWORDS = re.compile(r"(?<![A-Za-z_])(class|def|lambda|try|except|for)(?![A-Za-z0-9_])")
+_DIGIT = re.compile(r"[0-9]")
+
+# Detector name -> tokens of which a file needs at least one for the detector to report anything
+DETECTOR_TOKENS = {
+    "useless_exception": {"except"},
+    "shotgun_surgery": {"class"},
+    "class_cohesion": {"class"},
+    "cyclomatic_complexity": {"def", "class"},
+    "long_lambda": {"lambda"},
+    "long_list_comp": {"for"},
+    "magic_number": {NUMBER},
+    "commented_code": {COMMENT},
+    "unused_member": {"class"},
+}
+
+# Detectors that work on the text of the file, not on ParsedFile.tree
+TEXT_DETECTORS = {"commented_code", "cyclomatic_complexity"}
+
+# Tokens of the nodes counted in the statistics (STATS_NODES) and of the functions compared for
+# duplicate code; a file without any of them has empty statistics and no functions
+STRUCTURE_TOKENS = frozenset({"def", "class", "lambda", "try", "for"})
+
+# Tokens cached per content hash when the engine has no result cache
+DEFAULT_CACHE_SIZE = 20000
+
+
+def scan(source: str) -> FrozenSet[str]:
+    """Prefilter tokens present in a source file"""
+    tokens = set(_KEYWORDS.findall(source))
+    if COMMENT in source:
+        tokens.add(COMMENT)
+    if _DIGIT.search(source):
+        tokens.add(NUMBER)
+    return frozenset(tokens)
+
+
+def may_match(detector: str, tokens: FrozenSet[str]) -> bool:
+    """Whether a detector can report anything in a file with these tokens (unknown detectors: yes)"""
+    needed = DETECTOR_TOKENS.get(detector)
+    return needed is None or not tokens.isdisjoint(needed)
+
+
+def needs_tree(detectors: Iterable[str], tokens: FrozenSet[str]) -> bool:
+    """Whether the file must be parsed for these detectors, its statistics and its functions"""
+    return not tokens.isdisjoint(STRUCTURE_TOKENS) or any(name not in TEXT_DETECTORS for name in detectors)
+
+
+class TokenCache:
+    """Prefilter tokens per content hash, least recently used first out"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[str, FrozenSet[str]]" = collections.OrderedDict()
+
+    def tokens(self, parsed) -> FrozenSet[str]:
+        """Tokens of a ParsedFile, scanned on the first request for its content"""
+        tokens = self._entries.get(parsed.digest)
+        metrics.CACHE_REQUESTS.inc(cache="tokens", result="miss" if tokens is None else "hit")
+        if tokens is not None:
+            self._entries.move_to_end(parsed.digest)
+            return tokens
+        tokens = scan(parsed.source)
+        if self.max_entries > 0:
+            self._entries[parsed.digest] = tokens
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return tokens
+
+    def __len__(self):
+        return len(self._entries)
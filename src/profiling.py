@@ -0,0 +1,190 @@
+"""
+Profiling modes
+`--profile cpu` runs the whole tool under cProfile, and every worker process of a parallel run as
+well; the statistics of all processes are merged into <output>/profile/cpu.pstats (open it with
+pstats or snakeviz) and the most expensive functions are listed in cpu_top.txt.
+
+`--profile memory` traces the allocations of the main process with tracemalloc and reports, for
+every stage of the run (see src/perf.py; in detect_main each detector is a stage), its peak memory
+and the allocation sites that held the most memory at that peak, in memory.json and memory_top.txt.
+The peak is located by taking a snapshot whenever the traced memory grew by SNAPSHOT_GROWTH since
+the previous one, checked between the files of a stage.
+"""
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from . import perf
+from .config_loader import get_config
+
+MODES = ("cpu", "memory")
+
+# Functions listed in cpu_top.txt, allocation sites per stage in the memory report
+TOP_FUNCTIONS = 40
+TOP_SITES = 10
+
+# A stage snapshot is taken when the traced memory grew by this factor since the last one
+SNAPSHOT_GROWTH = 1.1
+
+_cpu_profiler: Optional[cProfile.Profile] = None
+
+# where the worker processes of this run dump their statistics
+_worker_dir: Optional[str] = None
+
+
+def profile_dir() -> str:
+    return os.path.join(get_config().get_output_dir(), "profile")
+
+
+def cpu_active() -> bool:
+    return _cpu_profiler is not None
+
+
+def start_cpu(workers: bool = True) -> cProfile.Profile:
+    """Profile this process until stop_cpu(), and with workers the worker processes it starts"""
+    global _cpu_profiler, _worker_dir
+    if workers:
+        _worker_dir = tempfile.mkdtemp(prefix="profile-")
+    _cpu_profiler = cProfile.Profile()
+    _cpu_profiler.enable()
+    return _cpu_profiler
+
+
+def worker_prefix() -> Optional[str]:
+    """Path prefix of the statistics files of the workers, when they are to be profiled"""
+    return os.path.join(_worker_dir, "worker") if _cpu_profiler is not None and _worker_dir else None
+
+
+def stop_cpu() -> Optional[cProfile.Profile]:
+    global _cpu_profiler
+    profiler, _cpu_profiler = _cpu_profiler, None
+    if profiler is not None:
+        profiler.disable()
+    return profiler
+
+
+def dump_cpu(path: str):
+    """Worker side: write the statistics collected so far by this process' profiler"""
+    if _cpu_profiler is not None:
+        _cpu_profiler.disable()
+        _cpu_profiler.dump_stats(path)
+        _cpu_profiler.enable()
+
+
+def write_cpu_report(profiler: cProfile.Profile, directory: Optional[str] = None) -> List[str]:
+    """
+    Merge the statistics of this process and of its workers
+
+    Returns:
+        paths of cpu.pstats and cpu_top.txt
+    """
+    global _worker_dir
+    directory = directory or profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    worker_stats = sorted(glob.glob(os.path.join(_worker_dir, "*.pstats"))) if _worker_dir else []
+    stats = pstats.Stats(profiler)
+    for path in worker_stats:
+        stats.add(path)
+    stats_path = os.path.join(directory, "cpu.pstats")
+    stats.dump_stats(stats_path)
+
+    text = io.StringIO()
+    pstats.Stats(stats_path, stream=text).strip_dirs().sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    top_path = os.path.join(directory, "cpu_top.txt")
+    with open(top_path, "w", encoding="utf8") as f:
+        f.write("{} process(es) profiled\n".format(1 + len(worker_stats)))
+        f.write(text.getvalue())
+    if _worker_dir:
+        shutil.rmtree(_worker_dir, ignore_errors=True)
+        _worker_dir = None
+    return [stats_path, top_path]
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+class MemoryTracker:
+    """
+    Peak traced memory and its allocation sites per stage; hooked into a perf.Recorder, which calls
+    enter()/exit() around every stage and sample() after every file
+    """
+
+    def __init__(self, top_sites: int = TOP_SITES):
+        self.top_sites = top_sites
+        # open stages, innermost last: [name, start snapshot, peak snapshot, its traced size, peak, start size]
+        self._open: List[list] = []
+        self.stages: List[Dict[str, Any]] = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _update_peaks(self) -> int:
+        """Fold the peak since the last reset into the open stages; returns the current size"""
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._open:
+            frame[4] = max(frame[4], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def enter(self, name: str):
+        self._update_peaks()
+        snapshot = _snapshot()
+        current = tracemalloc.get_traced_memory()[0]
+        self._open.append([name, snapshot, snapshot, current, current, current])
+
+    def sample(self):
+        if not self._open:
+            return
+        current = self._update_peaks()
+        snapshot = None
+        for frame in self._open:
+            if current > frame[3] * SNAPSHOT_GROWTH:
+                snapshot = snapshot or _snapshot()
+                frame[2], frame[3] = snapshot, current
+
+    def exit(self, name: str, detector: bool = False):
+        self.sample()
+        frame = self._open.pop()
+        _, start, at_peak, _, peak, start_size = frame
+        if self._open:
+            self._open[-1][4] = max(self._open[-1][4], peak)
+        growth = sorted((stat for stat in at_peak.compare_to(start, "lineno") if stat.size_diff > 0),
+                        key=lambda stat: -stat.size_diff)
+        sites = [{"site": "{}:{}".format(stat.traceback[0].filename, stat.traceback[0].lineno),
+                  "size": stat.size_diff, "count": stat.count_diff}
+                 for stat in growth[:self.top_sites]]
+        self.stages.append({"stage": name, "detector": detector, "peak": peak, "start": start_size, "sites": sites})
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def write_report(self, directory: Optional[str] = None) -> List[str]:
+        """Write memory.json and memory_top.txt; returns their paths"""
+        directory = directory or profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, "memory.json")
+        with open(json_path, "w", encoding="utf8") as f:
+            json.dump({"stages": self.stages}, f, indent=2)
+        top_path = os.path.join(directory, "memory_top.txt")
+        with open(top_path, "w", encoding="utf8") as f:
+            for stage in sorted(self.stages, key=lambda stage: -stage["peak"]):
+                f.write("{} peak {:.1f} MiB (started at {:.1f} MiB)\n".format(
+                    stage["stage"], stage["peak"] / 2 ** 20, stage["start"] / 2 ** 20))
+                for site in stage["sites"]:
+                    f.write("    {:>10.1f} KiB {:>8} blocks  {}\n".format(site["size"] / 1024, site["count"],
+                                                                       site["site"]))
+        return [json_path, top_path]
+
+
+def start_memory() -> MemoryTracker:
+    """Trace the allocations of the stages recorded from now on (starts recording if needed)"""
+    recorder = perf.active() or perf.start()
+    recorder.memory = MemoryTracker()
+    return recorder.memory
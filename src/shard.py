@@ -0,0 +1,223 @@
+"""
+Sharded runs
+Split the analysis of a large project over several machines or processes. `--shard i/N` analyzes
+the files whose path hashes to shard i and writes a result bundle: the per-file findings, the
+duplicate pairs inside the shard and the fingerprint index (duplicate-detection features) of every
+function of the shard. `merge` checks that the N bundles belong together, combines them into the
+final totals, worst cases and reports, and finds the duplicate pairs across shards from the merged
+fingerprint indexes, without reading any source file again.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import perf
+from .config_loader import get_config
+from .engine import AnalysisEngine, FindingCollector, Results
+from .findings import worst_findings
+from .parallel import DEFAULT_CHUNK_SIZE, TimingStore, WorkerPool, assemble_results, default_timings_path, \
+    estimate_costs, file_size, schedule_chunks
+from .sources import display_name, iter_python_files
+from .Detector.duplicate_code_detector import _emit_finding as emit_duplicate, find_duplicates_between
+
+BUNDLE_VERSION = 1
+
+_BUNDLE_NAME = re.compile(r"^(?P<project>.+)\.shard-(?P<index>\d+)-of-(?P<count>\d+)\.json\.gz$")
+
+
+class ShardError(Exception):
+    """Invalid shard specification, or bundles that cannot be merged"""
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """"i/N" -> (i, N), shards are numbered from 1 to N"""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ShardError("invalid shard {!r}, expected i/N".format(spec))
+    if not 1 <= index <= count:
+        raise ShardError("invalid shard {!r}: i must be between 1 and N".format(spec))
+    return index, count
+
+
+def shard_of(name: str, count: int) -> int:
+    """Shard (1..count) of a file, from a hash of its name: the same on every machine and run"""
+    return int(hashlib.sha1(name.encode("utf8", "surrogateescape")).hexdigest()[:8], 16) % count + 1
+
+
+def bundle_name(project: str, index: int, count: int) -> str:
+    return "{}.shard-{}-of-{}.json.gz".format(project, index, count)
+
+
+def default_bundle_dir() -> str:
+    return os.path.join(get_config().get_output_dir(), "shards")
+
+
+def _settings(plan) -> Dict[str, Any]:
+    """What must be equal in all shards for their results to be comparable"""
+    return json.loads(json.dumps({"detectors": [name for name, _ in plan.detectors], "thresholds": plan.thresholds,
+                                  "pylint": plan.pylint, "duplicates": plan.duplicates}, sort_keys=True))
+
+
+def run_shard(directory: str, index: int, count: int, bundle_dir: Optional[str] = None, jobs: Optional[int] = 1,
+              chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """
+    Analyze the files of one shard of a project and write its bundle
+
+    Returns:
+        path of the bundle, <bundle_dir>/<project>.shard-<i>-of-<N>.json.gz
+    """
+    started = time.perf_counter()
+    config = get_config()
+    plan = AnalysisEngine(config).prepare()
+    project = os.path.basename(os.path.normpath(directory))
+    tasks = []
+    with perf.stage("discovery"):
+        for path in iter_python_files([directory]):
+            name = display_name(path, directory)
+            if shard_of(name, count) == index:
+                tasks.append((index, path, name))
+
+    files, errors = {}, []
+    paths = {name: path for _, path, name in tasks}
+    # one timings file per shard: the shards of a run may share the output directory
+    timings = TimingStore(default_timings_path("timings.{}.shard-{}-of-{}.json".format(project, index, count)))
+    with WorkerPool(jobs, config) as pool:
+        chunks = schedule_chunks(tasks, pool.jobs, estimate_costs(tasks, timings), chunk_size)
+        for outcomes, chunk_errors in pool.run(chunks):
+            for _, name, file_result, error, seconds in outcomes:
+                if file_result is None:
+                    errors.append((name, error))
+                else:
+                    files[name] = file_result
+                    timings.record(paths[name], file_size(paths[name]), seconds)
+            errors.extend(("pylint", error) for error in chunk_errors)
+    timings.save()
+    functions = [{"name": func["name"], "filename": func["filename"], "lineno": func["lineno"],
+                  "features": sorted(func["features"])}
+                 for name in sorted(files) for func in files[name].functions]
+    with perf.stage("duplicate_code", detector=True):
+        results = assemble_results(files, plan.duplicates, plan.thresholds["duplicate"], errors)
+
+    bundle = {
+        "version": BUNDLE_VERSION,
+        "project": project,
+        "shard": [index, count],
+        "settings": _settings(plan),
+        "files": results.files,
+        "findings": results.findings,
+        "stats": dict(results.stats),
+        "errors": [list(error) for error in results.errors],
+        "skipped": [list(skipped) for skipped in results.skipped],
+        "functions": functions,
+        "elapsed": round(time.perf_counter() - started, 4),
+    }
+    bundle_dir = bundle_dir or default_bundle_dir()
+    os.makedirs(bundle_dir, exist_ok=True)
+    path = os.path.join(bundle_dir, bundle_name(project, index, count))
+    # written under a temporary name, so that a merge never reads a half-written bundle
+    with gzip.open(path + ".part", "wt", encoding="utf8") as f:
+        json.dump(bundle, f, separators=(",", ":"))
+    os.replace(path + ".part", path)
+    return path
+
+
+def find_bundles(paths: List[str], project: Optional[str] = None) -> List[str]:
+    """Bundle files among the given files and directories, optionally of one project only"""
+    found = []
+    for path in paths:
+        candidates = sorted(glob.glob(os.path.join(path, "*.shard-*-of-*.json.gz"))) if os.path.isdir(path) else [path]
+        for candidate in candidates:
+            match = _BUNDLE_NAME.match(os.path.basename(candidate))
+            if match and (project is None or match.group("project") == project):
+                found.append(candidate)
+    return found
+
+
+def load_bundle(path: str) -> Dict[str, Any]:
+    try:
+        with gzip.open(path, "rt", encoding="utf8") as f:
+            bundle = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ShardError("cannot read bundle {}: {}".format(path, e))
+    if bundle.get("version") != BUNDLE_VERSION:
+        raise ShardError("bundle {} has an unsupported version".format(path))
+    return bundle
+
+
+def merge_bundles(paths: List[str]) -> Tuple[str, Results]:
+    """
+    Combine the bundles of all shards of a project
+
+    Raises:
+        ShardError: bundles of different projects, runs or settings, or missing/duplicated shards
+
+    Returns:
+        (project name, Results of the whole project)
+    """
+    started = time.perf_counter()
+    bundles = [load_bundle(path) for path in paths]
+    if not bundles:
+        raise ShardError("no shard bundles to merge")
+    first = bundles[0]
+    for bundle in bundles[1:]:
+        if bundle["project"] != first["project"]:
+            raise ShardError("bundles of different projects: {} and {}".format(first["project"], bundle["project"]))
+        if bundle["shard"][1] != first["shard"][1]:
+            raise ShardError("bundles of runs with a different number of shards")
+        if bundle["settings"] != first["settings"]:
+            raise ShardError("bundles of runs with different detector settings")
+    count = first["shard"][1]
+    indexes = sorted(bundle["shard"][0] for bundle in bundles)
+    if indexes != list(range(1, count + 1)):
+        missing = sorted(set(range(1, count + 1)) - set(indexes))
+        raise ShardError("expected shards 1..{}; missing {}, duplicated {}".format(
+            count, missing, sorted({i for i in indexes if indexes.count(i) > 1})))
+    bundles.sort(key=lambda bundle: bundle["shard"][0])
+
+    results = Results()
+    findings, duplicates = [], []
+    for bundle in bundles:
+        results.files += bundle["files"]
+        results.add_stats(bundle["stats"])
+        results.errors.extend(tuple(error) for error in bundle["errors"])
+        results.skipped.extend(tuple(skipped) for skipped in bundle.get("skipped", ()))
+        for finding in bundle["findings"]:
+            (duplicates if finding["smell"] == "duplicate_code" else findings).append(finding)
+
+    settings = first["settings"]
+    if settings["duplicates"]:
+        functions = [[dict(func, features=frozenset(func["features"])) for func in bundle["functions"]]
+                     for bundle in bundles]
+        collector = FindingCollector()
+        for i, shard_functions in enumerate(functions):
+            for other_functions in functions[i + 1:]:
+                for duplicate in find_duplicates_between(shard_functions, other_functions,
+                                                         settings["thresholds"]["duplicate"]):
+                    emit_duplicate(duplicate, collector)
+        duplicates.extend(collector.findings)
+
+    # same order as a single run: files by name, then the duplicate pairs
+    findings.sort(key=lambda finding: str(finding["filename"]))
+    duplicates.sort(key=lambda finding: (finding["filename"], finding["lineno"], finding["related"]["filename"],
+                                         finding["related"]["lineno"]))
+    for finding in findings + duplicates:
+        results.add(finding)
+    # the shards ran side by side: the slowest one plus the merge
+    results.elapsed = max(bundle["elapsed"] for bundle in bundles) + time.perf_counter() - started
+    return first["project"], results
+
+
+def write_merged_reports(project: str, results: Results, shards: int):
+    """Findings reports of a merged run; the summary also lists the worst case of every smell"""
+    from .detector import write_findings_reports
+    summary = results.summary()
+    write_findings_reports(project, results.findings, {"totals": summary["totals"], "stats": summary["stats"],
+                                                       "skipped": summary["skipped"],
+                                                       "worst": worst_findings(results.findings),
+                                                       "shards": shards})
@@ -0,0 +1,122 @@
+"""
+Source files
+The analysis engine works on (filename, source) pairs instead of directories. This module turns
+directories and file paths into such pairs and parses each file at most once.
+"""
+import ast
+import hashlib
+import os
+from typing import Iterable, Iterator, List, Optional
+
+from .config_loader import get_config
+
+
+class ParsedFile:
+    """One Python source file; the AST and line list are built on first use and then shared by all detectors"""
+
+    def __init__(self, filename: str, source: str, disk_path: Optional[str] = None):
+        """
+        Args:
+            filename: name reported in findings (usually relative to the project root)
+            source: file contents
+            disk_path: path of a file on disk with exactly this content, if there is one
+        """
+        self.filename = filename
+        self.source = source
+        self.disk_path = disk_path
+        self._tree = None
+        self._lines = None
+        self._digest = None
+
+    @classmethod
+    def from_path(cls, disk_path: str, filename: Optional[str] = None) -> "ParsedFile":
+        with open(disk_path, encoding='UTF8') as f:
+            source = f.read()
+        return cls(filename or os.path.basename(disk_path), source, disk_path)
+
+    @property
+    def tree(self) -> ast.AST:
+        if self._tree is None:
+            self._tree = ast.parse(self.source, self.filename)
+        return self._tree
+
+    @property
+    def lines(self) -> List[str]:
+        if self._lines is None:
+            self._lines = self.source.splitlines(True)
+        return self._lines
+
+    @property
+    def digest(self) -> str:
+        """Content hash, used as cache key"""
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.source.encode('utf8', 'surrogatepass')).hexdigest()
+        return self._digest
+
+    def release(self):
+        """Drop the parsed tree once every detector is done with it"""
+        self._tree = None
+        self._lines = None
+
+
+def _is_ignored(path: str, config=None) -> bool:
+    return (config or get_config()).should_ignore_file(path)
+
+
+def iter_directory_files(directory: str, config=None) -> Iterator[str]:
+    """Python files directly inside a directory (the flat layout of code-dump), sorted"""
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".py") and not _is_ignored(os.path.join(directory, filename), config):
+            yield os.path.join(directory, filename)
+
+
+def iter_python_files(paths: Iterable[str], config=None) -> Iterator[str]:
+    """
+    Python files of the given files and (recursively walked) directories, honouring the ignore
+    rules of config (default: the global configuration)
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            if path.endswith(".py") and not _is_ignored(path, config):
+                yield path
+            continue
+        for root, dirs, filenames in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not _is_ignored(os.path.join(root, d) + os.sep, config))
+            for filename in sorted(filenames):
+                file_path = os.path.join(root, filename)
+                if filename.endswith(".py") and not _is_ignored(file_path, config):
+                    yield file_path
+
+
+def display_name(path: str, root: Optional[str] = None) -> str:
+    """Name of a file in findings: relative to root (or the working directory) with forward slashes"""
+    root = root or os.getcwd()
+    try:
+        name = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    except ValueError:  # different drive on Windows
+        name = os.path.abspath(path)
+    if name.startswith(".."):
+        name = os.path.abspath(path)
+    return name.replace(os.sep, "/")
+
+
+def load_sources(file_paths: Iterable[str], root: Optional[str] = None, flat: bool = False,
+                 errors: Optional[list] = None) -> Iterator[ParsedFile]:
+    """
+    Read files into ParsedFile objects, lazily
+
+    Args:
+        file_paths: files to read
+        root: findings name files relative to this directory
+        flat: name files by their base name only (code-dump layout)
+        errors: unreadable files are skipped and appended here as (name, error message)
+    """
+    for path in file_paths:
+        name = os.path.basename(path) if flat else display_name(path, root)
+        try:
+            parsed = ParsedFile.from_path(path, name)
+        except (OSError, UnicodeDecodeError) as e:
+            if errors is not None:
+                errors.append((name, str(e)))
+            continue
+        yield parsed
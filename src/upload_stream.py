@@ -0,0 +1,125 @@
+"""
+Streaming uploads
+Parse a multipart/form-data upload while it is still arriving and hand every complete .py file to
+the analysis engine right away. The request body is read by a background thread, so the per-file
+detectors run while the rest of the upload is in flight; only the cross-file stages (pylint over
+all files, duplicate detection) wait for the end of the upload.
+"""
+import queue
+import threading
+from typing import Iterable, Iterator, Optional
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from .archive_sources import _decode, _member_name, _too_large, _wanted
+from .sources import ParsedFile
+
+# Bytes read from the request body at a time
+CHUNK_SIZE = 64 * 1024
+
+# Files parsed ahead of the analysis before the reader waits
+PREFETCH = 64
+
+
+class UploadError(Exception):
+    """The upload is not valid multipart/form-data or ended early"""
+
+
+class MultipartUpload:
+    """
+    The .py files of one multipart field, as ParsedFile objects in upload order
+
+    Files are named by the path the browser sent (webkitRelativePath for directory uploads);
+    files that are ignored by the configuration are dropped, files that are too large or not
+    UTF-8 are skipped and recorded in errors.
+    """
+
+    def __init__(self, stream, boundary: str, field: str = "files"):
+        self.stream = stream
+        self.boundary = boundary
+        self.field = field
+        # top-level directory of the first uploaded file
+        self.project: Optional[str] = None
+        self.errors: list = []
+
+    def __iter__(self) -> Iterator[ParsedFile]:
+        decoder = MultipartDecoder(self.boundary.encode("latin1"))
+        name, parts, size = None, [], 0
+        try:
+            while True:
+                chunk = self.stream.read(CHUNK_SIZE)
+                decoder.receive_data(chunk or None)
+                event = decoder.next_event()
+                while not isinstance(event, NeedData):
+                    if isinstance(event, File):
+                        name, parts, size = self._start(event), [], 0
+                    elif isinstance(event, Field):
+                        name = None
+                    elif isinstance(event, Data) and name is not None:
+                        size += len(event.data)
+                        if _too_large(name, size, self.errors):
+                            name = None
+                        else:
+                            parts.append(event.data)
+                            if not event.more_data:
+                                parsed = _decode(name, b"".join(parts), self.errors)
+                                name, parts = None, []
+                                if parsed is not None:
+                                    yield parsed
+                    elif isinstance(event, Epilogue):
+                        return
+                    event = decoder.next_event()
+        except ValueError as e:
+            raise UploadError("invalid upload: {}".format(e))
+
+    def _start(self, event: File) -> Optional[str]:
+        """Name of the file a part starts, or None if it is not analyzed"""
+        if event.name != self.field or not event.filename:
+            return None
+        name = _member_name(event.filename)
+        if self.project is None:
+            self.project = name.split("/")[0] if "/" in name else ""
+        return name if _wanted(name) else None
+
+
+def prefetch(items: Iterable, size: int = PREFETCH) -> Iterator:
+    """
+    Produce the items in a background thread and yield them as they become available
+
+    Exceptions of the producer are raised in the consumer. When the consumer stops early the
+    producer is stopped at its next item.
+    """
+    pending: "queue.Queue" = queue.Queue(size)
+    stop = threading.Event()
+    end = object()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except BaseException as e:  # handed to the consumer
+            put((end, e))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = pending.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
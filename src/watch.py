@@ -0,0 +1,205 @@
+"""
+Watch mode
+Keep the analysis of a project up to date while it is being edited. The project directory is
+polled for modified, added and removed Python files; only those are analyzed again (through the
+per-file detectors of the analysis engine) and the cross-file results are patched instead of
+recomputed: totals are adjusted by the difference of the changed files, and duplicate pairs are
+only searched between the changed functions and the rest of the project.
+"""
+import collections
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .engine import AnalysisEngine, FileResult, FindingCollector, STATS_NODES
+from .sources import display_name, iter_python_files, load_sources
+from .Detector.duplicate_code_detector import _emit_finding as emit_duplicate, find_duplicates
+
+# Seconds between two scans of the project
+DEFAULT_INTERVAL = 1.0
+
+
+def _finding_key(finding: Dict[str, Any]) -> tuple:
+    related = finding.get("related") or {}
+    return (finding["smell"], finding["filename"], finding["lineno"], finding.get("message"),
+            related.get("filename"), related.get("lineno"))
+
+
+class Change:
+    """Outcome of one incremental update"""
+
+    def __init__(self, files: List[str], removed: List[str]):
+        self.files = files
+        self.removed = removed
+        self.new_findings: List[Dict[str, Any]] = []
+        self.resolved_findings: List[Dict[str, Any]] = []
+        self.errors: List[tuple] = []
+        self.elapsed = 0.0
+
+
+class IncrementalProject:
+    """Findings of a project kept up to date file by file"""
+
+    def __init__(self, root: str, engine: Optional[AnalysisEngine] = None):
+        self.root = root
+        self.engine = engine or AnalysisEngine()
+        # file name -> FileResult of the current content
+        self.files: Dict[str, FileResult] = {}
+        # duplicate_code findings between the current files
+        self.duplicates: List[Dict[str, Any]] = []
+        self.totals: Dict[str, int] = collections.Counter()
+        self.stats: Dict[str, int] = collections.Counter()
+        # path -> (mtime, size) at the last scan
+        self._seen: Dict[str, Tuple[int, int]] = {}
+
+    def scan(self) -> Tuple[List[str], List[str]]:
+        """Paths of the files added or modified, and of the files removed, since the last scan"""
+        current = {}
+        for path in iter_python_files([self.root]):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            current[path] = (st.st_mtime_ns, st.st_size)
+        changed = [path for path, signature in current.items() if self._seen.get(path) != signature]
+        removed = [path for path in self._seen if path not in current]
+        self._seen = current
+        return changed, removed
+
+    def update(self, changed: List[str], removed: List[str]) -> Change:
+        """Analyze the changed files again and patch the project results"""
+        started = time.perf_counter()
+        plan = self.engine.prepare()
+        change = Change([display_name(path, self.root) for path in changed],
+                        [display_name(path, self.root) for path in removed])
+        touched = set(change.files) | set(change.removed)
+
+        old_findings = [finding for name in touched if name in self.files
+                        for finding in self.files[name].findings]
+        for name in touched:
+            old = self.files.pop(name, None)
+            if old is not None:
+                self._count(old, -1)
+
+        # Per-file detectors, then one pylint run over every file that was not in the cache
+        pending, new_results = [], []
+        read_errors = []
+        for parsed in load_sources(changed, root=self.root, errors=read_errors):
+            file_result, cached = self.engine.file_result(parsed, plan)
+            if not cached and plan.pylint and file_result.parsed:
+                pending.append((parsed, file_result))
+            new_results.append((parsed.filename, file_result))
+        if pending:
+            _, error = self.engine.run_pylint(pending)
+            if error:
+                change.errors.append(("pylint", error))
+        change.errors.extend(read_errors)
+        for name, file_result in new_results:
+            self.files[name] = file_result
+            self._count(file_result, 1)
+            change.errors.extend((name, error) for error in file_result.errors)
+
+        # Duplicate pairs: drop the pairs of touched files, compare the changed functions with the rest
+        old_duplicates = [dup for dup in self.duplicates
+                          if dup["filename"] in touched or dup["related"]["filename"] in touched]
+        self.duplicates = [dup for dup in self.duplicates
+                           if dup["filename"] not in touched and dup["related"]["filename"] not in touched]
+        new_duplicates = []
+        if plan.duplicates:
+            changed_functions = [func for name, file_result in new_results for func in file_result.functions]
+            other_functions = [func for name, file_result in sorted(self.files.items()) if name not in touched
+                               for func in file_result.functions]
+            collector = FindingCollector()
+            for duplicate in find_duplicates(changed_functions, plan.thresholds["duplicate"], other_functions):
+                emit_duplicate(duplicate, collector)
+            new_duplicates = collector.findings
+        self.duplicates.extend(new_duplicates)
+        self.totals["duplicate_code"] += len(new_duplicates) - len(old_duplicates)
+
+        new_findings = [finding for _, file_result in new_results for finding in file_result.findings]
+        change.new_findings, change.resolved_findings = _difference(old_findings + old_duplicates,
+                                                                   new_findings + new_duplicates)
+        change.elapsed = time.perf_counter() - started
+        return change
+
+    def _count(self, file_result: FileResult, sign: int):
+        for finding in file_result.findings:
+            self.totals[finding["smell"]] += sign
+        for name, count in file_result.stats.items():
+            self.stats[name] += sign * count
+
+    def findings(self):
+        """All current findings, file by file, then the duplicate pairs"""
+        for name in sorted(self.files):
+            yield from self.files[name].findings
+        yield from self.duplicates
+
+    def summary(self) -> Dict[str, Any]:
+        stats = {name: self.stats.get(name, 0) for name in STATS_NODES.values()}
+        stats["codeblocks"] = stats["methods"] + stats["classes"]
+        return {"totals": {smell: count for smell, count in self.totals.items() if count},
+                "stats": stats, "files": len(self.files)}
+
+
+def _difference(old: List[Dict[str, Any]], new: List[Dict[str, Any]]):
+    """(findings only in new, findings only in old), comparing smell, place and message"""
+    old_keys = collections.Counter(_finding_key(finding) for finding in old)
+    new_keys = collections.Counter(_finding_key(finding) for finding in new)
+    added, resolved = new_keys - old_keys, old_keys - new_keys
+    return _pick(new, added), _pick(old, resolved)
+
+
+def _pick(findings, keys):
+    picked = []
+    for finding in findings:
+        key = _finding_key(finding)
+        if keys[key] > 0:
+            keys[key] -= 1
+            picked.append(finding)
+    return picked
+
+
+def refresh_reports(project: IncrementalProject, dirname: str):
+    """Rewrite the findings files (and the HTML report if enabled) from the current results"""
+    from .detector import write_findings_reports
+    summary = project.summary()
+    write_findings_reports(dirname, project.findings(), {"totals": summary["totals"], "stats": summary["stats"]})
+
+
+def watch(directory: str, interval: float = DEFAULT_INTERVAL, max_updates: Optional[int] = None):
+    """
+    Analyze a project, then keep analyzing its changed files until interrupted (Ctrl+C)
+
+    Args:
+        directory: project directory, analyzed in place
+        interval: seconds between two scans
+        max_updates: stop after this many updates (including the first analysis); None runs forever
+    """
+    from tools.smell_client import format_finding
+
+    dirname = os.path.basename(os.path.normpath(directory))
+    project = IncrementalProject(directory)
+    updates = 0
+    try:
+        while max_updates is None or updates < max_updates:
+            changed, removed = project.scan()
+            if changed or removed:
+                change = project.update(changed, removed)
+                refresh_reports(project, dirname)
+                updates += 1
+                if updates > 1:
+                    for finding in change.new_findings:
+                        print("+ " + format_finding(finding))
+                    for finding in change.resolved_findings:
+                        print("- " + format_finding(finding))
+                for name, error in change.errors:
+                    print("{}: error: {}".format(name, error))
+                print("[{}] {} changed, {} removed: {} new, {} resolved, {} findings in {} files ({:.3f}s)".format(
+                    time.strftime("%H:%M:%S"), len(change.files), len(change.removed),
+                    len(change.new_findings), len(change.resolved_findings),
+                    sum(project.totals.values()), len(project.files), change.elapsed), flush=True)
+                continue
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    return project
@@ -0,0 +1,76 @@
+"""
+库接口 analyze() 的单元测试
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from src.api import analyze, write_reports
+from src.config_loader import ConfigLoader, reset_config
+from tests.test_engine import SMELLY_SOURCE
+
+
+class TestApi(unittest.TestCase):
+    """内存分析接口测试"""
+
+    def setUp(self):
+        reset_config()
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+        reset_config()
+
+    def test_pairs_and_paths(self):
+        """测试同时接受 (路径, 源码) 对和文件路径"""
+        os.makedirs("pkg")
+        with open(os.path.join("pkg", "util.py"), "w", encoding="utf8") as f:
+            f.write("def helper(a, b, c, d, e, f):\n    return a\n")
+        results = analyze([("app/account.py", SMELLY_SOURCE), "pkg", "missing.py"])
+        self.assertEqual(results.files, 2)
+        names = {f["filename"] for f in results.findings}
+        self.assertEqual(names, {"app/account.py", "pkg/util.py"})
+        self.assertIn("long_parameter", results.totals)
+        self.assertEqual(results.errors, [("missing.py", "no such file or directory")])
+
+    def test_undecodable_source_is_an_error(self):
+        """测试非 UTF-8 的源码字节被跳过并记为错误"""
+        results = analyze([("bad.py", b"\xff\xfe x = 1"), ("app/account.py", SMELLY_SOURCE.encode("utf8"))])
+        self.assertEqual(results.files, 1)
+        self.assertEqual([name for name, _ in results.errors], ["bad.py"])
+
+    def test_config_ignore_rules(self):
+        """测试调用方传入的配置决定目录与压缩包中忽略的文件"""
+        from tests.test_archive_sources import make_zip
+        os.makedirs(os.path.join("pkg", "generated"))
+        for name in ("util.py", os.path.join("generated", "models.py")):
+            with open(os.path.join("pkg", name), "w", encoding="utf8") as f:
+                f.write("def helper(a, b, c, d, e, f):\n    return a\n")
+        with open("proj.zip", "wb") as f:
+            f.write(make_zip().getvalue())
+        config = ConfigLoader()
+        config.config["ignore"]["directories"] = ["generated", "app"]
+        results = analyze(["pkg", "proj.zip"], config=config)
+        names = {f["filename"] for f in results.findings}
+        self.assertIn("pkg/util.py", names)
+        self.assertFalse({name for name in names if "generated" in name or "/app/" in name})
+
+    def test_no_files_written(self):
+        """测试分析过程不写任何文件，只有调用渲染器时才写报告"""
+        with mock.patch("tempfile.mkstemp", side_effect=AssertionError("temporary file")), \
+                mock.patch("tempfile.mkdtemp", side_effect=AssertionError("temporary directory")):
+            results = analyze([("account.py", SMELLY_SOURCE)])
+        self.assertIn("long_parameter", results.totals)
+        self.assertEqual(os.listdir(self.workdir), [])
+
+        write_reports(results, "demo")
+        self.assertTrue(os.path.exists(os.path.join("output", "demo_findings.ndjson")))
+
+
+if __name__ == '__main__':
+    unittest.main()
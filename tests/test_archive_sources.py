@@ -0,0 +1,112 @@
+"""
+压缩包（zip/tar）直接分析的单元测试
+"""
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from src import archive_sources
+from src.api import analyze
+from src.archive_sources import ArchiveError, archive_project_name, iter_archive_sources
+from src.config_loader import reset_config
+from tests.test_engine import SMELLY_SOURCE
+
+MEMBERS = {
+    "proj/app/account.py": SMELLY_SOURCE.encode("utf8"),
+    "proj/README.md": b"# readme\n",
+    "proj/latin1.py": "x = 'caf\xe9'\n".encode("latin1"),
+}
+
+
+def make_zip():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zf:
+        for name, content in MEMBERS.items():
+            zf.writestr(name, content)
+    data.seek(0)
+    return data
+
+
+def make_tar():
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as tf:
+        for name, content in MEMBERS.items():
+            info = tarfile.TarInfo("./" + name)
+            info.size = len(content)
+            tf.addfile(info, io.BytesIO(content))
+    data.seek(0)
+    return data
+
+
+class TestArchiveSources(unittest.TestCase):
+    """压缩包读取测试"""
+
+    def setUp(self):
+        reset_config()
+
+    def tearDown(self):
+        reset_config()
+
+    def test_members_keep_archive_paths(self):
+        """测试 zip 与 tar.gz 成员保留包内相对路径，非 UTF-8 文件记为错误"""
+        for name, data in (("proj.zip", make_zip()), ("proj.tar.gz", make_tar())):
+            errors = []
+            sources = list(iter_archive_sources(data, name, errors))
+            self.assertEqual([parsed.filename for parsed in sources], ["proj/app/account.py"])
+            self.assertEqual([error[0] for error in errors], ["proj/latin1.py"])
+
+    def test_tar_is_read_as_a_stream(self):
+        """测试 tar 包按流读取，不需要可回退的文件对象"""
+        class Stream(io.RawIOBase):
+            def __init__(self, data):
+                self.data = data
+
+            def readable(self):
+                return True
+
+            def readinto(self, buffer):
+                chunk = self.data.read(len(buffer))
+                buffer[:len(chunk)] = chunk
+                return len(chunk)
+
+        sources = list(iter_archive_sources(Stream(make_tar()), "proj.tgz"))
+        self.assertEqual(len(sources), 1)
+
+    def test_large_members_are_skipped(self):
+        """测试超过大小限制的成员被跳过"""
+        errors = []
+        with mock.patch.object(archive_sources, "MAX_MEMBER_SIZE", 10):
+            self.assertEqual(list(iter_archive_sources(make_zip(), "proj.zip", errors)), [])
+        self.assertEqual(len(errors), 2)
+
+    def test_bad_archives(self):
+        """测试损坏或不支持的压缩包"""
+        with self.assertRaises(ArchiveError):
+            list(iter_archive_sources(io.BytesIO(b"not a zip"), "proj.zip"))
+        with self.assertRaises(ArchiveError):
+            iter_archive_sources(io.BytesIO(b""), "proj.rar")
+        self.assertEqual(archive_project_name("dist/flask-2.0.tar.gz"), "flask-2.0")
+
+    def test_analyze_archive_path(self):
+        """测试库接口直接分析磁盘上的压缩包"""
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "proj.tar.gz")
+            with open(path, "wb") as f:
+                f.write(make_tar().getvalue())
+            results = analyze([path])
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(results.files, 1)
+        self.assertIn("long_parameter", results.totals)
+        self.assertEqual({f["filename"] for f in results.findings}, {"proj/app/account.py"})
+        self.assertEqual(len(results.errors), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
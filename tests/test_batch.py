@@ -0,0 +1,76 @@
+"""
+多项目批量分析与共享进程池的单元测试
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.batch import SUMMARY_FILENAME, project_names, read_project_list, run_batch
+from src.config_loader import get_config, reset_config
+from tests.test_engine import SMELLY_SOURCE
+
+
+class TestBatch(unittest.TestCase):
+    """批量模式测试"""
+
+    def setUp(self):
+        reset_config()
+        self.tmp = tempfile.mkdtemp()
+        get_config().config["output"]["directory"] = os.path.join(self.tmp, "output")
+        self.projects = []
+        for name, count in (("alpha", 3), ("beta", 1)):
+            root = os.path.join(self.tmp, "repos", name)
+            os.makedirs(os.path.join(root, "pkg"))
+            for i in range(count):
+                with open(os.path.join(root, "pkg", "mod{}.py".format(i)), "w", encoding="utf8") as f:
+                    f.write(SMELLY_SOURCE)
+            self.projects.append(root)
+
+    def tearDown(self):
+        reset_config()
+        shutil.rmtree(self.tmp)
+
+    def test_project_list(self):
+        """测试项目列表文件的解析与重名项目编号"""
+        list_file = os.path.join(self.tmp, "projects.txt")
+        with open(list_file, "w", encoding="utf8") as f:
+            f.write("# nightly\nrepos/alpha\n\n{}  # absolute\n".format(self.projects[1]))
+        self.assertEqual(read_project_list(list_file), self.projects)
+        self.assertEqual(project_names(["a/app", "b/app", "c/lib"]), ["app", "app-2", "lib"])
+
+    def _check(self, summary):
+        by_name = {project["project"]: project for project in summary["projects"]}
+        self.assertEqual(by_name["alpha"]["files"], 3)
+        self.assertEqual(by_name["beta"]["files"], 1)
+        # duplicates are only searched inside a project
+        self.assertEqual(by_name["beta"]["totals"]["duplicate_code"], 1)
+        self.assertGreater(by_name["alpha"]["totals"]["duplicate_code"], 1)
+        self.assertEqual(summary["files"], 4)
+        self.assertEqual(by_name["missing"]["errors"], [[os.path.join(self.tmp, "missing"), "not a directory"]])
+        self.assertEqual(summary["totals"]["long_parameter"], 4)
+
+    def test_batch_in_process(self):
+        """测试单进程批量分析：每个项目一份报告加一份汇总"""
+        finished = []
+        summary = run_batch(self.projects + [os.path.join(self.tmp, "missing")], jobs=1, chunk_size=2,
+                            progress=lambda run: finished.append(run.name))
+        self._check(summary)
+        self.assertEqual(sorted(finished), ["alpha", "beta", "missing"])
+        output = os.path.join(self.tmp, "output")
+        with open(os.path.join(output, "alpha_findings.ndjson"), encoding="utf8") as f:
+            self.assertIn('"pkg/mod2.py"', f.read())
+        with open(os.path.join(output, SUMMARY_FILENAME), encoding="utf8") as f:
+            self.assertEqual(json.load(f)["files"], 4)
+
+    def test_batch_worker_pool(self):
+        """测试多个项目共享工作进程池"""
+        summary = run_batch(self.projects + [os.path.join(self.tmp, "missing")], jobs=2, chunk_size=1,
+                            write_reports=False)
+        self._check(summary)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "output")))
+
+
+if __name__ == '__main__':
+    unittest.main()
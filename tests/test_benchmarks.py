@@ -0,0 +1,97 @@
+"""
+基准测试语料生成器与基准测试运行器的单元测试
+"""
+import ast
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.compare import compare_runs, rank_sum_pvalue, select_runs
+from benchmarks.corpus import CorpusSpec, corpus_key, file_source, generate, write_corpus
+from benchmarks.run import add_throughput, measure, scaling_exponents
+from benchmarks.store import ResultStore
+from src.config_loader import reset_config
+
+
+class TestBenchmarks(unittest.TestCase):
+    """基准测试工具测试"""
+
+    def setUp(self):
+        reset_config()
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        reset_config()
+        shutil.rmtree(self.tmp)
+
+    def test_corpus_deterministic_and_dense(self):
+        """测试语料可复现、小语料是大语料的前缀，且密度为 0 时不生成对应语法"""
+        small = list(generate(CorpusSpec(20, seed=3)))
+        self.assertEqual(small, list(generate(CorpusSpec(20, seed=3))))
+        self.assertEqual(small, list(generate(CorpusSpec(40, seed=3)))[:20])
+        self.assertNotEqual(small, list(generate(CorpusSpec(20, seed=4))))
+        for _, source in small:
+            ast.parse(source)
+
+        plain = CorpusSpec(20, lambda_density=0, try_density=0, class_density=0, magic_density=0)
+        sources = "".join(source for _, source in generate(plain))
+        self.assertNotIn("lambda", sources)
+        self.assertNotIn("try:", sources)
+        self.assertNotIn("class ", sources)
+        self.assertIn("lambda", file_source(CorpusSpec(20, lambda_density=1), 0))
+        self.assertNotEqual(corpus_key(plain), corpus_key(CorpusSpec(20)))
+
+    def test_measure_detector_and_scaling(self):
+        """测试语料只写一次，单个检测器基准报告吞吐量，并计算规模增长指数"""
+        spec = CorpusSpec(30, lambda_density=1, clone_density=1, class_density=0)
+        directory, info = write_corpus(spec, self.tmp)
+        self.assertEqual(len([name for _, _, names in os.walk(directory) for name in names if name.endswith(".py")]),
+                         30)
+        os.unlink(os.path.join(directory, "pkg000", "mod000000.py"))
+        self.assertEqual(write_corpus(spec, self.tmp), (directory, info))
+
+        row = add_throughput(measure("long_lambda", directory), info)
+        self.assertGreater(row["findings"], 0)
+        self.assertEqual(row["files"], 30)
+        self.assertGreater(row["loc_per_s"], row["files_per_s"])
+        self.assertGreater(measure("duplicate_code", directory)["findings"], 0)
+
+        rows = [{"benchmark": "linear", "files": 100, "seconds": 1.0},
+                {"benchmark": "linear", "files": 200, "seconds": 2.0},
+                {"benchmark": "quadratic", "files": 100, "seconds": 1.0},
+                {"benchmark": "quadratic", "files": 200, "seconds": 4.0}]
+        self.assertEqual(scaling_exponents(rows), {"linear": [1.0], "quadratic": [2.0]})
+
+    def test_store_and_compare(self):
+        """测试保存运行结果并与基线比较：显著变慢被标记为回归，噪声范围内的变化不标记"""
+        def result(benchmark, seconds, rss):
+            return {"benchmark": benchmark, "files": 1000, "corpus": "corpus-1000-abc",
+                    "seconds": seconds[0], "peak_rss_mb": rss[0], "samples": {"seconds": seconds, "peak_rss_mb": rss}}
+
+        path = os.path.join(self.tmp, "results.json")
+        store = ResultStore(path)
+        store.add_run([result("duplicate_code", [1.0, 1.02, 0.98, 1.01, 0.99], [50] * 5),
+                       result("long_lambda", [0.5, 0.52, 0.48, 0.5, 0.51], [30] * 5)], "baseline")
+        store.add_run([result("duplicate_code", [1.3, 1.32, 1.29, 1.31, 1.35], [50, 51, 50, 50, 50]),
+                       result("long_lambda", [0.49, 0.53, 0.5, 0.47, 0.52], [30] * 5),
+                       result("magic_number", [0.1], [30])])
+        store.save()
+
+        baseline, candidate = select_runs(ResultStore(path), None, None)
+        self.assertEqual((baseline["label"], candidate["id"]), ("baseline", 2))
+        self.assertEqual(candidate["machine"], baseline["machine"])
+        status = {(row["benchmark"], row["metric"]): row["status"] for row in compare_runs(baseline, candidate)}
+        self.assertEqual(status, {("duplicate_code", "seconds"): "regression",
+                                  ("duplicate_code", "peak_rss_mb"): "unchanged",
+                                  ("long_lambda", "seconds"): "unchanged",
+                                  ("long_lambda", "peak_rss_mb"): "unchanged",
+                                  ("magic_number", "seconds"): "new",
+                                  ("magic_number", "peak_rss_mb"): "new"})
+        self.assertEqual(compare_runs(candidate, baseline)[0]["status"], "improvement")
+        self.assertAlmostEqual(rank_sum_pvalue([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]), 1 / 252)
+        self.assertEqual(rank_sum_pvalue([1.0], [2.0]), 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+工具对比框架的单元测试
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from tools.compare_tools import OURS, TOOLS, Tool, agreement, run_tool, tool_codes
+
+SCRIPT = r'''
+import sys
+corpus = sys.argv[1]
+print("************* Module demo")
+print(corpus + "/demo.py:3: [R2004(magic-value-comparison), f] Consider using a named constant")
+print(corpus + "/demo.py:8:0: C901 'g' is too complex (12)")
+print("lib/other.py:5:1: E722 do not use bare 'except'")
+print(corpus + "/demo.py:9:1: W0107 unnecessary pass")
+'''
+
+
+class TestCompareTools(unittest.TestCase):
+    """工具对比测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmp, "lib"))
+        open(os.path.join(self.tmp, "lib", "other.py"), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_run_tool_streams_and_measures(self):
+        """测试逐行读取参考工具的输出，按类别记录相对路径与行号，并测量耗时与内存"""
+        tool = Tool("fake", lambda corpus, jobs, full, workdir: [sys.executable, "-c", SCRIPT, corpus],
+                    lambda: True)
+        codes = {"fake": {"R2004": "magic_number", "C901": "cyclomatic_complexity", "E722": "useless_exception"}}
+        with mock.patch("tools.compare_tools.tool_codes", lambda name: codes.get(name, {})):
+            run = run_tool(tool, self.tmp, keep=lambda path: not path.startswith("lib/"))
+        self.assertEqual(run["findings"], 4)
+        self.assertEqual(run["categories"], {"magic_number": {("demo.py", 3)},
+                                             "cyclomatic_complexity": {("demo.py", 8)}})
+        self.assertEqual(run["exit_code"], 0)
+        self.assertGreater(run["wall"], 0)
+        self.assertGreater(run["peak_rss_mb"], 1)
+
+        self.assertEqual(TOOLS[OURS].parse('{"smell": "magic_number", "filename": "a/b.py", "lineno": 4}'),
+                         ("magic_number", "a/b.py", 4))
+        self.assertIsNone(TOOLS[OURS].parse('{"project": "demo", "totals": {}}'))
+        self.assertEqual(tool_codes("flake8")["C901"], "cyclomatic_complexity")
+
+    def test_agreement(self):
+        """测试按类别计算两工具共同发现、各自独有的结果及行级、文件级一致率"""
+        ours = {"tool": OURS, "categories": {"magic_number": {("a.py", 3), ("a.py", 5), ("b.py", 1)}}}
+        pylint = {"tool": "pylint", "categories": {"magic_number": {("a.py", 3), ("a.py", 9)}}}
+        rows = {row["category"]: row for row in agreement([ours, pylint])}
+        self.assertNotIn("commented_code", rows)
+        self.assertIn("long_method", rows)
+        row = rows["magic_number"]
+        self.assertEqual((row["counts"], row["both"], row["only"]), ([3, 2], 1, [2, 1]))
+        self.assertEqual(row["line_agreement"], 0.25)
+        self.assertEqual(row["file_agreement"], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
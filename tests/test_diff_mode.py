@@ -0,0 +1,106 @@
+"""
+Git 差异分析模式的单元测试
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from src.config_loader import reset_config
+from src.diff_mode import analyze_diff, analyze_staged
+from src.function_index import FunctionIndex
+from src.git_sources import BlobReader, changed_lines
+
+BRANCHY = "def {}(x):\n    if x:\n        return 1\n    return 2\n"
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class TestDiffMode(unittest.TestCase):
+    """差异分析测试"""
+
+    def setUp(self):
+        reset_config()
+        self.repo = tempfile.mkdtemp()
+        self.git("init", "-q")
+        self.git("config", "user.email", "test@example.com")
+        self.git("config", "user.name", "test")
+        self.write("a.py", BRANCHY.format("first") + "\n\nLIMITS = [4242, 4242, 4242]\n")
+        self.write("b.py", "def clean():\n    return 1\n")
+        self.write("c.py", BRANCHY.format("third"))
+        self.commit("base")
+        self.index_path = os.path.join(self.repo, ".cache", "function_index.json")
+
+    def tearDown(self):
+        reset_config()
+        shutil.rmtree(self.repo)
+
+    def git(self, *args):
+        return subprocess.run(["git", *args], cwd=self.repo, check=True, stdout=subprocess.PIPE).stdout
+
+    def write(self, name, source):
+        with open(os.path.join(self.repo, name), "w", encoding="utf8") as f:
+            f.write(source)
+
+    def commit(self, message):
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", message)
+
+    def test_only_changed_lines_are_reported(self):
+        """测试只报告变更行上的问题"""
+        self.write("b.py", "def clean():\n    return 1\n\n\n" + BRANCHY.format("second"))
+        self.commit("change")
+        results = analyze_diff("HEAD~1..HEAD", self.repo, index_path=self.index_path)
+        self.assertEqual(results.files, 1)
+        self.assertTrue(all(f["filename"] == "b.py" for f in results.findings))
+        # the new function duplicates functions of unchanged files, found through the index
+        related = sorted(f["related"]["filename"] for f in results.findings if f["smell"] == "duplicate_code")
+        self.assertEqual(related, ["a.py", "c.py"])
+        self.assertNotIn("magic_number", results.totals)
+        self.assertEqual(len(FunctionIndex(self.index_path)), 2)
+
+    def test_unchanged_smells_are_not_reported(self):
+        """测试文件中未修改部分的问题不被报告"""
+        self.write("a.py", "import os\n" + BRANCHY.format("first") + "\n\nLIMITS = [4242, 4242, 4242]\n")
+        self.commit("import")
+        results = analyze_diff("HEAD~1..HEAD", self.repo, index_path=self.index_path)
+        self.assertEqual(results.findings, [])
+
+    def test_staged_blobs_are_analyzed(self):
+        """测试只分析暂存区内容，忽略工作区未暂存的修改"""
+        self.write("b.py", "def clean():\n    return 1\n\n\n" + BRANCHY.format("second"))
+        self.git("add", "b.py")
+        self.write("b.py", "def clean():\n    return 1\n\n\n" + BRANCHY.format("second") + "\nX = [7777, 7777, 7777]\n")
+        results = analyze_staged(self.repo, index_path=self.index_path)
+        self.assertEqual({f["smell"] for f in results.findings}, {"duplicate_code"})
+        self.assertEqual(results.findings[0]["name"], "second")
+
+    def test_staged_without_commits(self):
+        """测试仓库尚无提交时分析暂存区"""
+        shutil.rmtree(os.path.join(self.repo, ".git"))
+        self.git("init", "-q")
+        self.git("add", "a.py")
+        results = analyze_staged(self.repo, index_path=self.index_path)
+        self.assertEqual(results.files, 1)
+        self.assertIn("magic_number", results.totals)
+
+    def test_changed_lines(self):
+        """测试解析变更行范围"""
+        self.write("a.py", "# header\n" + BRANCHY.format("first"))
+        self.commit("edit")
+        base, head = [rev.strip() for rev in self.git("rev-parse", "HEAD~1", "HEAD").decode().split()]
+        ranges = changed_lines(self.repo, base, head, ["a.py"])
+        self.assertEqual(ranges["a.py"][0], (1, 1))
+
+    def test_blob_reader(self):
+        """测试批量读取 git 对象"""
+        blob = self.git("rev-parse", "HEAD:b.py").decode().strip()
+        with BlobReader(self.repo) as reader:
+            blobs = list(reader.iter_blobs([blob, "0" * 40, blob]))
+        self.assertEqual(blobs[0][1], b"def clean():\n    return 1\n")
+        self.assertIsNone(blobs[1][1])
+        self.assertEqual(blobs[2], blobs[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
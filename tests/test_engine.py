@@ -0,0 +1,246 @@
+"""
+分析引擎与常驻分析服务的单元测试
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from src.config_loader import reset_config
+from src.daemon import AnalysisServer
+from src.engine import DEADLINE_PYLINT_CHUNK, DEADLINE_STAGES, FILE_DETECTORS, AnalysisEngine, pylint_chunk_size
+from src.Detector.duplicate_code_detector import find_duplicates
+from src.sources import ParsedFile, iter_python_files, load_sources
+from tools import smell_client
+
+SMELLY_SOURCE = '''
+class Account:
+    def __init__(self):
+        self.balance = 0
+
+    def transfer(self, a, b, c, d, e, f, g):
+        return 4242 + 4242 + 4242
+
+
+def load():
+    try:
+        return open("x")
+    except:
+        pass
+
+
+def first(x):
+    if x:
+        return 1
+    return 2
+
+
+def second(y):
+    if y:
+        return 1
+    return 2
+'''
+
+
+class TestAnalysisEngine(unittest.TestCase):
+    """分析引擎测试"""
+
+    def setUp(self):
+        reset_config()
+        self.engine = AnalysisEngine()
+
+    def tearDown(self):
+        reset_config()
+
+    def test_in_memory_sources(self):
+        """测试内存中的源码可直接分析"""
+        results = self.engine.analyze([ParsedFile("pkg/account.py", SMELLY_SOURCE)])
+        smells = {f["smell"] for f in results.findings}
+        self.assertTrue({"useless_exception", "magic_number", "long_parameter", "duplicate_code"} <= smells)
+        self.assertTrue(all(f["filename"] == "pkg/account.py" for f in results.findings))
+        self.assertEqual(results.summary()["stats"]["classes"], 1)
+
+    def test_unchanged_files_come_from_cache(self):
+        """测试未修改的文件直接使用缓存结果，修改后重新分析"""
+        first = self.engine.analyze([ParsedFile("a.py", SMELLY_SOURCE)])
+        second = self.engine.analyze([ParsedFile("a.py", SMELLY_SOURCE)])
+        self.assertEqual(second.cached_files, 1)
+        self.assertEqual(second.findings, first.findings)
+
+        changed = self.engine.analyze([ParsedFile("a.py", "def clean():\n    return 1\n")])
+        self.assertEqual(changed.cached_files, 0)
+        self.assertEqual(changed.findings, [])
+
+    def test_syntax_error_is_reported(self):
+        """测试无法解析的文件记录为错误而不中断分析"""
+        results = self.engine.analyze([ParsedFile("bad.py", "def broken(:\n"), ParsedFile("a.py", SMELLY_SOURCE)])
+        self.assertEqual(results.errors[0][0], "bad.py")
+        self.assertTrue(results.findings)
+
+    def test_deadline_not_reached(self):
+        """测试期限内完成时结果与普通分析一致且不标记为部分结果"""
+        sources = [ParsedFile("a.py", SMELLY_SOURCE), ParsedFile("b.py", "def clean():\n    return 1\n")]
+        expected = AnalysisEngine().analyze(sources)
+        results = self.engine.analyze(sources, deadline=600)
+        key = lambda finding: (finding["smell"], finding["filename"], finding["lineno"])
+        self.assertEqual(sorted(results.findings, key=key), sorted(expected.findings, key=key))
+        self.assertFalse(results.partial)
+        self.assertEqual(results.incomplete, {})
+        self.assertEqual(list(results.stages), list(DEADLINE_STAGES))
+        self.assertTrue(all(stage["files"] == 2 for stage in results.stages.values()))
+        self.assertEqual(self.engine.analyze(sources, deadline=600).cached_files, 2)
+        self.assertNotIn("partial", expected.summary())
+
+    def test_deadline_stops_between_stages(self):
+        """测试到达期限后停止，记录已完成的阶段与文件，且不缓存不完整的结果"""
+        clock = [0.0]
+
+        def duplicates_then_deadline(functions, threshold):
+            yield from find_duplicates(functions, threshold)
+            clock[0] = 100.0
+
+        with mock.patch("src.engine.time.perf_counter", lambda: clock[0]), \
+                mock.patch("src.engine.find_duplicates", duplicates_then_deadline):
+            results = self.engine.analyze([ParsedFile("a.py", SMELLY_SOURCE)], deadline=30)
+        self.assertTrue(results.partial)
+        self.assertEqual({name: stage["complete"] for name, stage in results.stages.items()},
+                         {"detectors": True, "duplicate_code": True, "expensive_detectors": False, "pylint": False})
+        self.assertEqual(results.incomplete, {"a.py": ["expensive_detectors", "pylint"]})
+        smells = {f["smell"] for f in results.findings}
+        self.assertTrue({"useless_exception", "duplicate_code"} <= smells)
+        self.assertNotIn("long_parameter", smells)
+        self.assertEqual(len(self.engine.cache), 0)
+        self.assertTrue(results.summary()["partial"])
+
+    def test_deadline_detector_error(self):
+        """测试期限模式下某个检测器出错时，文件的其余阶段照常运行"""
+        def boom(parsed, sink, thresholds):
+            raise RuntimeError("boom")
+
+        with mock.patch.dict(FILE_DETECTORS, {"magic_number": boom}):
+            results = self.engine.analyze([ParsedFile("a.py", SMELLY_SOURCE)], deadline=600)
+        self.assertIn(("a.py", "magic_number: boom"), results.errors)
+        self.assertFalse(results.partial)
+        self.assertEqual(results.incomplete, {})
+        self.assertIn("long_parameter", {f["smell"] for f in results.findings})
+        # the result kept in the cache is complete
+        cached = self.engine.analyze([ParsedFile("a.py", SMELLY_SOURCE)])
+        self.assertEqual(cached.cached_files, 1)
+        key = lambda finding: (finding["smell"], finding["lineno"])
+        self.assertEqual(sorted(cached.findings, key=key), sorted(results.findings, key=key))
+
+    def test_detector_error_keeps_pylint(self):
+        """测试单个检测器出错的文件仍交给 pylint，只有无法解析的文件被排除"""
+        checked = []
+
+        def boom(parsed, sink, thresholds):
+            raise RuntimeError("boom")
+
+        def fake_pylint(pending):
+            checked.extend(parsed.filename for parsed, _ in pending)
+            return {}, None
+
+        with mock.patch.dict(FILE_DETECTORS, {"magic_number": boom}), \
+                mock.patch.object(self.engine, "run_pylint", fake_pylint):
+            results = self.engine.analyze([ParsedFile("a.py", SMELLY_SOURCE), ParsedFile("b.py", "def (:\n")])
+        self.assertIn(("a.py", "magic_number: boom"), results.errors)
+        self.assertEqual(checked, ["a.py"])
+
+    def test_deadline_pylint_error(self):
+        """测试期限模式下 pylint 运行失败的文件不计入完成的 pylint 阶段"""
+        def flaky_pylint(pending):
+            if any(parsed.filename == "m0.py" for parsed, _ in pending):
+                return {}, "pylint crashed"
+            return {}, None
+
+        sources = [ParsedFile(f"m{i}.py", "def f{}(x):\n    return x\n".format(i)) for i in range(3)]
+        with mock.patch.object(self.engine, "run_pylint", flaky_pylint):
+            results = self.engine.analyze(sources, deadline=600)
+        self.assertIn(("pylint", "pylint crashed"), results.errors)
+        self.assertEqual(results.stages["pylint"], {"files": 2, "complete": False})
+        self.assertEqual(results.incomplete, {"m0.py": ["pylint"]})
+        self.assertTrue(results.partial)
+
+    def test_deadline_pylint_chunks_fit_time_left(self):
+        """测试在非主线程中（无法中断 pylint）按剩余时间确定 pylint 每次检查的文件数"""
+        clock, chunks = [0.0], []
+
+        def slow_pylint(pending):
+            chunks.append(len(pending))
+            clock[0] += len(pending)
+            return {}, None
+
+        sources = [ParsedFile(f"m{i}.py", "def f{}(x):\n    return x\n".format(i)) for i in range(20)]
+        outcome = {}
+        with mock.patch("src.engine.time.perf_counter", lambda: clock[0]), \
+                mock.patch.object(self.engine, "run_pylint", slow_pylint):
+            thread = threading.Thread(target=lambda: outcome.update(results=self.engine.analyze(sources, deadline=5.5)))
+            thread.start()
+            thread.join()
+        results = outcome["results"]
+        self.assertEqual(chunks, [1, 4])
+        self.assertLessEqual(clock[0], 5.5)
+        self.assertEqual(results.stages["pylint"], {"files": 5, "complete": False})
+        self.assertEqual(len(results.incomplete), 15)
+        self.assertEqual(pylint_chunk_size(120, 0.5), DEADLINE_PYLINT_CHUNK)
+
+    def test_deadline_before_first_file(self):
+        """测试期限为 0 时所有文件都记为未完成"""
+        results = self.engine.analyze([ParsedFile("a.py", SMELLY_SOURCE)], deadline=0)
+        self.assertEqual(results.findings, [])
+        self.assertEqual(results.incomplete, {"a.py": ["detectors", "expensive_detectors", "pylint"]})
+        self.assertEqual(results.stages["detectors"], {"files": 0, "complete": False})
+
+
+class TestAnalysisDaemon(unittest.TestCase):
+    """常驻分析服务测试"""
+
+    def setUp(self):
+        reset_config()
+        self.project = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.project, "pkg"))
+        with open(os.path.join(self.project, "pkg", "account.py"), "w", encoding="utf8") as f:
+            f.write(SMELLY_SOURCE)
+        self.server = AnalysisServer(("127.0.0.1", 0))
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.project)
+        reset_config()
+
+    def test_findings_are_streamed(self):
+        """测试客户端逐条收到检测结果与汇总"""
+        cwd = os.getcwd()
+        os.chdir(self.project)
+        try:
+            replies = list(smell_client.analyze(["pkg"], port=self.port, timeout=60))
+        finally:
+            os.chdir(cwd)
+        findings = [reply["finding"] for reply in replies if "finding" in reply]
+        self.assertTrue(replies[-1]["done"])
+        self.assertEqual(replies[-1]["totals"]["magic_number"], 1)
+        self.assertEqual(len(findings), sum(replies[-1]["totals"].values()))
+        self.assertTrue(all(f["filename"] == "pkg/account.py" for f in findings))
+
+    def test_matches_direct_analysis(self):
+        """测试服务端结果与直接调用引擎一致"""
+        expected = AnalysisEngine().analyze(load_sources(iter_python_files([self.project]), root=self.project))
+        replies = smell_client.request({"cmd": "analyze", "paths": ["."], "root": self.project}, port=self.port)
+        findings = [reply["finding"] for reply in replies if "finding" in reply]
+        self.assertEqual(findings, expected.findings)
+
+    def test_missing_path_is_an_error(self):
+        """测试不存在的路径返回错误"""
+        with self.assertRaises(smell_client.DaemonError):
+            list(smell_client.request({"cmd": "analyze", "paths": ["missing.py"], "root": self.project},
+                                      port=self.port))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+检测结果索引与分页的单元测试
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from tools.findings_index import FindingsIndex
+from tools.report_writers import open_report_writers
+
+
+class TestFindingsIndex(unittest.TestCase):
+    """预排序索引分页测试"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        sink = open_report_writers("demo", self.output_dir, ["ndjson"])
+        for i in range(25):
+            sink.add("magic_number", f"m{i % 5}.py", i + 1, i, f"magic {i}")
+        for i in range(10):
+            sink.add("long_lambda", f"l{i}.py", 3, 100 + i, f"lambda {i}")
+        sink.close({"project": "demo"})
+        self.index = FindingsIndex.open(sink.paths[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_counts(self):
+        """测试总数与各类别数量"""
+        self.assertEqual(self.index.count, 35)
+        self.assertEqual(self.index.smell_counts(), {"magic_number": 25, "long_lambda": 10})
+        self.assertEqual(self.index.summary, {"project": "demo"})
+
+    def test_pages_cover_all_findings(self):
+        """测试分页覆盖全部结果且不重复"""
+        seen = []
+        for page in range(1, 5):
+            seen.extend((f["filename"], f["lineno"]) for f in self.index.page(page, per_page=10)["findings"])
+        self.assertEqual(len(seen), 35)
+        self.assertEqual(len(set(seen)), 35)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_sort_by_metric_with_smell_filter(self):
+        """测试按类别过滤并按指标排序"""
+        page = self.index.page(1, per_page=3, sort="metric", smell="magic_number")
+        self.assertEqual(page["total"], 25)
+        self.assertEqual([f["metric"] for f in page["findings"]], [0, 1, 2])
+        page = self.index.page(1, per_page=3, sort="metric", order="desc", smell="magic_number")
+        self.assertEqual([f["metric"] for f in page["findings"]], [24, 23, 22])
+
+    def test_text_filter(self):
+        """测试文本过滤"""
+        page = self.index.page(1, per_page=50, q="l3.py")
+        self.assertEqual(page["total"], 1)
+        self.assertEqual(page["findings"][0]["message"], "lambda 3")
+
+    def test_stale_index_is_rebuilt(self):
+        """测试结果文件变化后索引自动重建"""
+        sink = open_report_writers("demo", self.output_dir, ["ndjson"])
+        sink.add("long_lambda", "x.py", 1, 1, "only")
+        sink.close()
+        index = FindingsIndex.open(os.path.join(self.output_dir, "demo_findings.ndjson"))
+        self.assertEqual(index.count, 1)
+
+    def test_rewritten_file_of_same_size_is_reindexed(self):
+        """测试结果文件被改写为相同大小的内容后索引仍会重建"""
+        path = os.path.join(self.output_dir, "demo_findings.ndjson")
+        for metrics, mtime in (((1, 2), 1), ((2, 1), 2)):
+            sink = open_report_writers("demo", self.output_dir, ["ndjson"])
+            for filename, metric in zip(("a.py", "b.py"), metrics):
+                sink.add("long_lambda", filename, 1, metric, "lambda")
+            sink.close()
+            os.utime(path, ns=(mtime * 10 ** 9, mtime * 10 ** 9))
+            page = FindingsIndex.open(path).page(1, sort="metric")
+        self.assertEqual([f["filename"] for f in page["findings"]], ["b.py", "a.py"])
+
+    def test_report_quotes_project_name(self):
+        """测试报告中的结果接口地址对项目名做 URL 编码"""
+        from tools.report_html import _findings_html
+        html = _findings_html("my proj#1?%", self.index)
+        self.assertIn('"/api/findings/my%20proj%231%3F%25"', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
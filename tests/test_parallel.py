@@ -0,0 +1,99 @@
+"""
+并行调度（按代价从大到小、自适应分块）的单元测试
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from src import parallel
+from src.config_loader import reset_config
+from src.engine import AnalysisEngine
+from src.parallel import SKIPPED, TimingStore, analyze_chunk, assemble_results, estimate_costs, schedule_chunks
+
+
+class TestScheduling(unittest.TestCase):
+    """调度测试"""
+
+    def setUp(self):
+        reset_config()
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        reset_config()
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, size):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w", encoding="utf8") as f:
+            f.write("x = 1\n" * (size // 6))
+        return path
+
+    def test_largest_first_and_small_files_batched(self):
+        """测试大文件单独成块并最先派发，小文件合并成块"""
+        tasks = [(0, "small{}.py".format(i), "small{}.py".format(i)) for i in range(40)]
+        tasks.insert(17, (0, "huge.py", "huge.py"))
+        costs = [1.0] * 17 + [100.0] + [1.0] * 23
+        chunks = schedule_chunks(tasks, jobs=2, costs=costs, max_files=16)
+        self.assertEqual(chunks[0], [(0, "huge.py", "huge.py")])
+        self.assertEqual(sorted(task for chunk in chunks for task in chunk), sorted(tasks))
+        self.assertTrue(all(len(chunk) <= 16 for chunk in chunks))
+        self.assertGreater(len(chunks[-1]), 1)
+        self.assertEqual(schedule_chunks([], jobs=2), [])
+
+    def test_prior_timings_override_sizes(self):
+        """测试已有的历史耗时优先于文件大小"""
+        big, small = self.write("big.py", 60000), self.write("small.py", 600)
+        tasks = [(0, big, "big.py"), (0, small, "small.py")]
+        self.assertGreater(*estimate_costs(tasks))
+
+        store_path = os.path.join(self.tmp, "cache", "timings.json")
+        timings = TimingStore(store_path)
+        timings.record(big, os.path.getsize(big), 0.01)
+        timings.record(small, os.path.getsize(small), 5.0)
+        timings.save()
+        timings = TimingStore(store_path)
+        self.assertEqual(len(timings), 2)
+        big_cost, small_cost = estimate_costs(tasks, timings)
+        self.assertGreater(small_cost, big_cost)
+        self.assertEqual(schedule_chunks(tasks, jobs=2, costs=[big_cost, small_cost])[0], [tasks[1]])
+
+    def test_chunk_reports_file_timings(self):
+        """测试工作进程返回每个文件的耗时"""
+        path = self.write("mod.py", 600)
+        outcomes, errors = analyze_chunk([("p", path, "mod.py"), ("p", path + ".missing", "gone.py")])
+        self.assertEqual(errors, [])
+        (_, name, file_result, error, seconds), missing = outcomes
+        self.assertEqual((name, error), ("mod.py", None))
+        self.assertGreater(seconds, 0)
+        self.assertIsNone(missing[2])
+
+    def test_slow_file_skipped(self):
+        """测试超出时间预算的文件被跳过并在结果中单独列出，其余文件照常分析"""
+        slow, fast = self.write("slow.py", 600), self.write("fast.py", 600)
+        engine = AnalysisEngine(cache_size=0)
+        file_result = engine.file_result
+
+        def slow_file_result(parsed, plan):
+            if parsed.filename == "slow.py":
+                time.sleep(5)
+            return file_result(parsed, plan)
+
+        with mock.patch.object(parallel, "_worker_engine", engine), mock.patch.object(parallel, "_file_timeout", 0.2), \
+                mock.patch.object(engine, "file_result", slow_file_result):
+            outcomes, _ = analyze_chunk([("p", slow, "slow.py"), ("p", fast, "fast.py")])
+        (_, _, slow_result, slow_error, seconds), (_, _, fast_result, fast_error, _) = outcomes
+        self.assertIsNone(slow_result)
+        self.assertTrue(slow_error.startswith(SKIPPED))
+        self.assertLess(seconds, 5)
+        self.assertIsNotNone(fast_result)
+
+        results = assemble_results({"fast.py": fast_result}, False, 0, [("slow.py", slow_error)])
+        self.assertEqual(results.errors, [])
+        self.assertEqual(results.summary()["skipped"], [["slow.py", slow_error]])
+
+
+if __name__ == '__main__':
+    unittest.main()
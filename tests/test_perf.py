@@ -0,0 +1,135 @@
+"""
+性能计时（阶段、检测器、文件耗时）的单元测试
+"""
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from src import perf
+from src.api import analyze, write_reports
+from src.config_loader import get_config, reset_config
+from src.parallel import WorkerPool
+from tools.report_html import _performance_html
+
+SOURCE = '''
+def area(width, height):
+    return [w * h for w in width for h in height]
+
+
+handler = lambda event: event
+'''
+
+
+class TestPerf(unittest.TestCase):
+    """计时测试"""
+
+    def setUp(self):
+        reset_config()
+        self.tmp = tempfile.mkdtemp()
+        get_config().config["output"]["directory"] = self.tmp
+
+    def tearDown(self):
+        perf.stop()
+        reset_config()
+        shutil.rmtree(self.tmp)
+
+    def test_disabled_records_nothing(self):
+        """测试未开启计时时不记录任何数据"""
+        self.assertIsNone(perf.active())
+        self.assertIs(perf.stage("pylint"), perf.measure("magic_number", "a.py"))
+        self.assertEqual(list(perf.timed_files(["a.py", "b.txt"])), ["a.py", "b.txt"])
+
+    def test_engine_run_timings_and_sidecar(self):
+        """测试记录各检测器及各文件的耗时，写出 JSON 附属文件并在 HTML 报告中显示"""
+        recorder = perf.start(top_files=1)
+        with perf.stage("discovery"):
+            for _ in perf.timed_files(["legacy.py", "notes.txt"]):
+                pass
+        analyze([("geometry.py", SOURCE), ("empty.py", "X = 'x'\n")])
+        self.assertIs(perf.stop(), recorder)
+
+        summary = recorder.summary()
+        self.assertEqual([row["stage"] for row in summary["stages"]][0], "discovery")
+        detectors = {row["detector"] for row in summary["detectors"]}
+        self.assertTrue({"parse", "long_lambda", "long_list_comp"} <= detectors)
+        # empty.py 被词法预过滤跳过，没有耗时记录
+        self.assertEqual(summary["files"], 2)
+        self.assertEqual(len(summary["slowest_files"]), 1)
+        self.assertEqual(summary["slowest_files"][0]["file"], "geometry.py")
+
+        path = perf.write_sidecar("demo", recorder)
+        self.assertEqual(path, os.path.join(self.tmp, "demo_performance.json"))
+        self.assertEqual(perf.read_sidecar("demo")["project"], "demo")
+        html = _performance_html("demo")
+        self.assertIn("Performance", html)
+        self.assertIn("geometry.py", html)
+        self.assertEqual(_performance_html("other"), "")
+
+    def test_run_without_timings_drops_sidecar(self):
+        """测试未开启计时的运行删除上一次运行的附属文件，报告中不再显示旧的耗时"""
+        perf.start()
+        analyze([("geometry.py", SOURCE)])
+        perf.write_sidecar("demo", perf.stop())
+        self.assertNotEqual(_performance_html("demo"), "")
+
+        write_reports(analyze([("geometry.py", SOURCE)]), "demo")
+        self.assertFalse(os.path.exists(perf.sidecar_path("demo")))
+        self.assertEqual(_performance_html("demo"), "")
+        perf.remove_sidecar("demo")
+
+    def test_archive_and_deadline_runs_keep_sidecar(self):
+        """测试压缩包与 --deadline 运行开启计时后保留自己的附属文件"""
+        from CodeSmellTool import run_archive
+        from tests.test_archive_sources import make_zip
+        project = os.path.join(self.tmp, "proj")
+        os.makedirs(project)
+        with open(os.path.join(project, "geometry.py"), "w", encoding="utf8") as f:
+            f.write(SOURCE)
+        archive = os.path.join(self.tmp, "demo.zip")
+        with open(archive, "wb") as f:
+            f.write(make_zip().getvalue())
+        get_config().config["ignore"]["detectors"] = ["pylint"]
+
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(run_archive(project, timings=True, deadline=60), 0)
+            self.assertEqual(run_archive(archive, timings=True), 0)
+        for name in ("proj", "demo"):
+            self.assertEqual(perf.read_sidecar(name)["project"], name)
+            self.assertIn("Performance", _performance_html(name))
+
+    def test_trace_merges_worker_spans(self):
+        """测试 Chrome trace 包含主进程和各工作进程的阶段与检测器区间"""
+        paths = []
+        for i in range(4):
+            path = os.path.join(self.tmp, "mod{}.py".format(i))
+            with open(path, "w", encoding="utf8") as f:
+                f.write(SOURCE)
+            paths.append(path)
+        get_config().config["ignore"]["detectors"] = ["pylint"]
+        recorder = perf.start(trace=True)
+        with perf.recording() as inner:
+            self.assertIs(inner, recorder)
+        with perf.stage("discovery"), WorkerPool(2) as pool:
+            list(pool.run([[(0, path, os.path.basename(path))] for path in paths]))
+        perf.stop()
+
+        trace_path = perf.write_trace(os.path.join(self.tmp, "trace.json"), recorder.events)
+        with open(trace_path, encoding="utf8") as f:
+            events = json.load(f)["traceEvents"]
+        spans = [event for event in events if event["ph"] == "X"]
+        worker_pids = {event["pid"] for event in spans if event["name"] == "chunk"}
+        self.assertTrue(worker_pids)
+        self.assertNotIn(os.getpid(), worker_pids)
+        self.assertIn("discovery", {event["name"] for event in spans if event["pid"] == os.getpid()})
+        self.assertEqual({event["args"]["file"] for event in spans if event["name"] == "long_lambda"},
+                         {"mod{}.py".format(i) for i in range(4)})
+        names = {event["pid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+        self.assertEqual(names[os.getpid()], "CodeSmellTool")
+
+
+if __name__ == '__main__':
+    unittest.main()
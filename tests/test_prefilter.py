@@ -0,0 +1,54 @@
+"""
+词法预过滤的单元测试
+"""
+import unittest
+from unittest import mock
+
+from src.config_loader import reset_config
+from src.engine import AnalysisEngine
+from src.prefilter import COMMENT, NUMBER, may_match, needs_tree, scan
+from src.sources import ParsedFile
+
+
+class TestPrefilter(unittest.TestCase):
+    """预过滤测试"""
+
+    def setUp(self):
+        reset_config()
+
+    def tearDown(self):
+        reset_config()
+
+    def test_scan_tokens(self):
+        """测试只识别完整的关键字，数字和注释记为伪词"""
+        tokens = scan("classic = [0for x in y]  # note\nf = lambda: 1\n")
+        self.assertEqual(tokens, {"for", "lambda", COMMENT, NUMBER})
+        self.assertFalse(may_match("useless_exception", tokens))
+        self.assertFalse(may_match("class_cohesion", tokens))
+        self.assertTrue(may_match("long_lambda", tokens))
+        self.assertTrue(may_match("not_a_known_detector", frozenset()))
+        self.assertFalse(needs_tree(["commented_code"], scan("VALUE = 'x'  # plain\n")))
+        self.assertTrue(needs_tree(["magic_number"], scan("VALUE = 'x'\n")))
+
+    def test_engine_skips_parse_and_detectors(self):
+        """测试引擎跳过不可能命中的检测器，无需语法树时不解析文件，且词法结果按内容缓存"""
+        engine = AnalysisEngine()
+        plan = engine.prepare()
+        flat = ParsedFile("settings.py", "NAME = 'demo'\nDEBUG = True\n")
+        with mock.patch.object(ParsedFile, "tree", new_callable=mock.PropertyMock) as tree:
+            file_result, _ = engine.file_result(flat, plan)
+            tree.assert_not_called()
+        self.assertEqual((file_result.findings, file_result.stats, file_result.errors), ([], {}, []))
+        self.assertEqual(len(engine.tokens), 1)
+
+        calls = []
+        detectors = [(name, lambda parsed, sink, t, name=name: calls.append(name)) for name, _ in plan.detectors]
+        engine.file_result(ParsedFile("mod.py", "def f():\n    return [x for x in range(3)]\n"),
+                           plan._replace(detectors=detectors))
+        self.assertIn("long_list_comp", calls)
+        self.assertNotIn("long_lambda", calls)
+        self.assertNotIn("useless_exception", calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
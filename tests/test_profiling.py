@@ -0,0 +1,77 @@
+"""
+CPU 与内存分析模式的单元测试
+"""
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from src import perf, profiling
+from src.config_loader import get_config, reset_config
+from src.parallel import WorkerPool
+
+
+def allocate_rows(count):
+    return [[i] * 16 for i in range(count)]
+
+
+class TestProfiling(unittest.TestCase):
+    """分析模式测试"""
+
+    def setUp(self):
+        reset_config()
+        self.tmp = tempfile.mkdtemp()
+        get_config().config["output"]["directory"] = self.tmp
+
+    def tearDown(self):
+        profiling.stop_cpu()
+        perf.stop()
+        reset_config()
+        shutil.rmtree(self.tmp)
+
+    def test_memory_peak_and_sites_per_stage(self):
+        """测试按阶段记录内存峰值，并找出峰值时占用最多的分配位置（即使阶段结束前已释放）"""
+        tracker = profiling.start_memory()
+        try:
+            with perf.stage("small"):
+                allocate_rows(10)
+            with perf.stage("duplicate_code", detector=True):
+                kept = []
+                for _ in perf.timed_files(["a.py", "b.py", "c.py"]):
+                    kept.append(allocate_rows(5000))
+                del kept
+        finally:
+            tracker.stop()
+        stages = {stage["stage"]: stage for stage in tracker.stages}
+        big = stages["duplicate_code"]
+        self.assertTrue(big["detector"])
+        self.assertGreater(big["peak"], stages["small"]["peak"])
+        self.assertGreater(big["peak"] - big["start"], 1024 * 1024)
+        self.assertIn("test_profiling.py", big["sites"][0]["site"])
+
+        paths = tracker.write_report()
+        self.assertEqual(paths, [os.path.join(self.tmp, "profile", "memory.json"),
+                                 os.path.join(self.tmp, "profile", "memory_top.txt")])
+
+    def test_cpu_profile_merges_workers(self):
+        """测试 CPU 分析合并主进程与各工作进程的统计"""
+        path = os.path.join(self.tmp, "mod.py")
+        with open(path, "w", encoding="utf8") as f:
+            f.write("def f(x):\n    return [y for y in x]\n")
+        get_config().config["ignore"]["detectors"] = ["pylint"]
+        profiler = profiling.start_cpu()
+        self.assertIsNotNone(profiling.worker_prefix())
+        with WorkerPool(2) as pool:
+            list(pool.run([[(0, path, "mod.py")], [(0, path, "mod2.py")]]))
+        self.assertIs(profiling.stop_cpu(), profiler)
+
+        stats_path, top_path = profiling.write_cpu_report(profiler)
+        functions = {name for _, _, name in pstats.Stats(stats_path).stats}
+        self.assertIn("_analyze_chunk", functions)
+        with open(top_path, encoding="utf8") as f:
+            self.assertNotEqual(f.readline(), "1 process(es) profiled\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
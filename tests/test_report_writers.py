@@ -0,0 +1,102 @@
+"""
+流式报告输出的单元测试
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tools.report_writers import open_report_writers
+
+
+class TestReportWriters(unittest.TestCase):
+    """JSON / NDJSON / SARIF 输出测试"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def _write_findings(self, formats):
+        sink = open_report_writers("demo", self.output_dir, formats)
+        sink.add("magic_number", "a.py", 3, 4, "Magic number 42 appears 4 times", number=42)
+        sink.add("duplicate_code", "a.py", 10, 90.0, "dup",
+                 related={"filename": "b.py", "lineno": 20, "name": "g"})
+        sink.close({"project": "demo", "totals": {"magic_number": 1, "duplicate_code": 1}})
+        return sink
+
+    def test_json(self):
+        """测试JSON文档结构"""
+        sink = self._write_findings(["json"])
+        with open(sink.paths[0], encoding="utf8") as f:
+            data = json.load(f)
+        self.assertEqual(data["project"], "demo")
+        self.assertEqual(len(data["findings"]), 2)
+        self.assertEqual(data["findings"][0]["number"], 42)
+        self.assertEqual(data["summary"]["totals"]["magic_number"], 1)
+
+    def test_ndjson(self):
+        """测试NDJSON每行一条记录"""
+        sink = self._write_findings(["ndjson"])
+        with open(sink.paths[0], encoding="utf8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r.get("smell") for r in records[:2]], ["magic_number", "duplicate_code"])
+        self.assertIn("summary", records[-1])
+
+    def test_sarif(self):
+        """测试SARIF结构"""
+        sink = self._write_findings(["sarif"])
+        with open(sink.paths[0], encoding="utf8") as f:
+            data = json.load(f)
+        self.assertEqual(data["version"], "2.1.0")
+        run = data["runs"][0]
+        rule_ids = [rule["id"] for rule in run["tool"]["driver"]["rules"]]
+        self.assertEqual(len(run["results"]), 2)
+        result = run["results"][1]
+        self.assertEqual(rule_ids[result["ruleIndex"]], "duplicate_code")
+        self.assertEqual(result["locations"][0]["physicalLocation"]["region"]["startLine"], 10)
+        self.assertEqual(result["relatedLocations"][0]["physicalLocation"]["artifactLocation"]["uri"], "b.py")
+
+    def test_no_partial_files_left(self):
+        """测试关闭后只保留最终文件"""
+        self._write_findings(["json", "ndjson", "sarif"])
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         ["demo_findings.json", "demo_findings.ndjson", "demo_findings.sarif"])
+
+
+    def test_abort_keeps_previous_report(self):
+        """测试中止时删除未完成的文件，保留上一次的报告"""
+        self._write_findings(["json", "ndjson"])
+        sink = open_report_writers("demo", self.output_dir, ["json", "ndjson"])
+        sink.add("magic_number", "c.py", 1, 3, "Magic number 7 appears 3 times")
+        sink.abort()
+        self.assertEqual(sorted(os.listdir(self.output_dir)), ["demo_findings.json", "demo_findings.ndjson"])
+        with open(os.path.join(self.output_dir, "demo_findings.json"), encoding="utf8") as f:
+            self.assertEqual(len(json.load(f)["findings"]), 2)
+
+    def test_failed_run_leaves_no_partial_files(self):
+        """测试检测阶段抛出异常时 detect_main 中止报告输出"""
+        from src import perf
+        from src.config_loader import get_config, reset_config
+        from src.detector import detect_main
+        reset_config()
+        self.addCleanup(reset_config)
+        output = get_config().config["output"]
+        output["directory"] = os.path.join(self.output_dir, "output")
+        output["logs_directory"] = os.path.join(self.output_dir, "output", "logs")
+        project = os.path.join(self.output_dir, "proj")
+        os.makedirs(project)
+        with open(os.path.join(project, "a.py"), "w", encoding="utf8") as f:
+            f.write("x = 1\n")
+        with mock.patch("src.detector.detect_pylint_output", side_effect=RuntimeError("pylint crashed")):
+            with self.assertRaises(RuntimeError):
+                detect_main(project, extra_formats=("json", "ndjson", "timings"))
+        self.assertFalse([name for name in os.listdir(output["directory"]) if name.endswith(".part")])
+        self.assertIsNone(perf.active())
+
+
+if __name__ == '__main__':
+    unittest.main()
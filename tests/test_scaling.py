@@ -0,0 +1,151 @@
+"""
+规模守护测试：在 n、2n、4n 三种规模的生成输入上运行检测器，断言耗时近似线性增长
+
+拟合的指数（log-log 斜率）线性为 1、两两比较为 2；超过 MAX_EXPONENT 即视为引入了二次复杂度。
+这些测试依赖实际耗时，在负载较高的机器上可能不稳定，默认跳过；设置 CODESMELL_SCALING_TESTS=1 运行：
+
+    CODESMELL_SCALING_TESTS=1 python -m pytest -q tests/test_scaling.py
+"""
+import itertools
+import math
+import os
+import random
+import time
+import unittest
+
+from benchmarks.corpus import CorpusSpec, file_name, file_source, generate
+from src.config_loader import get_config, reset_config
+from src.engine import FILE_DETECTORS, FindingCollector, _thresholds
+from src.sources import ParsedFile
+from src.Detector.duplicate_code_detector import _duplicate_pair, extract_function_features, find_duplicates, \
+    find_duplicates_between
+from src.Detector.unused_member_detector import _detect_unused_members_in_file
+from src.Detector.CodeSmellHandlers.HandleShotgunSurgerySmell.shotgun_surgery import \
+    detect_shotgun_surgery_in_tree
+
+SCALING_TESTS = os.environ.get("CODESMELL_SCALING_TESTS") == "1"
+MAX_EXPONENT = 1.5
+REPEAT = 3
+# Fast runs are repeated in a loop until one measurement takes this long (seconds)
+MIN_MEASUREMENT = 0.02
+
+
+def seconds_per_run(run, data) -> float:
+    """Best of REPEAT measurements of the mean time of run(data)"""
+    loops, best = 1, float("inf")
+    for _ in range(REPEAT):
+        while True:
+            started = time.perf_counter()
+            for _ in range(loops):
+                run(data)
+            elapsed = time.perf_counter() - started
+            if elapsed >= MIN_MEASUREMENT:
+                break
+            loops *= 2
+        best = min(best, elapsed / loops)
+    return best
+
+
+def scaling_exponent(build, run, n: int) -> float:
+    """Slope of log(seconds) over log(size) of run(build(size)) for n, 2n, 4n"""
+    points = [(math.log(size), math.log(seconds_per_run(run, build(size)))) for size in (n, 2 * n, 4 * n)]
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+
+
+def nested_classes(depth: int, towers: int = 10, members: int = 5) -> str:
+    """towers 组嵌套 depth 层的类，每层有若干方法互相调用"""
+    lines = []
+    for tower in range(towers):
+        for level in range(depth):
+            indent = "    " * level
+            lines.append(f"{indent}class C{tower}_{level}:")
+            for member in range(members):
+                lines.append(f"{indent}    def m{level}_{member}(self):")
+                lines.append(f"{indent}        return self.m{level}_{(member + 1) % members}()")
+    return "\n".join(lines) + "\n"
+
+
+def nested_calls(depth: int, statements: int = 20) -> str:
+    """一个类中若干条嵌套 depth 层的函数调用"""
+    call = "value"
+    for level in range(depth):
+        call = f"helper_{level % 7}({call}, {level})"
+    body = "".join(f"        total = {call}\n" for _ in range(statements))
+    return f"class Service:\n    def run(self, value):\n{body}        return total\n"
+
+
+@unittest.skipUnless(SCALING_TESTS, "timing-based; set CODESMELL_SCALING_TESTS=1 to run")
+class TestScaling(unittest.TestCase):
+    """检测器耗时随输入规模近似线性增长"""
+
+    def setUp(self):
+        reset_config()
+
+    def tearDown(self):
+        reset_config()
+
+    def assertNearLinear(self, build, run, n: int, what: str):
+        exponent = scaling_exponent(build, run, n)
+        self.assertLess(exponent, MAX_EXPONENT, "{} scales as n^{:.2f}".format(what, exponent))
+
+    def test_file_detectors(self):
+        """测试每个单文件检测器对文件中函数数量线性"""
+        thresholds = _thresholds(get_config())
+
+        def build(size):
+            parsed = ParsedFile("big.py", file_source(CorpusSpec(files=1, functions=size), 0))
+            _ = parsed.tree  # parse once here, outside the timed runs
+            return parsed
+
+        for name, detect in FILE_DETECTORS.items():
+            with self.subTest(detector=name):
+                self.assertNearLinear(build, lambda parsed: detect(parsed, FindingCollector(), thresholds), 100, name)
+
+    def test_duplicate_code(self):
+        """测试重复代码检测不再两两比较所有函数"""
+        def build(size):
+            functions = []
+            for filename, source in generate(CorpusSpec(files=size)):
+                functions.extend(extract_function_features(ParsedFile(filename, source).tree, filename))
+            return functions
+
+        self.assertNearLinear(build, lambda functions: sum(1 for _ in find_duplicates(functions, 80)), 100,
+                              "find_duplicates")
+
+    def test_nested_classes(self):
+        """测试嵌套类的未使用成员检测不重复遍历子树"""
+        self.assertNearLinear(lambda depth: ParsedFile(file_name(0), nested_classes(depth)).tree,
+                              _detect_unused_members_in_file, 20, "unused members of nested classes")
+
+    def test_nested_calls(self):
+        """测试散弹式修改检测不为每个嵌套调用重新生成源码"""
+        self.assertNearLinear(lambda depth: ParsedFile(file_name(0), nested_calls(depth)).tree,
+                              detect_shotgun_surgery_in_tree, 40, "shotgun surgery of nested calls")
+
+
+class TestDuplicateIndex(unittest.TestCase):
+    """重复代码索引的结果与两两比较一致（不依赖耗时，总是运行）"""
+
+    def test_duplicate_index_matches_all_pairs(self):
+        """测试前缀过滤得到的重复函数对（及其顺序）与两两比较完全一致"""
+        rng = random.Random(0)
+        functions = [{"name": f"f{i}", "filename": f"m{i % 7}.py", "lineno": i,
+                      "features": frozenset(rng.sample("abcdefghijkl", rng.randint(0, 7)))} for i in range(80)]
+        for threshold in (0, 25, 50, 66.66666666666667, 80, 100):
+            with self.subTest(threshold=threshold):
+                expected = [pair for pair in (_duplicate_pair(a, b, threshold)
+                                              for i, a in enumerate(functions) for b in functions[i + 1:]) if pair]
+                self.assertEqual(list(find_duplicates(functions, threshold)), expected)
+                expected = [pair for pair in (_duplicate_pair(a, b, threshold)
+                                              for i, a in enumerate(functions[:20])
+                                              for b in itertools.chain(functions[i + 1:20], functions[20:])) if pair]
+                self.assertEqual(list(find_duplicates(functions[:20], threshold, functions[20:])), expected)
+                expected = [pair for pair in (_duplicate_pair(*sorted((a, b), key=lambda f: f["filename"]), threshold)
+                                              for a in functions[:20] for b in functions[20:]) if pair]
+                self.assertEqual(list(find_duplicates_between(functions[:20], functions[20:], threshold)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
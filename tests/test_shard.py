@@ -0,0 +1,84 @@
+"""
+分片运行与合并的单元测试
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from src.api import analyze
+from src.config_loader import get_config, reset_config
+from src.shard import ShardError, find_bundles, merge_bundles, parse_shard, run_shard, shard_of
+from tests.test_engine import SMELLY_SOURCE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def finding_keys(findings):
+    return sorted((f["smell"], f["filename"], f["lineno"], (f.get("related") or {}).get("filename"))
+                  for f in findings)
+
+
+class TestShard(unittest.TestCase):
+    """分片测试"""
+
+    def setUp(self):
+        reset_config()
+        self.tmp = tempfile.mkdtemp()
+        get_config().config["output"]["directory"] = os.path.join(self.tmp, "output")
+        self.project = os.path.join(self.tmp, "proj")
+        os.makedirs(self.project)
+        for i in range(8):
+            with open(os.path.join(self.project, "mod{}.py".format(i)), "w", encoding="utf8") as f:
+                f.write(SMELLY_SOURCE if i % 2 else "def helper{}(x):\n    if x:\n        return 1\n    return 2\n"
+                        .format(i))
+        self.bundles = os.path.join(self.tmp, "bundles")
+
+    def tearDown(self):
+        reset_config()
+        shutil.rmtree(self.tmp)
+
+    def test_parse_shard(self):
+        """测试分片参数与文件分配"""
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for spec in ("0/4", "5/4", "x"):
+            with self.assertRaises(ShardError):
+                parse_shard(spec)
+        self.assertEqual(shard_of("pkg/a.py", 4), shard_of("pkg/a.py", 4))
+        self.assertEqual({shard_of("m{}.py".format(i), 1) for i in range(20)}, {1})
+
+    def test_merge_equals_single_run(self):
+        """测试合并各分片结果与整体运行一致，包括跨分片的重复代码"""
+        paths = [run_shard(self.project, i, 3, self.bundles) for i in (1, 2, 3)]
+        project, merged = merge_bundles(find_bundles([self.bundles]))
+        single = analyze([self.project], root=self.project)
+        self.assertEqual(project, "proj")
+        self.assertEqual(merged.files, 8)
+        self.assertEqual(dict(merged.totals), dict(single.totals))
+        self.assertEqual(finding_keys(merged.findings), finding_keys(single.findings))
+
+        with self.assertRaises(ShardError):
+            merge_bundles(paths[:2])
+        with self.assertRaises(ShardError):
+            merge_bundles(paths + paths[:1])
+
+    def test_shard_processes_share_a_directory(self):
+        """测试多个分片进程写入共享目录后用 merge 命令合并"""
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        processes = [subprocess.Popen([sys.executable, os.path.join(ROOT, "CodeSmellTool.py"), self.project,
+                                       "--shard", "{}/3".format(i), "--bundle-dir", self.bundles],
+                                      cwd=self.tmp, env=env, stdout=subprocess.DEVNULL)
+                     for i in (1, 2, 3)]
+        self.assertEqual([process.wait() for process in processes], [0, 0, 0])
+        merge = subprocess.run([sys.executable, os.path.join(ROOT, "CodeSmellTool.py"), "merge", self.bundles],
+                               cwd=self.tmp, env=env, stdout=subprocess.PIPE, text=True)
+        self.assertEqual(merge.returncode, 0)
+        self.assertIn("proj: ", merge.stdout)
+        self.assertIn("worst long_parameter: ", merge.stdout)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "output", "proj_findings.ndjson")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+流式上传解析与流水线分析的单元测试
+"""
+import io
+import threading
+import unittest
+from unittest import mock
+
+from src import upload_stream
+from src.config_loader import reset_config
+from src.engine import AnalysisEngine
+from src.upload_stream import MultipartUpload, UploadError, prefetch
+from tests.test_engine import SMELLY_SOURCE
+
+BOUNDARY = "----smellboundary"
+
+
+def multipart_body(files):
+    """Encode [(field, filename, content bytes)] as a multipart/form-data body"""
+    body = b""
+    for field, filename, content in files:
+        body += ("--{}\r\nContent-Disposition: form-data; name=\"{}\"; filename=\"{}\"\r\n"
+                 "Content-Type: text/x-python\r\n\r\n").format(BOUNDARY, field, filename).encode("utf8")
+        body += content + b"\r\n"
+    return body + "--{}--\r\n".format(BOUNDARY).encode("utf8")
+
+
+class SlowStream(io.RawIOBase):
+    """Request body whose last chunk is only sent once the release event is set"""
+
+    def __init__(self, body, tail, release):
+        self.head = io.BytesIO(body[:-tail])
+        self.tail = body[-tail:]
+        self.release = release
+        self.waited = False
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self.head.read(size)
+        if data:
+            return data
+        if self.tail:
+            self.waited = self.release.wait(10)
+            data, self.tail = self.tail, b""
+        return data
+
+
+class TestUploadStream(unittest.TestCase):
+    """流式上传测试"""
+
+    def setUp(self):
+        reset_config()
+
+    def tearDown(self):
+        reset_config()
+
+    def test_files_are_parsed_across_chunks(self):
+        """测试文件内容跨多个读取块时被正确拼接"""
+        body = multipart_body([("files", "proj/app/account.py", SMELLY_SOURCE.encode("utf8")),
+                               ("files", "proj/notes.txt", b"notes"),
+                               ("other", "proj/x.py", b"x = 1\n"),
+                               ("files", "proj/bad.py", b"\xff\xfe")])
+        with mock.patch.object(upload_stream, "CHUNK_SIZE", 7):
+            upload = MultipartUpload(io.BytesIO(body), BOUNDARY)
+            sources = list(upload)
+        self.assertEqual([(p.filename, p.source) for p in sources], [("proj/app/account.py", SMELLY_SOURCE)])
+        self.assertEqual(upload.project, "proj")
+        self.assertEqual([name for name, _ in upload.errors], ["proj/bad.py"])
+
+    def test_truncated_upload(self):
+        """测试上传中断时报错"""
+        body = multipart_body([("files", "proj/a.py", b"x = 1\n")])
+        with self.assertRaises(UploadError):
+            list(MultipartUpload(io.BytesIO(body[:-40]), BOUNDARY))
+
+    def test_analysis_starts_before_upload_ends(self):
+        """测试第一个文件在上传结束前就已进入分析"""
+        release = threading.Event()
+
+        class Sink:
+            def write(self, finding):
+                release.set()
+
+        body = multipart_body([("files", "proj/a.py", SMELLY_SOURCE.encode("utf8")),
+                               ("files", "proj/b.py", b"def clean():\n    return 1\n")])
+        stream = SlowStream(body, 60, release)
+        results = AnalysisEngine().analyze(prefetch(MultipartUpload(stream, BOUNDARY)), Sink())
+        self.assertTrue(stream.waited)
+        self.assertEqual(results.files, 2)
+
+    def test_prefetch_raises_producer_errors(self):
+        """测试后台读取线程的异常传给消费者"""
+        def items():
+            yield 1
+            raise UploadError("broken")
+
+        consumed = []
+        with self.assertRaises(UploadError):
+            for item in prefetch(items()):
+                consumed.append(item)
+        self.assertEqual(consumed, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
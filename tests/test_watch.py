@@ -0,0 +1,85 @@
+"""
+监视模式增量分析的单元测试
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.config_loader import get_config, reset_config
+from src.engine import AnalysisEngine
+from src.sources import iter_python_files, load_sources
+from src.watch import IncrementalProject, refresh_reports
+
+DUPLICATED = "def {}(x):\n    if x:\n        return 1\n    return 2\n"
+
+
+class TestIncrementalProject(unittest.TestCase):
+    """增量分析测试"""
+
+    def setUp(self):
+        reset_config()
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "proj")
+        os.makedirs(self.root)
+        self.write("a.py", DUPLICATED.format("first") + "\nLIMITS = [4242, 4242, 4242]\n")
+        self.write("b.py", "def clean():\n    return 1\n")
+        self.project = IncrementalProject(self.root)
+        self.project.update(*self.project.scan())
+
+    def tearDown(self):
+        reset_config()
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, source):
+        path = os.path.join(self.root, name)
+        with open(path, "w", encoding="utf8") as f:
+            f.write(source)
+        # make sure the change is visible to the next scan even within one mtime tick
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    def full_analysis(self):
+        results = AnalysisEngine().analyze(load_sources(iter_python_files([self.root]), root=self.root))
+        return {smell: count for smell, count in results.totals.items() if count}
+
+    def test_unchanged_project_has_nothing_to_do(self):
+        """测试文件未变化时不重新分析"""
+        self.assertEqual(self.project.scan(), ([], []))
+
+    def test_changes_are_patched_incrementally(self):
+        """测试修改、新增、删除文件后的结果与全量分析一致"""
+        self.write("b.py", DUPLICATED.format("second"))
+        change = self.project.update(*self.project.scan())
+        self.assertEqual(change.files, ["b.py"])
+        self.assertEqual([f["smell"] for f in change.new_findings], ["duplicate_code"])
+        self.assertEqual(self.project.summary()["totals"], self.full_analysis())
+
+        self.write("c.py", DUPLICATED.format("third"))
+        self.project.update(*self.project.scan())
+        self.assertEqual(self.project.totals["duplicate_code"], 3)
+        self.assertEqual(self.project.summary()["totals"], self.full_analysis())
+
+        os.unlink(os.path.join(self.root, "a.py"))
+        change = self.project.update(*self.project.scan())
+        self.assertEqual(change.removed, ["a.py"])
+        self.assertIn("magic_number", {f["smell"] for f in change.resolved_findings})
+        self.assertEqual(self.project.summary()["totals"], self.full_analysis())
+        self.assertEqual(self.project.summary()["stats"]["methods"], 2)
+
+    def test_reports_are_refreshed(self):
+        """测试增量更新后重写检测结果文件"""
+        output_dir = os.path.join(self.tmp, "output")
+        get_config().config["output"]["directory"] = output_dir
+        self.write("b.py", DUPLICATED.format("second"))
+        self.project.update(*self.project.scan())
+        refresh_reports(self.project, "proj")
+        with open(os.path.join(output_dir, "proj_findings.ndjson"), encoding="utf8") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines) - 1, sum(self.project.totals.values()))
+        self.assertEqual(lines[-1]["summary"]["totals"]["duplicate_code"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
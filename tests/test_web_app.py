@@ -0,0 +1,266 @@
+"""
+Web 端报告缓存与条件请求的单元测试
+"""
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import web_app
+from src import metrics
+from src.config_loader import get_config, reset_config
+from src.engine import AnalysisEngine
+from tools.report_writers import open_report_writers
+from web_app import app
+
+
+class WebAppTestCase(unittest.TestCase):
+    """在临时输出目录中运行 Web 应用"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        reset_config()
+        output = get_config().config["output"]
+        output["directory"] = os.path.join(self.tmp, "output")
+        output["plots_directory"] = os.path.join(self.tmp, "plots")
+        output["logs_directory"] = os.path.join(self.tmp, "output", "logs")
+        os.makedirs(output["plots_directory"])
+        sink = open_report_writers("demo", output["directory"], ["ndjson"])
+        for i in range(200):
+            sink.add("magic_number", f"f{i}.py", i + 1, 3, f"Magic number {i} appears 3 times")
+        sink.close({"project": "demo"})
+        with open(os.path.join(output["plots_directory"], "magic_number_logs_bar.png"), "wb") as f:
+            f.write(b"\x89PNG fake")
+        self.client = app.test_client()
+
+    def tearDown(self):
+        reset_config()
+        shutil.rmtree(self.tmp)
+
+
+class TestReportCaching(WebAppTestCase):
+    """报告缓存测试"""
+
+    def test_view_does_not_rerender_unchanged_report(self):
+        """测试结果未变化时不重新生成报告"""
+        self.client.get("/view/demo")
+        report = os.path.join(self.tmp, "output", "demo_review.html")
+        first_mtime = os.stat(report).st_mtime_ns
+        self.client.get("/view/demo")
+        self.assertEqual(os.stat(report).st_mtime_ns, first_mtime)
+
+    def test_report_conditional_and_gzip(self):
+        """测试报告的 ETag 与 gzip 压缩"""
+        self.client.get("/view/demo")
+        response = self.client.get("/reports/demo_review.html", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn(b"Project: demo", gzip.decompress(response.data))
+        etag = response.headers["ETag"]
+        response = self.client.get("/reports/demo_review.html",
+                                   headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_findings_api_conditional(self):
+        """测试分页接口的条件请求"""
+        response = self.client.get("/api/findings/demo?per_page=100", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        response = self.client.get("/api/findings/demo?per_page=100",
+                                   headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_versioned_plots_are_immutable(self):
+        """测试带版本号的图表长期缓存"""
+        response = self.client.get("/plots/magic_number_logs_bar.png?v=abc")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        response = self.client.get("/plots/magic_number_logs_bar.png")
+        self.assertNotIn("immutable", response.headers["Cache-Control"])
+
+
+class TestGallery(WebAppTestCase):
+    """图表缩略图与分页测试"""
+
+    def setUp(self):
+        super().setUp()
+        from PIL import Image
+        self.plots_dir = get_config().get_plots_dir()
+        os.unlink(os.path.join(self.plots_dir, "magic_number_logs_bar.png"))
+        for i in range(60):
+            Image.new("RGB", (800, 600), "white").save(os.path.join(self.plots_dir, f"chart_{i:02d}_bar.png"))
+
+    def test_gallery_is_paginated(self):
+        """测试图表列表分页"""
+        page1 = self.client.get("/gallery").get_data(as_text=True)
+        page2 = self.client.get("/gallery?page=2").get_data(as_text=True)
+        self.assertIn("chart_00_bar.png", page1)
+        self.assertNotIn("chart_59_bar.png", page1)
+        self.assertIn("chart_59_bar.png", page2)
+        self.assertIn("/thumbs/chart_00_bar.png", page1)
+
+    def test_thumbnail_generated_once(self):
+        """测试缩略图只生成一次并随图表更新"""
+        from PIL import Image
+        response = self.client.get("/thumbs/chart_00_bar.png?v=1")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        thumbs_dir = os.path.join(self.plots_dir, ".thumbs")
+        thumbs = os.listdir(thumbs_dir)
+        self.assertEqual(len(thumbs), 1)
+        with Image.open(os.path.join(thumbs_dir, thumbs[0])) as image:
+            self.assertLessEqual(image.width, 520)
+        mtime = os.stat(os.path.join(thumbs_dir, thumbs[0])).st_mtime_ns
+        self.client.get("/thumbs/chart_00_bar.png?v=1")
+        self.assertEqual(os.stat(os.path.join(thumbs_dir, thumbs[0])).st_mtime_ns, mtime)
+
+        # Rewriting the chart replaces its thumbnail
+        Image.new("RGB", (1200, 900), "black").save(os.path.join(self.plots_dir, "chart_00_bar.png"))
+        os.utime(os.path.join(self.plots_dir, "chart_00_bar.png"), ns=(1, 1))
+        self.client.get("/thumbs/chart_00_bar.png?v=2")
+        new_thumbs = os.listdir(thumbs_dir)
+        self.assertEqual(len(new_thumbs), 1)
+        self.assertNotEqual(new_thumbs, thumbs)
+
+    def test_thumbnail_names_and_failures(self):
+        """测试同名不同扩展名的图表各有缩略图，无法读取的图表不留下临时文件"""
+        from PIL import Image
+        from tools.plot_gallery import thumbnail_path
+        Image.new("RGB", (800, 600), "white").save(os.path.join(self.plots_dir, "chart_00_bar.jpg"))
+        png = thumbnail_path(self.plots_dir, "chart_00_bar.png")
+        jpg = thumbnail_path(self.plots_dir, "chart_00_bar.jpg")
+        self.assertNotEqual(png, jpg)
+        self.assertTrue(os.path.exists(png) and os.path.exists(jpg))
+
+        def fail_save(image, path, **kwargs):
+            with open(path, "wb") as f:
+                f.write(b"partial")
+            raise OSError("disk full")
+
+        Image.new("RGB", (800, 600), "white").save(os.path.join(self.plots_dir, "broken.png"))
+        with mock.patch.object(Image.Image, "save", fail_save):
+            self.assertIsNone(thumbnail_path(self.plots_dir, "broken.png"))
+        thumbs_dir = os.path.join(self.plots_dir, ".thumbs")
+        self.assertEqual(sorted(os.listdir(thumbs_dir)), sorted(os.path.basename(p) for p in (png, jpg)))
+
+
+class TestUploads(WebAppTestCase):
+    """上传分析测试"""
+
+    def test_archive_upload_is_analyzed_without_extraction(self):
+        """测试上传的压缩包按成员直接分析，不写入 code-dump"""
+        from tests.test_archive_sources import make_zip
+        response = self.client.post("/run-upload", data={"archive": (make_zip(), "proj.zip")},
+                                    content_type="multipart/form-data")
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("proj_review.html", response.headers["Location"])
+        self.assertFalse(os.path.exists(os.path.join("code-dump", "proj")))
+        with open(os.path.join(self.tmp, "output", "proj_findings.ndjson"), encoding="utf8") as f:
+            self.assertIn('"proj/app/account.py"', f.read())
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "output", "proj_review.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "plots", "long_parameter_logs_bar.png")))
+
+    def test_streaming_directory_upload(self):
+        """测试目录上传在接收过程中直接分析，保留相对路径"""
+        from tests.test_engine import SMELLY_SOURCE
+        files = [(io.BytesIO(SMELLY_SOURCE.encode("utf8")), "proj/app/account.py"),
+                 (io.BytesIO(b"# notes"), "proj/README.md")]
+        response = self.client.post("/run-upload-stream", data={"files": files},
+                                    content_type="multipart/form-data")
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("proj_review.html", response.headers["Location"])
+        with open(os.path.join(self.tmp, "output", "proj_findings.ndjson"), encoding="utf8") as f:
+            self.assertIn('"proj/app/account.py"', f.read())
+        # the charts are rendered from the findings and shown in the report
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "plots", "long_parameter_logs_bar.png")))
+        with open(os.path.join(self.tmp, "output", "proj_review.html"), encoding="utf8") as f:
+            self.assertIn("long_parameter_logs_bar.png", f.read())
+
+    def test_upload_deadline_gives_partial_report(self):
+        """测试上传分析超过时间上限时生成标记为部分结果的报告"""
+        from tests.test_engine import SMELLY_SOURCE
+        get_config().config.setdefault("limits", {})["upload_deadline"] = 1e-9
+        files = [(io.BytesIO(SMELLY_SOURCE.encode("utf8")), "proj/app/account.py")]
+        # a cached file is complete whatever the deadline: analyze with a cold engine
+        with mock.patch.object(web_app, "engine", AnalysisEngine()):
+            response = self.client.post("/run-upload-stream", data={"files": files},
+                                        content_type="multipart/form-data")
+        self.assertEqual(response.status_code, 302)
+        with open(os.path.join(self.tmp, "output", "proj_review.html"), encoding="utf8") as f:
+            report = f.read()
+        self.assertIn("Partial report", report)
+        self.assertIn("proj/app/account.py", report)
+
+    def test_bad_archive_upload(self):
+        """测试损坏的压缩包返回 400"""
+        response = self.client.post("/run-upload", data={"archive": (io.BytesIO(b"junk"), "proj.zip")},
+                                    content_type="multipart/form-data")
+        self.assertEqual(response.status_code, 400)
+
+
+class TestMetrics(WebAppTestCase):
+    """/metrics 指标接口测试"""
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        patcher = mock.patch.object(web_app, "engine", AnalysisEngine())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_exposition_format(self):
+        """测试计数器、仪表与直方图的文本格式"""
+        counter = metrics.Counter("demo_total", "Demo", ["kind"], register=False)
+        counter.inc(kind='a"b')
+        counter.inc(2, kind='a"b')
+        self.assertEqual(counter.render(), '# HELP demo_total Demo\n# TYPE demo_total counter\n'
+                                           'demo_total{kind="a\\"b"} 3\n')
+        histogram = metrics.Histogram("demo_seconds", "Demo", buckets=(0.1, 1.0), register=False)
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        lines = histogram.samples()
+        self.assertEqual(lines[:3], ['demo_seconds_bucket{le="0.1"} 1', 'demo_seconds_bucket{le="1"} 2',
+                                     'demo_seconds_bucket{le="+Inf"} 3'])
+        self.assertEqual(lines[-1], "demo_seconds_count 3")
+        with self.assertRaises(ValueError):
+            counter.inc()
+
+    def test_upload_is_counted(self):
+        """测试上传分析后指标反映任务、文件、缓存与阶段耗时"""
+        from tests.test_engine import SMELLY_SOURCE
+        for _ in range(2):
+            files = [(io.BytesIO(SMELLY_SOURCE.encode("utf8")), "proj/app/account.py")]
+            self.client.post("/run-upload-stream", data={"files": files}, content_type="multipart/form-data")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.headers["Content-Type"], metrics.CONTENT_TYPE)
+        text = response.get_data(as_text=True)
+        self.assertIn('codesmell_jobs_finished_total{kind="stream",status="ok"} 2', text)
+        self.assertIn("codesmell_jobs_running 0", text)
+        self.assertIn("codesmell_files_analyzed_total 2", text)
+        self.assertIn("codesmell_lines_analyzed_total {}".format(2 * metrics.line_count(SMELLY_SOURCE)), text)
+        # the second upload of the same file is answered by the engine cache
+        self.assertIn('codesmell_cache_hit_ratio{cache="file"} 0.5', text)
+        self.assertIn('codesmell_job_duration_seconds_count{kind="stream"} 2', text)
+        self.assertIn('codesmell_stage_duration_seconds_count{stage="duplicate_code"} 2', text)
+        self.assertRegex(text, r'codesmell_upload_bytes_total\{kind="stream"\} [1-9]')
+
+    def test_directory_upload_is_counted(self):
+        """测试目录上传在保存文件时统计文件数与行数"""
+        # c.py is copied in several chunks
+        files = [(io.BytesIO(b"x = 1\ny = 2"), "proj/a.py"), (io.BytesIO(b"z = 3\n"), "proj/b.py"),
+                 (io.BytesIO(b"w = 4\n" * 20000), "proj/c.py"), (io.BytesIO(b"notes\n"), "proj/notes.txt")]
+        cwd = os.getcwd()
+        os.chdir(self.tmp)
+        try:
+            with mock.patch("web_app.detect_main") as detect:
+                self.client.post("/run-upload", data={"files": files}, content_type="multipart/form-data")
+        finally:
+            os.chdir(cwd)
+        detect.assert_called_once()
+        text = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('codesmell_jobs_finished_total{kind="directory",status="ok"} 1', text)
+        self.assertIn("codesmell_files_analyzed_total 3", text)
+        self.assertIn("codesmell_lines_analyzed_total 20003", text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,82 +1,307 @@
+"""
+Tool comparison harness
+Runs this tool and reference linters (pylint, flake8, ruff) over the same local corpus, measures
+the wall time, CPU time and peak memory of each, and compares what they report on the smell
+categories they have in common (CATEGORIES), e.g. cyclomatic complexity, magic numbers or broad
+exception handlers. From the repository root:
 
-from subprocess import run, PIPE
-
-with open(r'sourcecode\flask_pylint.txt', encoding='UTF8') as fp:  
-   line = fp.readline()
-   cnt = 0
-   while line:
-       line = fp.readline()
-       if 'C0301' in line:
-           cnt += 1
-        
-print('flask-master: Pylint detects {} lines that are too long'.format(cnt))
-       
-with open(r'sourcecode\flask_flake.txt', encoding='UTF8') as fp:  
-   line = fp.readline()
-   cnt = 0
-   while line:
-       line = fp.readline()
-       if 'E501' in line:
-           cnt += 1
-        
-print('flask-master: Pyflakes detects {} lines that are too long'.format(cnt))
-       
-with open(r'sourcecode\keras_pylint.txt', encoding='UTF8') as fp:  
-   line = fp.readline()
-   cnt = 0
-   while line:
-       line = fp.readline()
-       if 'C0301' in line:
-           cnt += 1
-        
-print('keras-master: Pylint detects {} lines that are too long'.format(cnt))
-       
-with open(r'sourcecode\keras_flake.txt', encoding='UTF8') as fp:  
-   line = fp.readline()
-   cnt = 0
-   while line:
-       line = fp.readline()
-       if 'E501' in line:
-           cnt += 1
-        
-print('keras-master: Pyflakes detects {} lines that are too long'.format(cnt))
-       
-with open(r'sourcecode\scikit_pylint.txt', encoding='UTF8') as fp:  
-   line = fp.readline()
-   cnt = 0
-   while line:
-       line = fp.readline()
-       if 'C0301' in line:
-           cnt += 1
-        
-print('scikit-learn-master: Pylint detects {} lines that are too long'.format(cnt))
-       
-with open(r'sourcecode\scikit_flake.txt', encoding='UTF8') as fp:  
-   line = fp.readline()
-   cnt = 0
-   while line:
-       line = fp.readline()
-       if 'E501' in line:
-           cnt += 1
-        
-print('scikit-learn-master: Pyflakes detects {} lines that are too long'.format(cnt))
-
-with open(r'sourcecode\scrapy_pylint.txt') as fp:  
-   line = fp.readline()
-   cnt = 0
-   while line:
-       line = fp.readline()
-       if 'C0301' in line:
-           cnt += 1
-        
-print('scrapy-master: Pylint detects {} lines that are too long'.format(cnt))
-       
-with open(r'sourcecode\scrapy_flake.txt', encoding='UTF8') as fp:  
-   line = fp.readline()
-   cnt = 0
-   while line:
-       line = fp.readline()
-       if 'E501' in line:
-           cnt += 1
-        
-print('scrapy-master: Pyflakes detects {} lines that are too long'.format(cnt))
\ No newline at end of file
+    python -m tools.compare_tools path/to/project --json comparison.json
+    python -m tools.compare_tools --synthetic 2000 --tools codesmelltool,pylint
+
+Outputs are read line by line while the tools run; only the (file, line) of the findings of the
+compared categories are kept. Two tools agree on a finding when they report the same category on
+the same line of the same file; the file-level agreement ignores the line, for tools that report
+a smell on another line of the same construct. Reference linters only check the codes mapped to a
+category unless --full is given, and only the findings in files this tool analyzes (not ignored in
+config.yaml) are compared unless --all-files is given. Linters that are not installed are skipped.
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OURS = "codesmelltool"
+
+# Category -> tool -> codes reporting it (for this tool: smell names)
+CATEGORIES: Dict[str, Dict[str, Set[str]]] = {
+    "long_method": {OURS: {"long_method"}, "pylint": {"R0915"}, "ruff": {"PLR0915"}},
+    "long_parameter": {OURS: {"long_parameter"}, "pylint": {"R0913"}, "ruff": {"PLR0913"}},
+    "too_many_branches": {OURS: {"too_many_branches"}, "pylint": {"R0912"}, "ruff": {"PLR0912"}},
+    "too_many_methods": {OURS: {"too_many_methods"}, "pylint": {"R0904"}, "ruff": {"PLR0904"}},
+    "too_many_attributes": {OURS: {"too_many_attributes"}, "pylint": {"R0902"}},
+    "cyclomatic_complexity": {OURS: {"cyclomatic_complexity"}, "pylint": {"R1260"}, "flake8": {"C901"},
+                              "ruff": {"C901"}},
+    "magic_number": {OURS: {"magic_number"}, "pylint": {"R2004"}, "ruff": {"PLR2004"}},
+    "useless_exception": {OURS: {"useless_exception"}, "pylint": {"W0702", "W0706", "W0718"},
+                          "flake8": {"E722"}, "ruff": {"E722", "BLE001", "S110"}},
+    "commented_code": {OURS: {"commented_code"}, "flake8": {"E800"}, "ruff": {"ERA001"}},
+    "unused_member": {OURS: {"unused_member"}, "pylint": {"W0238"}},
+    "duplicate_code": {OURS: {"duplicate_code"}, "pylint": {"R0801"}},
+    # not a smell of this tool: the comparison the first version of this script made
+    "long_line": {"pylint": {"C0301"}, "flake8": {"E501"}, "ruff": {"E501"}},
+}
+
+_LINE = re.compile(r"^(?P<path>.+?):(?P<line>\d+):(?:\d+:)? \[?(?P<code>[A-Z]+[0-9]+)")
+
+# (file, line) of every finding of a category
+Findings = Dict[str, Set[Tuple[str, int]]]
+
+
+def tool_codes(tool: str) -> Dict[str, str]:
+    """Code -> category of the codes of a tool that belong to a compared category"""
+    return {code: category for category, tools in CATEGORIES.items() for code in tools.get(tool, ())}
+
+
+def _module_available(module: str) -> bool:
+    return subprocess.run([sys.executable, "-c", "import " + module], stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode == 0
+
+
+class Tool:
+    """A tool run over a corpus: its command line and where its findings are read from"""
+
+    def __init__(self, name: str, command: Callable[[str, int, bool, str], List[str]],
+                 available: Callable[[], bool], output: Optional[Callable[[str, str], str]] = None):
+        self.name = name
+        self.command = command
+        self.available = available
+        # None: findings are read from the standard output, else from this file once the tool exited
+        self.output = output
+
+    def parse(self, line: str) -> Optional[Tuple[str, str, int]]:
+        """(code, path, line) of one output line, None for other lines"""
+        match = _LINE.match(line)
+        if match is None:
+            return None
+        return match.group("code"), match.group("path"), int(match.group("line"))
+
+
+class CodeSmellToolRun(Tool):
+    """This tool, in batch mode (no PDF, charts or code-dump copy); findings from its NDJSON file"""
+
+    def __init__(self):
+        super().__init__(OURS, self._command, lambda: True, self._output)
+
+    @staticmethod
+    def _command(corpus: str, jobs: int, full: bool, workdir: str) -> List[str]:
+        list_file = os.path.join(workdir, "projects.txt")
+        with open(list_file, "w", encoding="utf8") as f:
+            f.write(corpus + "\n")
+        return [sys.executable, os.path.join(ROOT, "CodeSmellTool.py"), "--projects", list_file, "--jobs", str(jobs)]
+
+    @staticmethod
+    def _output(corpus: str, workdir: str) -> str:
+        name = os.path.basename(os.path.normpath(corpus)) or "project"
+        return os.path.join(workdir, "output", "{}_findings.ndjson".format(name))
+
+    def parse(self, line: str) -> Optional[Tuple[str, str, int]]:
+        try:
+            finding = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(finding, dict) or "smell" not in finding or not isinstance(finding.get("lineno"), int):
+            return None
+        return finding["smell"], finding["filename"], finding["lineno"]
+
+
+def _pylint(corpus: str, jobs: int, full: bool, workdir: str) -> List[str]:
+    command = [sys.executable, "-m", "pylint", "--output-format=parseable", "--reports=n", "--score=n",
+               "--jobs={}".format(jobs), "--load-plugins=pylint.extensions.mccabe,pylint.extensions.magic_value"]
+    if not full:
+        command += ["--disable=all", "--enable=" + ",".join(sorted(tool_codes("pylint")))]
+    return command + [corpus]
+
+
+def _flake8(corpus: str, jobs: int, full: bool, workdir: str) -> List[str]:
+    command = [sys.executable, "-m", "flake8", "--jobs={}".format(jobs), "--max-complexity=10"]
+    if not full:
+        command.append("--select=" + ",".join(sorted(tool_codes("flake8"))))
+    return command + [corpus]
+
+
+def _ruff(corpus: str, jobs: int, full: bool, workdir: str) -> List[str]:
+    command = [shutil.which("ruff") or "ruff", "check", "--isolated", "--no-cache", "--exit-zero",
+               "--output-format=concise"]
+    command.append("--select=" + (",".join(sorted(tool_codes("ruff"))) if not full else "ALL"))
+    return command + [corpus]
+
+
+TOOLS = {tool.name: tool for tool in [
+    CodeSmellToolRun(),
+    Tool("pylint", _pylint, lambda: _module_available("pylint")),
+    Tool("flake8", _flake8, lambda: _module_available("flake8")),
+    Tool("ruff", _ruff, lambda: shutil.which("ruff") is not None),
+]}
+
+
+def relative_path(path: str, corpus: str, workdir: str) -> str:
+    """File name relative to the corpus root, as this tool names files"""
+    if not os.path.isabs(path):
+        in_corpus = os.path.join(corpus, path)
+        path = in_corpus if os.path.exists(in_corpus) else os.path.join(workdir, path)
+    return os.path.relpath(path, corpus).replace(os.sep, "/")
+
+
+def _wait(process: subprocess.Popen) -> Tuple[Optional[float], Optional[float]]:
+    """Reap the process; (CPU seconds of it and its children, its peak RSS in MiB) where known"""
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return None, None
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # kilobytes on Linux, bytes on macOS
+    peak = usage.ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+    return usage.ru_utime + usage.ru_stime, round(peak, 1)
+
+
+def run_tool(tool: Tool, corpus: str, jobs: int = 1, full: bool = False,
+             keep: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+    """
+    Run one tool over the corpus, reading its findings as they are written; with keep, only the
+    findings in the files (relative paths) it accepts are compared
+
+    Returns:
+        {"tool", "wall", "cpu", "peak_rss_mb", "exit_code", "findings" (total count),
+         "categories" (Findings of the compared categories)}
+    """
+    codes = tool_codes(tool.name)
+    found: Findings = {}
+    total = 0
+    workdir = tempfile.mkdtemp(prefix="compare-{}-".format(tool.name))
+
+    def consume(lines):
+        nonlocal total
+        for line in lines:
+            parsed = tool.parse(line)
+            if parsed is None:
+                continue
+            code, path, lineno = parsed
+            total += 1
+            category = codes.get(code)
+            if category is None:
+                continue
+            path = relative_path(path, corpus, workdir)
+            if keep is None or keep(path):
+                found.setdefault(category, set()).add((path, lineno))
+
+    try:
+        command = tool.command(corpus, jobs, full, workdir)
+        started = time.perf_counter()
+        process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   encoding="utf8", errors="replace")
+        consume(process.stdout)
+        process.stdout.close()
+        cpu, peak = _wait(process)
+        wall = time.perf_counter() - started
+        if tool.output is not None:
+            output = tool.output(corpus, workdir)
+            if os.path.exists(output):
+                with open(output, encoding="utf8") as f:
+                    consume(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"tool": tool.name, "wall": round(wall, 3), "cpu": None if cpu is None else round(cpu, 3),
+            "peak_rss_mb": peak, "exit_code": process.returncode, "findings": total, "categories": found}
+
+
+def _jaccard(first: set, second: set) -> Optional[float]:
+    union = len(first | second)
+    return round(len(first & second) / union, 3) if union else None
+
+
+def agreement(runs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    For every pair of tools and every category both check: findings of each, findings in common
+    and only in one of them (same file and line), and the line- and file-level Jaccard agreement
+    """
+    rows = []
+    for first, second in itertools.combinations(runs, 2):
+        for category, tools in CATEGORIES.items():
+            if first["tool"] not in tools or second["tool"] not in tools:
+                continue
+            a, b = first["categories"].get(category, set()), second["categories"].get(category, set())
+            rows.append({"category": category, "tools": [first["tool"], second["tool"]],
+                         "counts": [len(a), len(b)], "both": len(a & b), "only": [len(a - b), len(b - a)],
+                         "line_agreement": _jaccard(a, b),
+                         "file_agreement": _jaccard({path for path, _ in a}, {path for path, _ in b})})
+    return rows
+
+
+def format_report(runs: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> str:
+    def number(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    lines = ["{:<16}{:>10}{:>10}{:>10}{:>10}{:>6}".format("tool", "wall s", "CPU s", "RSS MiB", "findings", "exit")]
+    lines += ["{:<16}{:>10}{:>10}{:>10}{:>10}{:>6}".format(
+        run["tool"], number(run["wall"], ".2f"), number(run["cpu"], ".2f"), number(run["peak_rss_mb"], ".1f"),
+        run["findings"], run["exit_code"]) for run in runs]
+    lines += ["", "{:<24}{:<28}{:>12}{:>8}{:>14}{:>7}{:>7}".format(
+        "category", "tools", "counts", "both", "only", "line", "file")]
+    for row in rows:
+        lines.append("{:<24}{:<28}{:>12}{:>8}{:>14}{:>7}{:>7}".format(
+            row["category"], " / ".join(row["tools"]), "{} / {}".format(*row["counts"]), row["both"],
+            "{} / {}".format(*row["only"]), number(row["line_agreement"], ".2f"), number(row["file_agreement"], ".2f")))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare this tool with reference linters on one corpus")
+    parser.add_argument("corpus", nargs="?", help="project directory")
+    parser.add_argument("--synthetic", type=int, metavar="FILES",
+                        help="use the benchmark corpus of this many files instead (see benchmarks/corpus.py)")
+    parser.add_argument("--tools", default=",".join(TOOLS), help="comma separated (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=1, help="processes of the tools that support it")
+    parser.add_argument("--full", action="store_true", help="run the reference linters with all their checks")
+    parser.add_argument("--all-files", action="store_true",
+                        help="also compare findings in files ignored by this tool's configuration")
+    parser.add_argument("--json", metavar="PATH", help="write the measurements and agreement as JSON")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        from benchmarks.corpus import CorpusSpec, write_corpus
+        from benchmarks.run import DEFAULT_CORPUS_DIR
+        corpus, _ = write_corpus(CorpusSpec(args.synthetic), DEFAULT_CORPUS_DIR)
+    elif args.corpus and os.path.isdir(args.corpus):
+        corpus = os.path.abspath(args.corpus)
+    else:
+        parser.error("a corpus directory or --synthetic is required")
+    names = args.tools.split(",")
+    unknown = [name for name in names if name not in TOOLS]
+    if unknown:
+        parser.error("unknown tool(s): {}".format(", ".join(unknown)))
+
+    config = None
+    if not args.all_files:
+        from src.config_loader import get_config
+        config = get_config(os.path.join(ROOT, "config.yaml"))
+
+    def keep(path):
+        return not config.should_ignore_file(os.path.join(corpus, path))
+
+    runs = []
+    for name in names:
+        if not TOOLS[name].available():
+            print("{}: not installed, skipped".format(name), file=sys.stderr)
+            continue
+        print("running {}...".format(name), file=sys.stderr, flush=True)
+        runs.append(run_tool(TOOLS[name], corpus, args.jobs, args.full, keep if config else None))
+    rows = agreement(runs)
+    print(format_report(runs, rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as f:
+            json.dump({"corpus": corpus, "runs": [dict(run, categories={category: len(found) for category, found
+                                                                         in run["categories"].items()})
+                                                  for run in runs],
+                       "agreement": rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Findings index
+Pre-sort and index the NDJSON findings file of a run so that any page of findings can be read
+with a few seeks, whatever the size of the project.
+
+Layout of <dirname>_findings.index/:
+    meta.json          record count, per-smell ranges and the run summary
+    offsets.bin        byte offset of every record in the NDJSON file (uint64)
+    <order>.bin        record numbers in sort order (uint32), one file per entry of ORDERS
+"""
+import json
+import os
+from array import array
+from typing import Any, Dict, List, Optional
+
+INDEX_VERSION = 2
+
+# Orderings written at index time. "smell_*" orderings group records by smell first, so that a
+# smell filter is a contiguous range of the ordering.
+ORDERS = ("file", "metric", "smell", "smell_metric")
+
+SORT_KEYS = ("file", "metric", "smell")
+
+MAX_PER_PAGE = 500
+
+
+def index_dir_for(ndjson_path: str) -> str:
+    """Directory holding the index of an NDJSON findings file"""
+    base = ndjson_path[:-len(".ndjson")] if ndjson_path.endswith(".ndjson") else ndjson_path
+    return base + ".index"
+
+
+def _metric_key(metric) -> float:
+    if isinstance(metric, bool) or not isinstance(metric, (int, float)):
+        return float("-inf")
+    return float(metric)
+
+
+def _lineno_key(lineno) -> int:
+    return lineno if isinstance(lineno, int) else 0
+
+
+def _write_order(path: str, numbers: List[int]):
+    with open(path, "wb") as f:
+        array("I", numbers).tofile(f)
+
+
+def build_findings_index(ndjson_path: str) -> str:
+    """
+    Build the index of an NDJSON findings file
+
+    Only the sort keys of each record are kept in memory; the records themselves stay on disk.
+
+    Returns:
+        path of the index directory
+    """
+    offsets = array("Q")
+    keys = []
+    summary = {}
+    with open(ndjson_path, "rb") as f:
+        # stat the file that is read: a file replaced meanwhile is seen as stale by open()
+        source = os.fstat(f.fileno())
+        offset = 0
+        for raw in f:
+            line_offset, offset = offset, offset + len(raw)
+            if not raw.strip():
+                continue
+            record = json.loads(raw)
+            if "smell" not in record:
+                summary = record.get("summary", summary)
+                continue
+            keys.append((record["smell"], str(record.get("filename", "")), _lineno_key(record.get("lineno")),
+                         _metric_key(record.get("metric"))))
+            offsets.append(line_offset)
+
+    numbers = range(len(keys))
+    by_file = sorted(numbers, key=lambda i: (keys[i][1], keys[i][2], keys[i][0]))
+    by_metric = sorted(numbers, key=lambda i: (keys[i][3], keys[i][1], keys[i][2]))
+    by_smell = sorted(numbers, key=lambda i: (keys[i][0], keys[i][1], keys[i][2]))
+    by_smell_metric = sorted(numbers, key=lambda i: (keys[i][0], keys[i][3], keys[i][1], keys[i][2]))
+
+    # Contiguous range of every smell in the smell-grouped orderings
+    smells = {}
+    for position, number in enumerate(by_smell):
+        smell = keys[number][0]
+        if smell not in smells:
+            smells[smell] = [position, position]
+        smells[smell][1] = position + 1
+
+    index_dir = index_dir_for(ndjson_path)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, "offsets.bin"), "wb") as f:
+        offsets.tofile(f)
+    for name, order in zip(ORDERS, (by_file, by_metric, by_smell, by_smell_metric)):
+        _write_order(os.path.join(index_dir, f"{name}.bin"), order)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "count": len(keys),
+        "smells": smells,
+        "summary": summary,
+        "source_size": source.st_size,
+        "source_mtime_ns": source.st_mtime_ns,
+    }
+    # meta.json is written last: its presence marks a complete index
+    tmp_path = os.path.join(index_dir, "meta.json.part")
+    with open(tmp_path, "w", encoding="utf8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(index_dir, "meta.json"))
+    return index_dir
+
+
+class FindingsIndex:
+    """Read pages of findings from an indexed NDJSON file"""
+
+    def __init__(self, ndjson_path: str):
+        self.ndjson_path = ndjson_path
+        self.index_dir = index_dir_for(ndjson_path)
+        with open(os.path.join(self.index_dir, "meta.json"), encoding="utf8") as f:
+            self.meta = json.load(f)
+
+    @classmethod
+    def open(cls, ndjson_path: str) -> Optional["FindingsIndex"]:
+        """Open the index of a findings file, building it if missing or stale; None if there are no findings"""
+        if not os.path.exists(ndjson_path):
+            return None
+        meta_path = os.path.join(index_dir_for(ndjson_path), "meta.json")
+        try:
+            with open(meta_path, encoding="utf8") as f:
+                meta = json.load(f)
+            source = os.stat(ndjson_path)
+            stale = (meta.get("version") != INDEX_VERSION
+                     or meta.get("source_size") != source.st_size
+                     or meta.get("source_mtime_ns") != source.st_mtime_ns)
+        except (OSError, ValueError):
+            stale = True
+        if stale:
+            build_findings_index(ndjson_path)
+        return cls(ndjson_path)
+
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def summary(self) -> Dict[str, Any]:
+        return self.meta.get("summary", {})
+
+    def smell_counts(self) -> Dict[str, int]:
+        return {smell: end - start for smell, (start, end) in self.meta["smells"].items()}
+
+    def _read_numbers(self, order: str, start: int, stop: int) -> array:
+        numbers = array("I")
+        if stop <= start:
+            return numbers
+        with open(os.path.join(self.index_dir, f"{order}.bin"), "rb") as f:
+            f.seek(start * numbers.itemsize)
+            numbers.frombytes(f.read((stop - start) * numbers.itemsize))
+        return numbers
+
+    def _read_records(self, numbers) -> List[Dict[str, Any]]:
+        offsets = array("Q")
+        records = []
+        with open(os.path.join(self.index_dir, "offsets.bin"), "rb") as offsets_file, \
+                open(self.ndjson_path, "rb") as data_file:
+            for number in numbers:
+                offsets_file.seek(number * offsets.itemsize)
+                offset = array("Q", offsets_file.read(offsets.itemsize))[0]
+                data_file.seek(offset)
+                records.append(json.loads(data_file.readline()))
+        return records
+
+    def _order_range(self, sort: str, smell: Optional[str]):
+        if not smell:
+            return sort, 0, self.count
+        start, stop = self.meta["smells"].get(smell, (0, 0))
+        return ("smell_metric" if sort == "metric" else "smell"), start, stop
+
+    def page(self, page: int = 1, per_page: int = 50, sort: str = "file", order: str = "asc",
+             smell: Optional[str] = None, q: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return one page of findings
+
+        Args:
+            page: 1-based page number
+            per_page: page size, at most MAX_PER_PAGE
+            sort: "file" (filename, line), "metric" (smallest first) or "smell"
+            order: "asc" or "desc" (reverses the sort order)
+            smell: only return findings of this smell
+            q: only return findings whose filename or message contains this text; this filter
+               scans the selected range instead of using the index
+
+        Returns:
+            {"total", "page", "per_page", "pages", "findings"}
+        """
+        sort = sort if sort in SORT_KEYS else "file"
+        per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+        page = max(1, int(page))
+        descending = order == "desc"
+        order_name, start, stop = self._order_range(sort, smell)
+
+        if q:
+            findings, total = self._search(order_name, start, stop, descending, q.lower(),
+                                           (page - 1) * per_page, per_page)
+        else:
+            total = stop - start
+            first = (page - 1) * per_page
+            if descending:
+                numbers = self._read_numbers(order_name, max(start, stop - first - per_page), stop - first)
+                numbers.reverse()
+            else:
+                numbers = self._read_numbers(order_name, start + first, min(stop, start + first + per_page))
+            findings = self._read_records(numbers)
+
+        return {
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": (total + per_page - 1) // per_page,
+            "findings": findings,
+        }
+
+    def _search(self, order_name, start, stop, descending, needle, skip, limit):
+        numbers = self._read_numbers(order_name, start, stop)
+        if descending:
+            numbers.reverse()
+        findings, total = [], 0
+        chunk = 1000
+        for chunk_start in range(0, len(numbers), chunk):
+            for record in self._read_records(numbers[chunk_start:chunk_start + chunk]):
+                text = f"{record.get('filename', '')} {record.get('message', '')}".lower()
+                if needle not in text:
+                    continue
+                if skip <= total < skip + limit:
+                    findings.append(record)
+                total += 1
+        return findings, total
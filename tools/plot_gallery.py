@@ -0,0 +1,95 @@
+"""
+Chart gallery helpers
+Cached listing of the plots directory and small thumbnails of the charts, generated once per chart version
+"""
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow missing: the gallery falls back to the full-size charts
+    Image = None
+
+from tools.report_html import IMAGE_EXTENSIONS, asset_version
+
+THUMBS_DIRNAME = ".thumbs"
+
+# Gallery cards are 260px wide; twice that keeps thumbnails sharp on high-DPI screens
+THUMB_SIZE = (520, 520)
+
+GALLERY_PAGE_SIZE = 48
+
+_listing_lock = threading.Lock()
+# plots directory -> (directory mtime, sorted chart names)
+_listing_cache: Dict[str, Tuple[int, List[str]]] = {}
+
+
+def list_plots(plots_dir: str) -> List[str]:
+    """
+    Sorted chart file names in the plots directory
+
+    The listing is cached and only read again when the directory changes (a chart added,
+    removed or renamed).
+    """
+    try:
+        dir_mtime = os.stat(plots_dir).st_mtime_ns
+    except OSError:
+        return []
+    cached = _listing_cache.get(plots_dir)
+    if cached and cached[0] == dir_mtime:
+        return cached[1]
+    with _listing_lock:
+        names = sorted(name for name in os.listdir(plots_dir)
+                       if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(plots_dir, name)))
+        _listing_cache[plots_dir] = (dir_mtime, names)
+    return names
+
+
+def paginate(items: List[str], page: int, page_size: int = GALLERY_PAGE_SIZE) -> Tuple[List[str], int, int]:
+    """Return (items of the page, page number, number of pages); out of range pages are clamped"""
+    pages = max(1, (len(items) + page_size - 1) // page_size)
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], page, pages
+
+
+def thumbnail_path(plots_dir: str, name: str) -> Optional[str]:
+    """
+    Path of the thumbnail of a chart, generated if it does not exist yet
+
+    Thumbnails are named after the chart file name (with its extension) and version, so a rewritten
+    chart gets a new thumbnail and the old one is removed. Returns None if the chart is missing or
+    cannot be thumbnailed.
+    """
+    source = os.path.join(plots_dir, name)
+    if Image is None or os.path.basename(name) != name or not os.path.isfile(source):
+        return None
+    thumbs_dir = os.path.join(plots_dir, THUMBS_DIRNAME)
+    target = os.path.join(thumbs_dir, f"{name}.{asset_version(source)}.png")
+    if os.path.exists(target):
+        return target
+
+    os.makedirs(thumbs_dir, exist_ok=True)
+    tmp_target = f"{target}.{threading.get_ident()}.part"
+    try:
+        with Image.open(source) as image:
+            image.thumbnail(THUMB_SIZE)
+            image.save(tmp_target, format="PNG", optimize=True)
+    except (OSError, ValueError):
+        try:
+            os.unlink(tmp_target)
+        except OSError:
+            pass
+        return None
+    os.replace(tmp_target, target)
+
+    # Drop thumbnails of previous versions of this chart
+    for entry in os.listdir(thumbs_dir):
+        stale = entry.startswith(name + ".") and entry.count(".") == name.count(".") + 2
+        if stale and os.path.join(thumbs_dir, entry) != target:
+            try:
+                os.unlink(os.path.join(thumbs_dir, entry))
+            except OSError:
+                pass
+    return target
@@ -2,8 +2,18 @@
 HTML Report Generator
 Read the logs and charts generated by each detector, and generate a unified HTML report
 """
+from html import escape
+import gzip
+import hashlib
+import json
 import os
-from typing import List, Dict
+from typing import Dict, Iterable, List
+from urllib.parse import quote
+
+from tools.findings_index import FindingsIndex
+
+from src.findings import SMELL_TYPES, smell_title
+from src.perf import read_sidecar, sidecar_path
 
 try:
     from src.config_loader import get_config
@@ -19,6 +29,16 @@ except Exception:
         return SimpleConfig()
 
 
+SMELL_ORDER = {smell: position for position, smell in enumerate(SMELL_TYPES)}
+
+# Bump when the report template changes so that cached reports are re-rendered
+REPORT_TEMPLATE_VERSION = 6
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+
+# report path -> fingerprint of the inputs it was rendered from
+_rendered_reports: Dict[str, str] = {}
+
 SECTION_MAP = [
     ("long_method_logs.txt", "Long Methods"),
     ("long_parameter_logs.txt", "Long Parameters"),
@@ -52,16 +72,194 @@ def _section_html(title: str, lines: List[str]) -> str:
 def _plots_html(plots_dir: str) -> str:
     if not os.path.isdir(plots_dir):
         return ""
-    names = [n for n in sorted(os.listdir(plots_dir)) if n.lower().endswith((".png", ".jpg", ".jpeg", ".gif"))]
+    names = [n for n in sorted(os.listdir(plots_dir)) if n.lower().endswith(IMAGE_EXTENSIONS)]
     if not names:
         return "<section class='card'><h3>Chart Previews</h3><p>No charts available.</p></section>"
-    imgs = "".join(f"<div class='img-card'><img src='/plots/{name}' alt='{name}' /></div>" for name in names[:60])
+    imgs = "".join(
+        f"<div class='img-card'><a href='/plots/{name}?v={version}' target='_blank'>"
+        f"<img src='/thumbs/{name}?v={version}' alt='{name}' loading='lazy' /></a></div>"
+        for name, version in ((name, asset_version(os.path.join(plots_dir, name))) for name in names[:60])
+    )
     return f"<section class='card'><h3>Chart Previews</h3><div class='grid'>{imgs}</div></section>"
 
 
-def generate_html_report(dirname: str) -> str:
+def asset_version(path: str) -> str:
+    """Short version tag of a file, changes whenever the file is rewritten"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "0"
+    return hashlib.sha1(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest()[:12]
+
+
+def _stat_entries(paths: Iterable[str]) -> List[str]:
+    entries = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append(f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}")
+    return entries
+
+
+def _list_dir(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))]
+
+
+def report_fingerprint(dirname: str) -> str:
+    """
+    Fingerprint of everything a project's HTML report is rendered from: the findings file
+    (or the detector logs when there is none), the performance timings and the charts
+    """
+    cfg = get_config()
+    ndjson_path = findings_ndjson_path(dirname)
+    if os.path.exists(ndjson_path):
+        inputs = [ndjson_path]
+    else:
+        inputs = [os.path.join(cfg.get_logs_dir(), filename) for filename, _ in SECTION_MAP]
+    inputs.append(sidecar_path(dirname))
+    inputs.extend(path for path in _list_dir(cfg.get_plots_dir()) if path.lower().endswith(IMAGE_EXTENSIONS))
+    entries = [f"v{REPORT_TEMPLATE_VERSION}", dirname] + _stat_entries(inputs)
+    return hashlib.sha1("\n".join(entries).encode("utf8")).hexdigest()
+
+
+def _stored_fingerprint(report_path: str) -> str:
+    if report_path in _rendered_reports:
+        return _rendered_reports[report_path]
+    try:
+        with open(report_path + ".fingerprint", encoding="utf8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def findings_ndjson_path(dirname: str) -> str:
+    """NDJSON findings file written by detect_main for a project"""
+    return os.path.join(get_config().get_output_dir(), f"{dirname}_findings.ndjson")
+
+
+def _partial_html(summary: dict) -> str:
+    """Stages and files completed by a run in deadline mode (--deadline) that did not complete"""
+    if not summary.get("partial"):
+        return ""
+    stage_rows = "".join(f"<tr><td>{escape(stage)}</td><td>{info['files']}</td>"
+                         f"<td>{'complete' if info['complete'] else 'incomplete'}</td></tr>"
+                         for stage, info in summary.get("stages", {}).items())
+    incomplete = summary.get("incomplete_files") or {}
+    file_rows = "".join(f"<tr><td>{escape(str(name))}</td><td>{escape(', '.join(stages))}</td></tr>"
+                        for name, stages in incomplete.items())
+    return f"""
+            <section class='card'><h3>Partial report</h3>
+                <p>The analysis stopped at its deadline or a stage failed: the findings of the stages below that are not complete are missing.</p>
+                <table class='summary'><tr><th>Stage</th><th>Files completed</th><th>Status</th></tr>{stage_rows}</table>
+                <p>{len(incomplete)} files were not completed:</p>
+                <table class='summary'><tr><th>File</th><th>Stages not run</th></tr>{file_rows}</table>
+            </section>"""
+
+
+def _findings_html(dirname: str, index: FindingsIndex) -> str:
+    """Summary table plus a findings browser that pages through /api/findings/<dirname>"""
+    counts = index.smell_counts()
+    rows = "".join(
+        f"<tr><td><a href='#' data-smell='{smell}'>{escape(smell_title(smell))}</a></td><td>{counts[smell]}</td></tr>"
+        for smell in sorted(counts, key=lambda s: (SMELL_ORDER.get(s, len(SMELL_ORDER)), s))
+    )
+    options = "".join(f"<option value='{smell}'>{escape(smell_title(smell))}</option>" for smell in counts)
+    api_url = json.dumps(f"/api/findings/{quote(dirname, safe='')}")
+    skipped = index.summary.get("skipped") or []
+    skipped_html = ""
+    if skipped:
+        skipped_rows = "".join(f"<tr><td>{escape(str(name))}</td><td>{escape(str(reason))}</td></tr>"
+                               for name, reason in skipped)
+        skipped_html = f"""
+            <section class='card'><h3>Skipped files ({len(skipped)})</h3>
+                <p>These files exceeded the time or memory budget of the analysis and have no findings.</p>
+                <table class='summary'><tr><th>File</th><th>Reason</th></tr>{skipped_rows}</table>
+            </section>"""
+    return f"""{_partial_html(index.summary)}
+            <section class='card'><h3>Summary ({index.count} findings)</h3>
+                <table class='summary'><tr><th>Smell</th><th>Findings</th></tr>{rows}</table>
+            </section>{skipped_html}
+            <section class='card'><h3>Findings</h3>
+                <div class='controls'>
+                    <select id='smell'><option value=''>All smells</option>{options}</select>
+                    <select id='sort'><option value='file'>File</option><option value='metric'>Metric</option><option value='smell'>Smell</option></select>
+                    <select id='order'><option value='asc'>Ascending</option><option value='desc'>Descending</option></select>
+                    <input id='q' type='search' placeholder='Filter file or message' />
+                </div>
+                <table class='findings'><thead><tr><th>Smell</th><th>File</th><th>Line</th><th>Metric</th><th>Message</th></tr></thead><tbody id='rows'></tbody></table>
+                <div class='controls'><button id='prev'>&laquo; Prev</button> <span id='pageinfo'></span> <button id='next'>Next &raquo;</button></div>
+            </section>
+            <script>
+            (function() {{
+                var api = {api_url}, page = 1, pages = 1;
+                function el(id) {{ return document.getElementById(id); }}
+                function cell(row, text) {{ var td = document.createElement('td'); td.textContent = text == null ? '' : text; row.appendChild(td); }}
+                function load() {{
+                    var params = new URLSearchParams({{page: page, per_page: 50, sort: el('sort').value, order: el('order').value, smell: el('smell').value, q: el('q').value}});
+                    fetch(api + '?' + params).then(function(r) {{ return r.json(); }}).then(function(data) {{
+                        var body = el('rows'); body.innerHTML = '';
+                        data.findings.forEach(function(f) {{
+                            var row = document.createElement('tr');
+                            cell(row, f.smell); cell(row, f.filename); cell(row, f.lineno); cell(row, f.metric); cell(row, f.message);
+                            body.appendChild(row);
+                        }});
+                        pages = Math.max(1, data.pages);
+                        el('pageinfo').textContent = 'Page ' + data.page + ' / ' + pages + ' (' + data.total + ' findings)';
+                    }});
+                }}
+                function reload() {{ page = 1; load(); }}
+                ['smell', 'sort', 'order'].forEach(function(id) {{ el(id).onchange = reload; }});
+                var timer; el('q').oninput = function() {{ clearTimeout(timer); timer = setTimeout(reload, 300); }};
+                el('prev').onclick = function() {{ if (page > 1) {{ page--; load(); }} }};
+                el('next').onclick = function() {{ if (page < pages) {{ page++; load(); }} }};
+                document.querySelectorAll('a[data-smell]').forEach(function(a) {{
+                    a.onclick = function(e) {{ e.preventDefault(); el('smell').value = a.dataset.smell; reload(); }};
+                }});
+                load();
+            }})();
+            </script>
+    """
+
+
+def _performance_html(dirname: str) -> str:
+    """Stage, detector and slowest file timings of the run, when it recorded them (see src/perf.py)"""
+    timings = read_sidecar(dirname)
+    if not timings:
+        return ""
+
+    def rows(entries, key):
+        return "".join(f"<tr><td>{escape(str(row[key]))}</td><td>{row['wall']:.3f}</td><td>{row['cpu']:.3f}</td></tr>"
+                       for row in entries)
+
+    files = "".join(
+        f"<tr><td>{escape(str(row['file']))}</td><td>{row['wall']:.3f}</td><td>{row['cpu']:.3f}</td>"
+        f"<td>{escape(', '.join(f'{name} {wall:.3f}s' for name, wall in list(row['detectors'].items())[:3]))}</td></tr>"
+        for row in timings.get("slowest_files", [])
+    )
+    return f"""
+            <section class='card'><h3>Performance ({timings['wall']:.2f}s wall, {timings['cpu']:.2f}s CPU)</h3>
+                <h4>Stages</h4>
+                <table class='summary'><tr><th>Stage</th><th>Wall (s)</th><th>CPU (s)</th></tr>{rows(timings.get('stages', []), 'stage')}</table>
+                <h4>Detectors</h4>
+                <table class='summary'><tr><th>Detector</th><th>Wall (s)</th><th>CPU (s)</th></tr>{rows(timings.get('detectors', []), 'detector')}</table>
+                <h4>Slowest files</h4>
+                <table class='summary'><tr><th>File</th><th>Wall (s)</th><th>CPU (s)</th><th>Slowest detectors</th></tr>{files}</table>
+            </section>"""
+
+
+def generate_html_report(dirname: str, force: bool = False) -> str:
     """
     Generate the HTML report file and return its path
+
+    When the run wrote an NDJSON findings file the report only embeds the summary and loads
+    findings page by page from the findings API; otherwise it falls back to the detector logs.
+
+    The report is only rendered again when its inputs changed (see report_fingerprint), and a
+    gzip-compressed copy is written next to it for the web app to serve.
     """
     cfg = get_config()
     output_dir = cfg.get_output_dir()
@@ -70,12 +268,23 @@ def generate_html_report(dirname: str) -> str:
 
     os.makedirs(output_dir, exist_ok=True)
 
-    sections = []
-    for filename, title in SECTION_MAP:
-        path = os.path.join(logs_dir, filename)
-        lines = _read_log_lines(path)
-        sections.append(_section_html(title, lines))
+    report_path = os.path.join(output_dir, f"{dirname}_review.html")
+    fingerprint = report_fingerprint(dirname)
+    if not force and os.path.exists(report_path) and _stored_fingerprint(report_path) == fingerprint:
+        _rendered_reports[report_path] = fingerprint
+        return report_path
+
+    index = FindingsIndex.open(findings_ndjson_path(dirname))
+    if index is not None:
+        sections = [_findings_html(dirname, index)]
+    else:
+        sections = []
+        for filename, title in SECTION_MAP:
+            path = os.path.join(logs_dir, filename)
+            lines = _read_log_lines(path)
+            sections.append(_section_html(title, lines))
 
+    sections.append(_performance_html(dirname))
     plots_block = _plots_html(plots_dir)
 
     html = f"""
@@ -84,7 +293,7 @@ def generate_html_report(dirname: str) -> str:
     <head>
         <meta charset='utf-8' />
         <meta name='viewport' content='width=device-width, initial-scale=1' />
-        <title>Code Smell Report - {dirname}</title>
+        <title>Code Smell Report - {escape(dirname)}</title>
         <style>
             body {{font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, 'Noto Sans', sans-serif; margin:0; background:#f5f7fb;}}
             .wrap {{max-width: 1100px; margin: 32px auto;}}
@@ -96,12 +305,16 @@ def generate_html_report(dirname: str) -> str:
             .grid {{display:grid; grid-template-columns: repeat(auto-fill, minmax(260px, 1fr)); gap:16px;}}
             .img-card {{background:#fff; border:1px solid #eee; border-radius:10px; padding:10px;}}
             .img-card img {{max-width: 100%; height:auto; display:block;}}
+            table {{border-collapse: collapse; width: 100%;}}
+            th, td {{text-align:left; padding:4px 8px; border-bottom:1px solid #eee; font-size: 13px;}}
+            table.summary {{width:auto;}}
+            .controls {{display:flex; gap:8px; margin:8px 0; align-items:center;}}
         </style>
     </head>
     <body>
         <div class='wrap'>
             <div class='panel'>
-                <h1>Project: {dirname}</h1>
+                <h1>Project: {escape(dirname)}</h1>
                 <p>Below are the code smell logs summary and chart previews.</p>
             </div>
             {''.join(sections)}
@@ -111,8 +324,16 @@ def generate_html_report(dirname: str) -> str:
     </html>
     """
 
-    report_name = f"{dirname}_review.html"
-    report_path = os.path.join(output_dir, report_name)
-    with open(report_path, "w", encoding="utf8") as f:
-        f.write(html)
-    return report_path
\ No newline at end of file
+    data = html.encode("utf8")
+    _write_atomic(report_path, data)
+    _write_atomic(report_path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    _write_atomic(report_path + ".fingerprint", fingerprint.encode("utf8"))
+    _rendered_reports[report_path] = fingerprint
+    return report_path
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+Streaming report writers
+Write findings to JSON, NDJSON and SARIF files one record at a time while the detectors run,
+so even very large projects never hold the whole document in memory
+"""
+import abc
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from src.findings import SMELL_TYPES, make_finding
+
+
+class _StreamingWriter(abc.ABC):
+    """Base class: writes into a temporary file which is renamed into place on close"""
+
+    suffix = ""
+
+    def __init__(self, path: str, project: str):
+        self.path = path
+        self.project = project
+        self.count = 0
+        self._tmp_path = path + ".part"
+        self._fp = open(self._tmp_path, "w", encoding="utf8")
+        self._write_header()
+
+    def _write_header(self):
+        pass
+
+    @abc.abstractmethod
+    def _write_footer(self, summary: Dict[str, Any]):
+        """Write the summary and close the document"""
+
+    @abc.abstractmethod
+    def write(self, finding: Dict[str, Any]):
+        """Write one finding"""
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        if self._fp is None:
+            return
+        self._write_footer(summary or {})
+        self._fp.close()
+        self._fp = None
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard the unfinished file; the previous report (if any) stays in place"""
+        if self._fp is None:
+            return
+        self._fp.close()
+        self._fp = None
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
+
+
+class NdjsonWriter(_StreamingWriter):
+    """One JSON object per line; the summary is written as the last line"""
+
+    suffix = "ndjson"
+
+    def write(self, finding):
+        self._fp.write(json.dumps(finding, ensure_ascii=False))
+        self._fp.write("\n")
+        self.count += 1
+
+    def _write_footer(self, summary):
+        if summary:
+            self._fp.write(json.dumps({"summary": summary}, ensure_ascii=False))
+            self._fp.write("\n")
+
+
+class JsonWriter(_StreamingWriter):
+    """A single JSON document: {"project": ..., "findings": [...], "summary": {...}}"""
+
+    suffix = "json"
+
+    def _write_header(self):
+        self._fp.write('{"project": %s, "findings": [' % json.dumps(self.project, ensure_ascii=False))
+
+    def write(self, finding):
+        if self.count:
+            self._fp.write(",")
+        self._fp.write("\n")
+        self._fp.write(json.dumps(finding, ensure_ascii=False))
+        self.count += 1
+
+    def _write_footer(self, summary):
+        self._fp.write('\n], "summary": %s}\n' % json.dumps(summary, ensure_ascii=False))
+
+
+class SarifWriter(_StreamingWriter):
+    """SARIF 2.1.0 log with one run; results are streamed into runs[0].results"""
+
+    suffix = "sarif"
+
+    RULE_IDS = list(SMELL_TYPES)
+
+    def _write_header(self):
+        rules = [
+            {"id": smell, "name": title.replace(" ", ""), "shortDescription": {"text": description}}
+            for smell, (title, description) in SMELL_TYPES.items()
+        ]
+        driver = {"name": "CodeSmellTool", "informationUri": "https://github.com/HuJRong/Group-23-project",
+                  "rules": rules}
+        header = json.dumps({"tool": {"driver": driver}}, ensure_ascii=False)
+        self._fp.write('{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", "version": "2.1.0", '
+                       '"runs": [')
+        # Reopen the run object so that results can be streamed into it
+        self._fp.write(header[:-1] + ', "results": [')
+
+    def write(self, finding):
+        if self.count:
+            self._fp.write(",")
+        self._fp.write("\n")
+        self._fp.write(json.dumps(self._to_result(finding), ensure_ascii=False))
+        self.count += 1
+
+    def _to_result(self, finding):
+        result = {
+            "ruleId": finding["smell"],
+            "level": "warning",
+            "message": {"text": finding.get("message") or finding["smell"]},
+            "locations": [_sarif_location(finding.get("filename"), finding.get("lineno"),
+                                          finding.get("end_lineno"))],
+            "properties": {"metric": finding.get("metric")},
+        }
+        if finding["smell"] in self.RULE_IDS:
+            result["ruleIndex"] = self.RULE_IDS.index(finding["smell"])
+        related = finding.get("related")
+        if related:
+            result["relatedLocations"] = [
+                dict(_sarif_location(related.get("filename"), related.get("lineno")), id=0)
+            ]
+        return result
+
+    def _write_footer(self, summary):
+        self._fp.write('\n], "properties": %s}]}\n' % json.dumps({"summary": summary}, ensure_ascii=False))
+
+
+def _sarif_location(filename, lineno, end_lineno=None) -> Dict[str, Any]:
+    physical = {"artifactLocation": {"uri": str(filename or "").replace("\\", "/")}}
+    if isinstance(lineno, int) and lineno > 0:
+        region = {"startLine": lineno}
+        if isinstance(end_lineno, int) and end_lineno >= lineno:
+            region["endLine"] = end_lineno
+        physical["region"] = region
+    return {"physicalLocation": physical}
+
+
+WRITER_TYPES = {
+    "json": JsonWriter,
+    "ndjson": NdjsonWriter,
+    "sarif": SarifWriter,
+}
+
+
+class ReportWriters:
+    """Fan findings out to every enabled writer"""
+
+    def __init__(self, writers: List[_StreamingWriter]):
+        self.writers = writers
+        self.count = 0
+
+    def add(self, smell: str, filename: str, lineno: Any, metric: Any = None, message: str = "", **extra: Any):
+        """Build a finding and write it to all writers"""
+        self.write(make_finding(smell, filename, lineno, metric, message, **extra))
+
+    def write(self, finding: Dict[str, Any]):
+        for writer in self.writers:
+            writer.write(finding)
+        self.count += 1
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        for writer in self.writers:
+            writer.close(summary)
+
+    def abort(self):
+        """Discard every unfinished file, e.g. when a detector stage raised"""
+        for writer in self.writers:
+            writer.abort()
+
+    @property
+    def paths(self) -> List[str]:
+        return [writer.path for writer in self.writers]
+
+
+def findings_path(output_dir: str, dirname: str, fmt: str) -> str:
+    """Path of the findings file of a project for the given format"""
+    return os.path.join(output_dir, f"{dirname}_findings.{fmt}")
+
+
+def open_report_writers(dirname: str, output_dir: str, formats: List[str]) -> ReportWriters:
+    """
+    Open the streaming writers for the requested formats
+
+    Args:
+        dirname: project name, used for the file names
+        output_dir: directory the files are written to
+        formats: any of "json", "ndjson", "sarif"
+
+    Returns:
+        ReportWriters; call close() once all findings are written, or abort() on error
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    writers = []
+    for fmt in formats:
+        writer_type = WRITER_TYPES.get(fmt)
+        if writer_type is None:
+            continue
+        writers.append(writer_type(findings_path(output_dir, dirname, fmt), dirname))
+    return ReportWriters(writers)
@@ -0,0 +1,102 @@
+"""
+Client of the analysis daemon (src/daemon.py)
+Sends paths to a running daemon and prints the findings as they arrive. It only uses the standard
+library so that it starts in a few milliseconds; start the daemon once with
+
+    python CodeSmellTool.py --serve
+
+and then, e.g. from a pre-commit hook:
+
+    python tools/smell_client.py src/ web_app.py
+
+Exit status: 0 no findings, 1 findings reported, 2 daemon unreachable or request failed.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class DaemonError(Exception):
+    """The daemon could not be reached or answered with an error"""
+
+
+def request(message, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    """
+    Send one request to the daemon and yield every JSON line of its answer
+
+    Raises:
+        DaemonError: if the daemon is not running or reports an error
+    """
+    try:
+        conn = socket.create_connection((host, port), timeout=timeout)
+    except OSError as e:
+        raise DaemonError("cannot reach the code smell daemon on {}:{} ({}); "
+                          "start it with: python CodeSmellTool.py --serve".format(host, port, e))
+    with conn, conn.makefile("rb") as answer:
+        try:
+            conn.sendall(json.dumps(message).encode("utf8") + b"\n")
+            for line in answer:
+                reply = json.loads(line)
+                if "error" in reply:
+                    raise DaemonError(reply["error"])
+                yield reply
+        except OSError as e:
+            raise DaemonError("connection to the code smell daemon failed ({})".format(e))
+
+
+def analyze(paths, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    """Yield the findings of the given paths, then the summary (the line with "done")"""
+    message = {"cmd": "analyze", "paths": [os.path.abspath(path) for path in paths], "root": os.getcwd()}
+    return request(message, host, port, timeout)
+
+
+def format_finding(finding):
+    metric = "" if finding.get("metric") is None else " ({})".format(finding["metric"])
+    return "{}:{}: [{}] {}{}".format(finding["filename"], finding["lineno"], finding["smell"],
+                                     finding["message"], metric)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze Python files with a running code smell daemon")
+    parser.add_argument("paths", nargs="*", default=["."], help="files or directories (default: .)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--json", action="store_true", help="print the raw JSON lines of the daemon")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds to wait for each answer line")
+    parser.add_argument("--ping", action="store_true", help="check that the daemon is running")
+    parser.add_argument("--shutdown", action="store_true", help="stop the daemon")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.ping or args.shutdown:
+            for reply in request({"cmd": "shutdown" if args.shutdown else "ping"}, args.host, args.port,
+                                 args.timeout):
+                print(json.dumps(reply))
+            return 0
+
+        findings = 0
+        for reply in analyze(args.paths, args.host, args.port, args.timeout):
+            if args.json:
+                print(json.dumps(reply, ensure_ascii=False))
+            elif "finding" in reply:
+                print(format_finding(reply["finding"]))
+            if "finding" in reply:
+                findings += 1
+            elif reply.get("done") and not args.json:
+                for filename, error in reply.get("errors", []):
+                    print("{}: error: {}".format(filename, error), file=sys.stderr)
+                print("{} findings in {} files ({} unchanged) in {:.3f}s".format(
+                    findings, reply["files"], reply["cached_files"], reply["elapsed"]), file=sys.stderr)
+    except DaemonError as e:
+        print(e, file=sys.stderr)
+        return 2
+    return 1 if findings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
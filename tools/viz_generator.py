@@ -36,14 +36,16 @@ def generate_viz(data, label, filename, chart_type="bar"):
         filename: Log filename
         chart_type: Chart type ("bar", "pie", "scatter", "heatmap")
     """
-    config = get_config()
-    chart_types = config.config.get("visualization", {}).get("chart_types", ["bar"])
-    
     # Parse data
-    parsed_data = _parse_log_data(data, filename)
+    _generate_charts(_parse_log_data(data, filename), label, filename)
+
+
+def _generate_charts(parsed_data, label, filename):
+    """Generate the configured chart types of parsed {"filename", "value"} items"""
     if not parsed_data:
         return
-    
+    chart_types = get_config().config.get("visualization", {}).get("chart_types", ["bar"])
+
     # Generate charts based on configuration
     if "bar" in chart_types:
         _generate_bar_chart(parsed_data, label, filename)
@@ -254,24 +256,41 @@ def add_viz():
             try:
                 with open(file_path, encoding='UTF8') as f:
                     data = f.read()
-                    
-                    # Determine the label based on the file name
-                    if "many" in filename:
-                        label = "count"
-                    elif "long" in filename:
-                        label = "number of characters"
-                    elif "magic" in filename:
-                        label = "occurrence count"
-                    elif "duplicate" in filename:
-                        label = "similarity %"
-                    elif "commented" in filename:
-                        label = "lines of code"
-                    elif "unused" in filename:
-                        label = "count"
-                    else:
-                        label = "metric"
-                    
+                    label = _chart_label(filename)
+
                     # Generate charts (use the first chart type in config as primary type)
                     generate_viz(data, label, filename, chart_types[0] if chart_types else "bar")
             except (OSError, IOError) as e:
                 continue
+
+
+def _chart_label(filename):
+    """Y-axis label of the charts of a log file, based on its name"""
+    if "many" in filename:
+        return "count"
+    elif "long" in filename:
+        return "number of characters"
+    elif "magic" in filename:
+        return "occurrence count"
+    elif "duplicate" in filename:
+        return "similarity %"
+    elif "commented" in filename:
+        return "lines of code"
+    elif "unused" in filename:
+        return "count"
+    return "metric"
+
+
+def add_findings_viz(findings):
+    """
+    Generate the same charts as add_viz from finding dicts instead of the detector logs, for the
+    runs that do not write logs (in-memory analyses of the web app); charts are named after the
+    log file of each smell
+    """
+    per_smell = defaultdict(list)
+    for finding in findings:
+        per_smell[finding["smell"]].append({"filename": finding["filename"], "value": finding["metric"]})
+    for smell, parsed_data in sorted(per_smell.items()):
+        filename = f"{smell}_logs.txt"
+        if "exception" not in filename:
+            _generate_charts(parsed_data, _chart_label(filename), filename)
@@ -1,21 +1,57 @@
+import contextlib
+import gzip
+import hashlib
 import os
 import threading
+import time
 from typing import List
 
-from flask import Flask, request, redirect, url_for, send_from_directory, render_template_string, abort
+from flask import Flask, request, redirect, url_for, send_from_directory, send_file, render_template_string, abort, jsonify
+from werkzeug.security import safe_join
 
 try:
     from CodeSmellTool import file_extractor
 except Exception:
     file_extractor = None
 
+from src import metrics, perf
+from src.api import analyze, write_reports
+from src.archive_sources import ArchiveError, archive_project_name, is_archive, iter_archive_sources
 from src.detector import detect_main
+from src.upload_stream import CHUNK_SIZE, MultipartUpload, UploadError, prefetch
 from src.config_loader import get_config
-from tools.report_html import generate_html_report
+from src.engine import AnalysisEngine
+from tools.report_html import generate_html_report, findings_ndjson_path, asset_version
+from tools.findings_index import FindingsIndex
+from tools.plot_gallery import list_plots, paginate, thumbnail_path
+from tools.viz_generator import add_findings_viz
 
 
 app = Flask(__name__)
 
+# Versioned chart URLs (?v=...) never change content, so browsers may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+# One engine for all uploads, so that its caches stay warm; analyses run one at a time (the engine
+# and pylint are not thread safe), the others wait in the queue
+engine = AnalysisEngine()
+_analysis_lock = threading.Lock()
+
+JOBS_QUEUED = metrics.Gauge("codesmell_jobs_queued", "Analysis jobs waiting for the running one to finish")
+JOBS_RUNNING = metrics.Gauge("codesmell_jobs_running", "Analysis jobs running")
+JOBS_FINISHED = metrics.Counter("codesmell_jobs_finished_total", "Analysis jobs finished, by upload kind and outcome",
+                                ["kind", "status"])
+JOB_DURATION = metrics.Histogram("codesmell_job_duration_seconds", "Duration of the analysis jobs, queueing excluded",
+                                 ["kind"])
+STAGE_DURATION = metrics.Histogram("codesmell_stage_duration_seconds", "Duration of a stage in one analysis job",
+                                   ["stage"])
+DETECTOR_DURATION = metrics.Histogram("codesmell_detector_duration_seconds",
+                                      "Time spent in a detector in one analysis job", ["detector"])
+UPLOAD_BYTES = metrics.Counter("codesmell_upload_bytes_total", "Bytes of the uploaded request bodies", ["kind"])
+
 
 def _safe_basename(path: str) -> str:
     try:
@@ -25,14 +61,7 @@ def _safe_basename(path: str) -> str:
 
 
 def _list_plots() -> List[str]:
-    plots_dir = get_config().get_plots_dir()
-    if not os.path.isdir(plots_dir):
-        return []
-    files = []
-    for name in sorted(os.listdir(plots_dir)):
-        if name.lower().endswith((".png", ".jpg", ".jpeg", ".gif")):
-            files.append(name)
-    return files
+    return list_plots(get_config().get_plots_dir())
 
 
 @app.route("/")
@@ -66,7 +95,7 @@ def index():
                 <h1>Code Smell Tool</h1>
             </header>
             <div class="content">
-                <form method="post" action="/run-upload" enctype="multipart/form-data">
+                <form method="post" action="/run-upload-stream" enctype="multipart/form-data">
                     <label>Select Project Directory (uploads all .py files inside)</label>
                     <input id="dirInput" type="file" name="files" webkitdirectory directory multiple required style="display:none;" onchange="document.getElementById('dirStatus').textContent='Directory selected'" />
                     <div class="row">
@@ -78,12 +107,19 @@ def index():
                         <a class="btn btn-secondary" href="/gallery" target="_blank">View Historical Charts</a>
                     </div>
                 </form>
+                <form method="post" action="/run-upload" enctype="multipart/form-data">
+                    <label>Or upload a project archive (.zip, .tar.gz)</label>
+                    <div class="row">
+                        <input type="file" name="archive" accept=".zip,.tar,.tar.gz,.tgz,.tar.bz2,.tbz2,.tar.xz,.txz" required />
+                        <button class="btn btn-primary" type="submit">Analyze Archive</button>
+                    </div>
+                </form>
                 <div class="card">
                     <strong>Instructions</strong>
                     <ul>
                         <li>Select local directories via Edge/Chrome; no path typing required.</li>
                         <li>Detection generates an HTML report and charts, viewable in the browser.</li>
-                        <li>Charts go to the configured `plots` directory; logs to `output/logs`.</li>
+                        <li>Charts go to the configured `plots` directory; the detector logs (`output/logs`) and the PDF report are only written by the command line tool.</li>
                     </ul>
                 </div>
             </div>
@@ -95,8 +131,102 @@ def index():
     return render_template_string(html)
 
 
+def _upload_deadline():
+    """Seconds an upload may be analyzed for (limits.upload_deadline), None when not limited"""
+    return get_config().get_limit("upload_deadline", 0) or None
+
+
+@contextlib.contextmanager
+def analysis_job(kind: str):
+    """
+    Run the block as an analysis job: after the running one, timed per stage for the metrics;
+    kind is "archive", "stream" or "directory"
+    """
+    if request.content_length:
+        UPLOAD_BYTES.inc(request.content_length, kind=kind)
+    JOBS_QUEUED.inc()
+    with _analysis_lock:
+        JOBS_QUEUED.dec()
+        JOBS_RUNNING.inc()
+        status, started = "error", time.perf_counter()
+        try:
+            with perf.recording() as recorder:
+                yield
+                status = "ok"
+        finally:
+            JOBS_RUNNING.dec()
+            JOB_DURATION.observe(time.perf_counter() - started, kind=kind)
+            JOBS_FINISHED.inc(kind=kind, status=status)
+            for name, (wall, _, _) in recorder.stages.items():
+                STAGE_DURATION.observe(wall, stage=name)
+            for name, (wall, _, _) in recorder.detectors.items():
+                DETECTOR_DURATION.observe(wall, detector=name)
+
+
+def run_archive_upload(upload):
+    """
+    Analyze an uploaded zip/tar archive member by member, without saving or extracting it; the
+    charts are drawn from the findings (no detector logs or PDF report are written)
+    """
+    errors = []
+    base = archive_project_name(upload.filename)
+    with analysis_job("archive"):
+        try:
+            results = analyze(iter_archive_sources(upload.stream, upload.filename, errors), engine=engine,
+                              deadline=_upload_deadline())
+        except ArchiveError as e:
+            abort(400, description=str(e))
+        results.errors.extend(errors)
+        with perf.stage("charts"):
+            add_findings_viz(results.findings)
+        write_reports(results, base, extra_formats=("html",))
+    return redirect(url_for("reports_index", filename=f"{base}_review.html"))
+
+
+@app.route("/run-upload-stream", methods=["POST"])
+def run_upload_stream():
+    """
+    Directory upload analyzed while it arrives: each .py file goes through the per-file detectors
+    as soon as its part of the request body is complete, nothing is saved to code-dump
+    """
+    boundary = request.mimetype_params.get("boundary")
+    if request.mimetype != "multipart/form-data" or not boundary:
+        abort(400, description="Expected a multipart/form-data upload")
+    upload = MultipartUpload(request.stream, boundary)
+    with analysis_job("stream"):
+        try:
+            results = analyze(prefetch(upload), engine=engine, deadline=_upload_deadline())
+        except UploadError as e:
+            abort(400, description=str(e))
+        if not results.files and not upload.errors:
+            abort(400, description="No .py files uploaded")
+        results.errors.extend(upload.errors)
+        base = upload.project or "uploaded_project"
+        with perf.stage("charts"):
+            add_findings_viz(results.findings)
+        write_reports(results, base, extra_formats=("html",))
+    return redirect(url_for("reports_index", filename=f"{base}_review.html"))
+
+
+def _save_upload(upload, dst: str) -> int:
+    """Copy an uploaded file to dst chunk by chunk and return its number of lines"""
+    lines, last = 0, b"\n"
+    with open(dst, "wb") as out:
+        for chunk in iter(lambda: upload.stream.read(CHUNK_SIZE), b""):
+            out.write(chunk)
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    return lines + (last != b"\n")
+
+
 @app.route("/run-upload", methods=["POST"])
 def run_upload():
+    archive = request.files.get('archive')
+    if archive is not None and archive.filename:
+        if not is_archive(archive.filename):
+            abort(400, description="Not a .zip or .tar archive")
+        return run_archive_upload(archive)
+
     files = request.files.getlist('files')
     if not files:
         abort(400, description="No directory selected")
@@ -120,27 +250,35 @@ def run_upload():
             except OSError:
                 pass
 
-    # Flat save the.py files
+    # Flat save the.py files, counting their lines on the way
     idx = 0
+    lines = 0
     for f in files:
         name = f.filename
         if name.lower().endswith('.py'):
             target_name = f"{idx:04d}_{os.path.basename(name)}"
             dst = os.path.join(dump_dir, target_name)
             try:
-                f.save(dst)
+                lines += _save_upload(f, dst)
                 idx += 1
             except Exception:
                 continue
 
-    # Run detection
-    detect_main(dump_dir, None)
+    # Run detection; the HTML report and its findings index are generated with it
+    with analysis_job("directory"):
+        metrics.FILES_ANALYZED.inc(idx)
+        metrics.LINES_ANALYZED.inc(lines)
+        detect_main(dump_dir, None, extra_formats=("html",))
 
-    # Generate HTML report and redirect
-    generate_html_report(base)
     return redirect(url_for("reports_index", filename=f"{base}_review.html"))
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Jobs, stage durations, files analyzed, cache hit ratios... in the Prometheus text format"""
+    return app.response_class(metrics.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
+
 @app.route("/view/<dirname>")
 def view_report(dirname: str):
     # Change to directly generate and display HTML reports
@@ -148,9 +286,42 @@ def view_report(dirname: str):
     return redirect(url_for("reports_index", filename=f"{dirname}_review.html"))
 
 
+@app.route("/api/findings/<dirname>")
+def findings_api(dirname: str):
+    """One page of findings of a run, read from its pre-sorted findings index"""
+    ndjson_path = findings_ndjson_path(_safe_basename(dirname))
+    index = FindingsIndex.open(ndjson_path)
+    if index is None:
+        abort(404, description="No findings for this project")
+    args = request.args
+
+    # A page only changes when the findings file does: answer revalidations without reading it
+    etag = hashlib.sha1("{}:{}:{}".format(asset_version(ndjson_path), index.meta.get("source_size"),
+                                          request.query_string.decode()).encode()).hexdigest()
+    if etag in request.if_none_match or etag + "-gz" in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    try:
+        page = index.page(
+            page=args.get("page", 1, type=int),
+            per_page=args.get("per_page", 50, type=int),
+            sort=args.get("sort", "file"),
+            order=args.get("order", "asc"),
+            smell=args.get("smell") or None,
+            q=args.get("q") or None,
+        )
+    except (OSError, ValueError):
+        abort(500, description="Findings index is unreadable")
+    response = jsonify(page)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return _gzip_response(response)
+
+
 @app.route("/gallery")
 def gallery():
-    plots = _list_plots()
+    plots, page, pages = paginate(_list_plots(), request.args.get("page", 1, type=int))
     html = """
     <!doctype html>
     <html lang="en">
@@ -165,6 +336,7 @@ def gallery():
             .grid {display:grid; grid-template-columns: repeat(auto-fill, minmax(260px, 1fr)); gap:16px;}
             .img-card {background:#fff; border:1px solid #eee; border-radius:10px; padding:10px;}
             .img-card img {max-width: 100%; height:auto; display:block;}
+            .pager {display:flex; gap:12px; align-items:center; margin-top:16px;}
         </style>
     </head>
     <body>
@@ -174,9 +346,17 @@ def gallery():
                 {% if plots %}
                 <div class="grid">
                     {% for img in plots %}
-                    <div class="img-card"><img src="{{ url_for('get_plot', filename=img) }}" alt="{{ img }}" /></div>
+                    {% set v = version(img) %}
+                    <div class="img-card"><a href="{{ url_for('get_plot', filename=img, v=v) }}" target="_blank"><img src="{{ url_for('get_plot_thumbnail', filename=img, v=v) }}" alt="{{ img }}" loading="lazy" /></a></div>
                     {% endfor %}
                 </div>
+                {% if pages > 1 %}
+                <div class="pager">
+                    {% if page > 1 %}<a href="{{ url_for('gallery', page=page - 1) }}">&laquo; Prev</a>{% endif %}
+                    <span>Page {{ page }} / {{ pages }}</span>
+                    {% if page < pages %}<a href="{{ url_for('gallery', page=page + 1) }}">Next &raquo;</a>{% endif %}
+                </div>
+                {% endif %}
                 {% else %}
                 <p>No charts available.</p>
                 {% endif %}
@@ -185,13 +365,45 @@ def gallery():
     </body>
     </html>
     """
-    return render_template_string(html, plots=plots)
+    plots_dir = get_config().get_plots_dir()
+    return render_template_string(html, plots=plots, page=page, pages=pages,
+                                  version=lambda name: asset_version(os.path.join(plots_dir, name)))
+
+
+def _accepts_gzip() -> bool:
+    return "gzip" in request.accept_encodings
+
+
+def _gzip_response(response):
+    """Compress a buffered response body when the client accepts gzip"""
+    response.vary.add("Accept-Encoding")
+    if (not _accepts_gzip() or response.direct_passthrough or response.status_code != 200
+            or "Content-Encoding" in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
+    if response.get_etag()[0]:
+        # The compressed representation needs its own validator
+        response.set_etag(response.get_etag()[0] + "-gz", weak=response.get_etag()[1])
+    return response
 
 
 @app.route("/reports/<path:filename>")
 def get_report(filename: str):
     output_dir = get_config().get_output_dir()
-    return send_from_directory(output_dir, filename)
+    # Serve the pre-compressed copy written by generate_html_report when the client accepts it
+    path = safe_join(os.path.join(app.root_path, output_dir), filename)
+    if path and _accepts_gzip() and os.path.isfile(path) and os.path.isfile(path + ".gz") and \
+            os.path.getmtime(path + ".gz") >= os.path.getmtime(path):
+        response = send_file(path + ".gz", download_name=os.path.basename(filename), conditional=True)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = send_from_directory(output_dir, filename)
+    response.vary.add("Accept-Encoding")
+    return response
 
 @app.route("/reports")
 def reports_index():
@@ -205,9 +417,29 @@ def reports_index():
 @app.route("/plots/<path:filename>")
 def get_plot(filename: str):
     plots_dir = get_config().get_plots_dir()
+    if request.args.get("v"):
+        response = send_from_directory(plots_dir, filename, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
     return send_from_directory(plots_dir, filename)
 
 
+@app.route("/thumbs/<path:filename>")
+def get_plot_thumbnail(filename: str):
+    """Thumbnail of a chart; falls back to the chart itself when no thumbnail can be made"""
+    plots_dir = os.path.join(app.root_path, get_config().get_plots_dir())
+    source = safe_join(plots_dir, filename)
+    if source is None or not os.path.isfile(source):
+        abort(404)
+    thumb = thumbnail_path(plots_dir, filename) or source
+    response = send_file(thumb, max_age=IMMUTABLE_MAX_AGE if request.args.get("v") else None)
+    if request.args.get("v"):
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
 if __name__ == "__main__":
     # Run in production mode and disable automatic reloading to avoid watchdog version compatibility issues
     app.run(host="127.0.0.1", port=5000, debug=False, use_reloader=False)
\ No newline at end of file